@@ -0,0 +1,335 @@
+from flask import Blueprint, request, jsonify, send_file, current_app
+import hmac
+import io
+import os
+from src.services.expiracao_service import get_expiracao_service
+from src.services.outbox_service import get_outbox_service
+from src.services.lembrete_service import get_lembrete_service
+from src.services.arquivo_service import get_arquivo_service
+from src.services.mercadopago_service import get_mercadopago_service
+
+admin_bp = Blueprint('admin', __name__)
+
+@admin_bp.before_request
+def verificar_token_admin():
+    """
+    Exige o cabeçalho X-Admin-Token igual a ADMIN_TOKEN
+
+    Sem ADMIN_TOKEN configurado as rotas ficam fechadas, a não ser que
+    ADMIN_INSECURE=1 libere o acesso explicitamente (desenvolvimento local).
+    """
+    token = os.getenv('ADMIN_TOKEN')
+    if not token:
+        if os.getenv('ADMIN_INSECURE', '').lower() in ('1', 'true', 'yes'):
+            return None
+        return jsonify({
+            'success': False,
+            'error': 'Rotas de administração desabilitadas: configure ADMIN_TOKEN'
+        }), 401
+
+    if not hmac.compare_digest(request.headers.get('X-Admin-Token', ''), token):
+        return jsonify({
+            'success': False,
+            'error': 'Acesso não autorizado'
+        }), 401
+
+@admin_bp.route('/admin/profiles', methods=['GET'])
+def list_profiles():
+    """
+    Lista os perfis de requisições capturados pelo profiler
+    """
+    try:
+        profiler = current_app.extensions['profiler']
+        perfis = profiler.listar_perfis()
+
+        return jsonify({
+            'success': True,
+            'habilitado': profiler.habilitado,
+            'profiles': perfis,
+            'total': len(perfis),
+            'capacidade': profiler.max_perfis
+        })
+
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@admin_bp.route('/admin/profiles/<perfil_id>', methods=['GET'])
+def get_profile(perfil_id):
+    """
+    Retorna os metadados e o resumo textual de um perfil
+    """
+    try:
+        perfil = current_app.extensions['profiler'].obter_perfil(perfil_id)
+
+        if not perfil:
+            return jsonify({
+                'success': False,
+                'error': 'Perfil não encontrado'
+            }), 404
+
+        return jsonify({
+            'success': True,
+            'profile': {chave: valor for chave, valor in perfil.items() if chave != 'dados'}
+        })
+
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@admin_bp.route('/admin/profiles/<perfil_id>/download', methods=['GET'])
+def download_profile(perfil_id):
+    """
+    Faz download do perfil no formato do pstats (.prof)
+    """
+    try:
+        perfil = current_app.extensions['profiler'].obter_perfil(perfil_id)
+
+        if not perfil:
+            return jsonify({
+                'success': False,
+                'error': 'Perfil não encontrado'
+            }), 404
+
+        return send_file(
+            io.BytesIO(perfil['dados']),
+            as_attachment=True,
+            download_name=f"profile_{perfil['id']}.prof",
+            mimetype='application/octet-stream'
+        )
+
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@admin_bp.route('/admin/profiles', methods=['DELETE'])
+def clear_profiles():
+    """
+    Limpa o buffer de perfis
+    """
+    try:
+        current_app.extensions['profiler'].limpar()
+
+        return jsonify({
+            'success': True,
+            'message': 'Perfis removidos'
+        })
+
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@admin_bp.route('/admin/expiracao/varrer', methods=['POST'])
+def sweep_expired():
+    """
+    Executa a varredura de cobranças pendentes vencidas
+    
+    Body JSON (opcional):
+    {
+        "dry_run": true
+    }
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        result = get_expiracao_service().varrer(dry_run=bool(data.get('dry_run', False)))
+        
+        return jsonify(result), (200 if result['success'] else 409)
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@admin_bp.route('/admin/expiracao', methods=['GET'])
+def expiration_metrics():
+    """
+    Retorna as métricas da varredura de expiração
+    """
+    try:
+        return jsonify({
+            'success': True,
+            'metricas': get_expiracao_service().metricas()
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@admin_bp.route('/admin/outbox', methods=['GET'])
+def list_outbox():
+    """
+    Lista as mensagens da outbox de emails
+    
+    Query params:
+        status: pending, sending, sent ou dead (opcional)
+        limit: máximo de itens (padrão 50, até 500)
+        offset: deslocamento (padrão 0)
+    """
+    try:
+        outbox_service = get_outbox_service()
+        limit = min(request.args.get('limit', 50, type=int), 500)
+        offset = request.args.get('offset', 0, type=int)
+        
+        itens, total = outbox_service.listar(request.args.get('status'), limit, offset)
+        
+        return jsonify({
+            'success': True,
+            'mensagens': [item.to_dict() for item in itens],
+            'total': total,
+            'metricas': outbox_service.metricas()
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@admin_bp.route('/admin/outbox/<int:item_id>/reenfileirar', methods=['POST'])
+def requeue_outbox(item_id):
+    """
+    Devolve uma mensagem da outbox (por exemplo, do estado dead) para a fila
+    """
+    try:
+        item = get_outbox_service().reenfileirar(item_id)
+        
+        if not item:
+            return jsonify({
+                'success': False,
+                'error': 'Mensagem não encontrada'
+            }), 404
+        
+        return jsonify({
+            'success': True,
+            'mensagem': item.to_dict()
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@admin_bp.route('/admin/lembretes/executar', methods=['POST'])
+def run_reminders():
+    """
+    Executa uma campanha de lembretes para as cobranças pendentes
+    
+    Body JSON (opcional):
+    {
+        "dry_run": true
+    }
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        result = get_lembrete_service().executar(dry_run=bool(data.get('dry_run', False)))
+        
+        return jsonify(result), (200 if result['success'] else 409)
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@admin_bp.route('/admin/lembretes', methods=['GET'])
+def list_reminders():
+    """
+    Lista o histórico de lembretes enviados
+    
+    Query params:
+        cobranca_id: filtra por cobrança (opcional)
+        limit: máximo de itens (padrão 50, até 500)
+        offset: deslocamento (padrão 0)
+    """
+    try:
+        lembrete_service = get_lembrete_service()
+        limit = min(request.args.get('limit', 50, type=int), 500)
+        offset = request.args.get('offset', 0, type=int)
+        
+        itens, total = lembrete_service.historico(request.args.get('cobranca_id', type=int), limit, offset)
+        
+        return jsonify({
+            'success': True,
+            'lembretes': [item.to_dict() for item in itens],
+            'total': total,
+            'ultima_execucao': lembrete_service.ultima_execucao
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@admin_bp.route('/admin/arquivo/executar', methods=['POST'])
+def run_archive():
+    """
+    Move as cobranças finalizadas antigas para os arquivos de período
+    
+    Body JSON (opcional):
+    {
+        "dry_run": true
+    }
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        result = get_arquivo_service().arquivar(dry_run=bool(data.get('dry_run', False)))
+        
+        return jsonify(result), (200 if result['success'] else 409)
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@admin_bp.route('/admin/arquivo', methods=['GET'])
+def archive_status():
+    """
+    Lista os arquivos de período e a última execução do arquivamento
+    """
+    try:
+        arquivo_service = get_arquivo_service()
+        
+        return jsonify({
+            'success': True,
+            'periodos': arquivo_service.periodos(),
+            'idade_dias': arquivo_service.idade_dias,
+            'ultima_execucao': arquivo_service.ultima_execucao
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@admin_bp.route('/admin/mercadopago/limites', methods=['GET'])
+def mercadopago_limits():
+    """
+    Retorna as métricas do limitador de chamadas ao Mercado Pago
+    (filas por prioridade, taxa atual, esperas médias e respostas 429)
+    """
+    try:
+        return jsonify({
+            'success': True,
+            'endpoints': get_mercadopago_service().metricas_limitador()
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
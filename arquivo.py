@@ -0,0 +1,64 @@
+from flask import Blueprint, request, jsonify
+from src.services.arquivo_service import get_arquivo_service
+
+arquivo_bp = Blueprint('arquivo', __name__)
+
+@arquivo_bp.route('/arquivo/cobrancas/<int:cobranca_id>', methods=['GET'])
+def get_cobranca_com_arquivo(cobranca_id):
+    """
+    Busca uma cobrança pelo id no banco principal e, se não achar, nos arquivos
+    """
+    try:
+        cobranca = get_arquivo_service().obter_cobranca(cobranca_id, incluir_arquivo=True)
+        
+        if not cobranca:
+            return jsonify({
+                'success': False,
+                'error': 'Cobrança não encontrada'
+            }), 404
+        
+        return jsonify({
+            'success': True,
+            'cobranca': cobranca
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@arquivo_bp.route('/arquivo/cobrancas', methods=['GET'])
+def get_cobranca_por_referencia():
+    """
+    Busca uma cobrança pela referência externa, com fallback para os arquivos
+    
+    Query params:
+        external_reference: referência externa da cobrança
+    """
+    try:
+        external_reference = request.args.get('external_reference')
+        if not external_reference:
+            return jsonify({
+                'success': False,
+                'error': 'Informe external_reference'
+            }), 400
+        
+        cobranca = get_arquivo_service().obter_cobranca(external_reference=external_reference, incluir_arquivo=True)
+        
+        if not cobranca:
+            return jsonify({
+                'success': False,
+                'error': 'Cobrança não encontrada'
+            }), 404
+        
+        return jsonify({
+            'success': True,
+            'cobranca': cobranca
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
@@ -0,0 +1,313 @@
+import os
+import re
+import threading
+import time
+from datetime import datetime, timedelta
+from functools import lru_cache
+from sqlalchemy import create_engine, inspect, text
+from src.models.cobranca import Cobranca, CobrancaPayload, EmailOutbox, LembreteCobranca, db
+
+class ArquivoService:
+    """
+    Arquivamento (camada fria) de cobranças finalizadas
+
+    Cobranças aprovadas, rejeitadas, canceladas ou expiradas não mudam mais.
+    Depois de ARQUIVO_IDADE_DIAS elas saem da tabela cobrancas e vão para um
+    arquivo SQLite por mês de atualização (arquivo_data/cobrancas_AAAA_MM.db),
+    com o mesmo esquema. Só meses inteiros são arquivados.
+
+    O payload do Mercado Pago, os emails (email_outbox) e os lembretes da
+    cobrança vão junto para o arquivo. Cobranças com email ainda por enviar
+    (pending ou sending) esperam a outbox terminar, e por isso um mês já
+    arquivado ainda pode receber linhas em execuções seguintes: os arquivos
+    de período não são imutáveis. O backup (BackupService.backup_arquivos)
+    copia de novo um arquivo quando o conteúdo dele muda.
+
+    As leituras podem pedir para consultar também os arquivos (obter,
+    executar_em_arquivos e o histórico de clientes com incluir_arquivo), do
+    mais recente para o mais antigo; as demais veem só o banco principal.
+    """
+
+    STATUS_FINAIS = ('approved', 'rejected', 'cancelled', 'expired')
+    PADRAO_ARQUIVO = re.compile(r'^cobrancas_(\d{4})_(\d{2})\.db$')
+
+    def __init__(self):
+        raiz = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+        self.arquivo_dir = os.getenv('ARQUIVO_DIR', os.path.join(raiz, 'arquivo_data'))
+        self.idade_dias = int(os.getenv('ARQUIVO_IDADE_DIAS', 180))
+        self.tamanho_lote = int(os.getenv('ARQUIVO_LOTE', 1000))
+        self.ultima_execucao = None
+        self._engines = {}
+        self._engines_lock = threading.Lock()
+        self._lock = threading.Lock()
+
+    def caminho_periodo(self, periodo):
+        """Caminho do arquivo de um período (AAAA-MM)"""
+        return os.path.join(self.arquivo_dir, f"cobrancas_{periodo.replace('-', '_')}.db")
+
+    def engine(self, caminho):
+        """Engine (em cache) de um arquivo de período"""
+        with self._engines_lock:
+            engine = self._engines.get(caminho)
+            if engine is None:
+                engine = create_engine(f'sqlite:///{caminho}')
+                self._atualizar_esquema(engine)
+                self._engines[caminho] = engine
+            return engine
+
+    def _atualizar_esquema(self, engine):
+        """Acrescenta a arquivos antigos as colunas novas da tabela cobrancas"""
+        inspector = inspect(engine)
+        if not inspector.has_table(Cobranca.__tablename__):
+            return
+        existentes = {coluna['name'] for coluna in inspector.get_columns(Cobranca.__tablename__)}
+        with engine.begin() as connection:
+            for coluna in Cobranca.__table__.columns:
+                if coluna.name not in existentes and coluna.nullable:
+                    tipo = coluna.type.compile(dialect=engine.dialect)
+                    connection.execute(text(f'ALTER TABLE {Cobranca.__tablename__} ADD COLUMN {coluna.name} {tipo}'))
+
+    def periodos(self):
+        """
+        Lista os arquivos de período existentes, do mais recente para o mais antigo
+
+        Returns:
+            list: [{'periodo', 'filename', 'filepath', 'size'}]
+        """
+        if not os.path.isdir(self.arquivo_dir):
+            return []
+
+        periodos = []
+        for filename in os.listdir(self.arquivo_dir):
+            match = self.PADRAO_ARQUIVO.match(filename)
+            if not match:
+                continue
+            filepath = os.path.join(self.arquivo_dir, filename)
+            periodos.append({
+                'periodo': f'{match.group(1)}-{match.group(2)}',
+                'filename': filename,
+                'filepath': filepath,
+                'size': os.path.getsize(filepath)
+            })
+
+        periodos.sort(key=lambda item: item['periodo'], reverse=True)
+        return periodos
+
+    def limite(self, agora=None):
+        """
+        Início do mês mais recente que ainda não pode ser arquivado
+
+        Todo mês que termina antes de (agora - idade) é elegível.
+        """
+        corte = (agora or datetime.utcnow()) - timedelta(days=self.idade_dias)
+        return datetime(corte.year, corte.month, 1)
+
+    def _filtro_elegiveis(self, limite):
+        email_pendente = db.select(EmailOutbox.id).where(
+            EmailOutbox.cobranca_id == Cobranca.id,
+            EmailOutbox.status.in_(('pending', 'sending'))
+        ).exists()
+        return (Cobranca.status.in_(self.STATUS_FINAIS), Cobranca.data_atualizacao < limite, ~email_pendente)
+
+    def _periodos_elegiveis(self, limite):
+        mes = db.func.strftime('%Y-%m', Cobranca.data_atualizacao)
+        return db.session.execute(
+            db.select(mes, db.func.count(Cobranca.id))
+            .where(*self._filtro_elegiveis(limite))
+            .group_by(mes)
+            .order_by(mes)
+        ).all()
+
+    def arquivar(self, dry_run=False, agora=None):
+        """
+        Move as cobranças finalizadas antigas para os arquivos de período
+
+        Cada lote é gravado no arquivo (INSERT OR IGNORE) e só então apagado
+        do banco principal, cada passo em sua transação: se o processo cair
+        no meio, a próxima execução refaz o lote sem duplicar linhas.
+
+        Args:
+            dry_run (bool): Apenas conta as cobranças elegíveis por período
+            agora (datetime): Instante de referência (UTC); padrão é o atual
+
+        Returns:
+            dict: Métricas da execução
+        """
+        if not self._lock.acquire(blocking=False):
+            return {'success': False, 'error': 'Arquivamento já em andamento'}
+
+        try:
+            inicio = time.perf_counter()
+            limite = self.limite(agora)
+            elegiveis = self._periodos_elegiveis(limite)
+
+            metricas = {
+                'success': True,
+                'dry_run': dry_run,
+                'limite': limite.isoformat(),
+                'periodos': {periodo: total for periodo, total in elegiveis},
+                'arquivadas': 0,
+                'lotes': 0
+            }
+
+            if not dry_run:
+                os.makedirs(self.arquivo_dir, exist_ok=True)
+                for periodo, _ in elegiveis:
+                    self._arquivar_periodo(periodo, limite, metricas)
+
+            metricas['duracao_ms'] = round((time.perf_counter() - inicio) * 1000, 2)
+            if not dry_run:
+                self.ultima_execucao = metricas
+            return metricas
+
+        except Exception as e:
+            db.session.rollback()
+            return {'success': False, 'error': str(e)}
+
+        finally:
+            self._lock.release()
+
+    def _arquivar_periodo(self, periodo, limite, metricas):
+        tabela = Cobranca.__table__
+        # Tabelas que acompanham a cobrança, na ordem de inserção no arquivo
+        dependentes = (CobrancaPayload.__table__, EmailOutbox.__table__, LembreteCobranca.__table__)
+        inicio_mes = datetime.strptime(periodo, '%Y-%m')
+        fim_mes = (inicio_mes.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+        engine = self.engine(self.caminho_periodo(periodo))
+        tabela.create(engine, checkfirst=True)
+        for dependente in dependentes:
+            dependente.create(engine, checkfirst=True)
+
+        while True:
+            linhas = db.session.execute(
+                db.select(tabela)
+                .where(
+                    *self._filtro_elegiveis(limite),
+                    Cobranca.data_atualizacao >= inicio_mes,
+                    Cobranca.data_atualizacao < fim_mes
+                )
+                .order_by(Cobranca.id)
+                .limit(self.tamanho_lote)
+            ).mappings().all()
+
+            if not linhas:
+                break
+
+            ids = [linha['id'] for linha in linhas]
+            relacionadas = {
+                dependente: db.session.execute(
+                    db.select(dependente).where(dependente.c.cobranca_id.in_(ids))
+                ).mappings().all()
+                for dependente in dependentes
+            }
+
+            with engine.begin() as connection:
+                connection.execute(tabela.insert().prefix_with('OR IGNORE'), [dict(linha) for linha in linhas])
+                for dependente, registros in relacionadas.items():
+                    if registros:
+                        connection.execute(dependente.insert().prefix_with('OR IGNORE'), [dict(linha) for linha in registros])
+
+            # Na mesma transação: a cobrança sai do banco junto com o que aponta para ela.
+            # O filtro é refeito no DELETE, porque a cobrança (ou um email dela) pode ter
+            # mudado depois da leitura
+            db.session.execute(
+                db.delete(Cobranca)
+                .where(Cobranca.id.in_(ids), *self._filtro_elegiveis(limite))
+                .execution_options(synchronize_session=False)
+            )
+            # Só os registros das cobranças que de fato saíram do banco
+            restantes = db.select(Cobranca.id).where(Cobranca.id.in_(ids))
+            for dependente in reversed(dependentes):
+                db.session.execute(
+                    db.delete(dependente)
+                    .where(dependente.c.cobranca_id.in_(ids), dependente.c.cobranca_id.not_in(restantes))
+                    .execution_options(synchronize_session=False)
+                )
+            db.session.commit()
+
+            metricas['arquivadas'] += len(ids)
+            metricas['lotes'] += 1
+
+            if len(linhas) < self.tamanho_lote:
+                break
+
+    def executar_em_arquivos(self, consulta):
+        """
+        Executa uma consulta sobre a tabela cobrancas de cada arquivo
+
+        Args:
+            consulta: Select do SQLAlchemy sobre Cobranca
+
+        Yields:
+            tuple: (periodo, linhas)
+        """
+        for item in self.periodos():
+            with self.engine(item['filepath']).connect() as connection:
+                yield item['periodo'], connection.execute(consulta).all()
+
+    def obter(self, cobranca_id=None, external_reference=None):
+        """
+        Procura uma cobrança arquivada por id ou referência externa
+
+        Returns:
+            dict: Cobrança (to_dict com o payload do Mercado Pago) com 'arquivada'
+                e 'periodo_arquivo', ou None
+        """
+        tabela = Cobranca.__table__
+        if cobranca_id is not None:
+            consulta = db.select(tabela).where(tabela.c.id == cobranca_id)
+        elif external_reference:
+            consulta = db.select(tabela).where(tabela.c.external_reference == external_reference)
+        else:
+            return None
+
+        for periodo, linhas in self.executar_em_arquivos(consulta):
+            if linhas:
+                cobranca = Cobranca(**linhas[0]._asdict())
+                dados = cobranca.to_dict()
+                dados['dados_mercadopago'] = self._payload(periodo, cobranca.id)
+                dados['arquivada'] = True
+                dados['periodo_arquivo'] = periodo
+                return dados
+
+        return None
+
+    def _payload(self, periodo, cobranca_id):
+        """Payload do Mercado Pago de uma cobrança arquivada (None se não houver)"""
+        engine = self.engine(self.caminho_periodo(periodo))
+        if not inspect(engine).has_table(CobrancaPayload.__tablename__):
+            return None
+
+        tabela = CobrancaPayload.__table__
+        with engine.connect() as connection:
+            dados = connection.execute(
+                db.select(tabela.c.dados).where(tabela.c.cobranca_id == cobranca_id)
+            ).scalar()
+        return CobrancaPayload(dados=dados).descomprimir() if dados is not None else None
+
+    def obter_cobranca(self, cobranca_id=None, external_reference=None, incluir_arquivo=False):
+        """
+        Busca uma cobrança no banco principal e, se pedido, nos arquivos
+
+        Returns:
+            dict: Cobrança (to_dict com o payload do Mercado Pago, e 'arquivada') ou None
+        """
+        if cobranca_id is not None:
+            cobranca = db.session.get(Cobranca, cobranca_id)
+        else:
+            cobranca = Cobranca.query.filter_by(external_reference=external_reference).first()
+
+        if cobranca is not None:
+            dados = cobranca.to_dict(incluir_payload=True)
+            dados['arquivada'] = False
+            return dados
+
+        if incluir_arquivo:
+            return self.obter(cobranca_id, external_reference)
+        return None
+
+@lru_cache(maxsize=None)
+def get_arquivo_service():
+    """Retorna a instância compartilhada do serviço, criada no primeiro uso"""
+    return ArquivoService()
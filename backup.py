@@ -1,12 +1,11 @@
-from flask import Blueprint, request, jsonify, send_file
-from src.services.backup_service import BackupService
+from flask import Blueprint, Response, request, jsonify, send_file, stream_with_context
+from src.services.backup_service import get_backup_service
+from src.services.backup_store_service import get_backup_store
+import json
 import os
 
 backup_bp = Blueprint('backup', __name__)
 
-# Instanciar serviço de backup
-backup_service = BackupService()
-
 @backup_bp.route('/backup/export', methods=['POST'])
 def export_backup():
     """
@@ -18,6 +17,7 @@ def export_backup():
     }
     """
     try:
+        backup_service = get_backup_service()
         data = request.get_json() or {}
         backup_type = data.get('type', 'full')
         
@@ -26,12 +26,16 @@ def export_backup():
         else:
             filepath = backup_service.export_cobrancas_to_json()
         
+        # Arquivos de cobranças arquivadas novos ou com conteúdo alterado
+        archive_files = backup_service.backup_arquivos()
+        
         return jsonify({
             'success': True,
             'message': 'Backup exportado com sucesso',
             'filepath': filepath,
             'filename': os.path.basename(filepath),
-            'backup_type': backup_type
+            'backup_type': backup_type,
+            'archive_files': archive_files
         })
         
     except Exception as e:
@@ -52,6 +56,7 @@ def commit_backup():
     }
     """
     try:
+        backup_service = get_backup_service()
         data = request.get_json() or {}
         backup_type = data.get('type', 'full')
         
@@ -77,17 +82,57 @@ def commit_backup():
             'error': str(e)
         }), 500
 
+@backup_bp.route('/backup/snapshot', methods=['POST'])
+def snapshot_backup():
+    """
+    Cria um snapshot binário do banco SQLite
+    
+    Body JSON (opcional):
+    {
+        "metodo": "backup" | "vacuum",
+        "comprimir": true
+    }
+    """
+    try:
+        backup_service = get_backup_service()
+        data = request.get_json(silent=True) or {}
+        metodo = data.get('metodo', 'backup')
+        
+        if metodo not in ('backup', 'vacuum'):
+            return jsonify({
+                'success': False,
+                'error': 'Método inválido: use backup ou vacuum'
+            }), 400
+        
+        result = backup_service.criar_snapshot(metodo, comprimir=bool(data.get('comprimir', True)))
+        
+        return jsonify({
+            'success': True,
+            'message': 'Snapshot criado com sucesso',
+            'filename': os.path.basename(result['backup_file']),
+            'size': result['tamanho'],
+            'database_size': result['tamanho_banco'],
+            'sha256': result['sha256']
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 @backup_bp.route('/backup/restore', methods=['POST'])
 def restore_backup():
     """
-    Restaura cobranças de um arquivo JSON
+    Restaura cobranças de um arquivo JSON ou o banco inteiro de um snapshot
     
     Body JSON:
     {
-        "filename": "nome_do_arquivo.json"
+        "filename": "nome_do_arquivo.json" | "cobrancas_snapshot_<timestamp>.db.gz"
     }
     """
     try:
+        backup_service = get_backup_service()
         data = request.get_json()
         
         if not data or not data.get('filename'):
@@ -105,6 +150,19 @@ def restore_backup():
                 'error': 'Arquivo de backup não encontrado'
             }), 404
         
+        if filename.endswith(backup_service.SNAPSHOT_EXTENSOES):
+            result = backup_service.restaurar_snapshot(filepath)
+            if result['success']:
+                return jsonify({
+                    'success': True,
+                    'message': 'Snapshot restaurado com sucesso',
+                    'total_cobrancas': result['total_cobrancas']
+                })
+            return jsonify({
+                'success': False,
+                'error': result['error']
+            }), 500
+        
         result = backup_service.restore_from_json(filepath)
         
         if result['success']:
@@ -133,6 +191,7 @@ def list_backups():
     Lista todos os arquivos de backup disponíveis
     """
     try:
+        backup_service = get_backup_service()
         backup_files = backup_service.list_backup_files()
         
         return jsonify({
@@ -153,6 +212,7 @@ def download_backup(filename):
     Faz download de um arquivo de backup específico
     """
     try:
+        backup_service = get_backup_service()
         filepath = os.path.join(backup_service.backup_dir, filename)
         
         if not os.path.exists(filepath):
@@ -165,7 +225,7 @@ def download_backup(filename):
             filepath,
             as_attachment=True,
             download_name=filename,
-            mimetype='application/json'
+            mimetype='application/json' if filename.endswith('.json') else 'application/octet-stream'
         )
         
     except Exception as e:
@@ -180,6 +240,7 @@ def backup_status():
     Retorna informações sobre o status do sistema de backup
     """
     try:
+        backup_service = get_backup_service()
         # Verificar se é repositório Git
         is_git_repo = os.path.exists('.git')
         
@@ -205,3 +266,140 @@ def backup_status():
             'success': False,
             'error': str(e)
         }), 500
+
+@backup_bp.route('/backup/store', methods=['POST'])
+def store_backup():
+    """
+    Cria um backup incremental no store deduplicado
+    """
+    try:
+        result = get_backup_store().criar_backup()
+        
+        return jsonify({
+            'success': True,
+            'message': 'Backup deduplicado criado com sucesso',
+            'manifest': result['manifest'],
+            'total_cobrancas': result['total_cobrancas'],
+            'linhas_alteradas': result['linhas_alteradas'],
+            'objetos_novos': result['objetos_novos'],
+            'duracao_ms': result['duracao_ms']
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@backup_bp.route('/backup/store/manifests', methods=['GET'])
+def list_store_manifests():
+    """
+    Lista os manifestos do store deduplicado
+    """
+    try:
+        manifestos = get_backup_store().listar_manifestos()
+        
+        return jsonify({
+            'success': True,
+            'manifests': manifestos,
+            'total': len(manifestos)
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@backup_bp.route('/backup/store/manifests/<nome>/download', methods=['GET'])
+def download_store_manifest(nome):
+    """
+    Materializa um manifesto e faz download das cobranças em JSON Lines
+    """
+    try:
+        backup_store = get_backup_store()
+        
+        if backup_store.ler_manifesto(nome) is None:
+            return jsonify({
+                'success': False,
+                'error': 'Manifesto não encontrado'
+            }), 404
+        
+        def gerar():
+            for linha in backup_store.materializar(nome):
+                yield json.dumps(linha, ensure_ascii=False) + '\n'
+        
+        return Response(
+            stream_with_context(gerar()),
+            mimetype='application/x-ndjson',
+            headers={'Content-Disposition': f'attachment; filename=cobrancas_{nome}.jsonl'}
+        )
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@backup_bp.route('/backup/store/restore', methods=['POST'])
+def restore_store_manifest():
+    """
+    Restaura as cobranças de um manifesto do store deduplicado
+    
+    Body JSON:
+    {
+        "manifest": "20240101_120000_000000"
+    }
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        
+        if not data.get('manifest'):
+            return jsonify({
+                'success': False,
+                'error': 'Manifesto é obrigatório'
+            }), 400
+        
+        backup_store = get_backup_store()
+        if backup_store.ler_manifesto(data['manifest']) is None:
+            return jsonify({
+                'success': False,
+                'error': 'Manifesto não encontrado'
+            }), 404
+        
+        result = backup_store.restaurar(data['manifest'])
+        
+        return jsonify(result), (200 if result['success'] else 500)
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@backup_bp.route('/backup/store/gc', methods=['POST'])
+def gc_store():
+    """
+    Remove manifestos antigos e objetos não referenciados do store
+    
+    Body JSON (opcional):
+    {
+        "manter": 30
+    }
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        result = get_backup_store().coletar_lixo(data.get('manter'))
+        
+        return jsonify(result)
+        
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
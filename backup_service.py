@@ -1,13 +1,27 @@
+import gzip
+import hashlib
 import json
 import os
+import shutil
+import sqlite3
 import subprocess
+import tempfile
 from datetime import datetime
-from src.models.cobranca import Cobranca, db
+from functools import lru_cache
+from src.models.cobranca import Cliente, Cobranca, db
 
 class BackupService:
+    # Extensões dos snapshots binários do SQLite (comprimido ou não)
+    SNAPSHOT_EXTENSOES = ('.db.gz', '.db')
+    
     def __init__(self):
         self.backup_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'backup_data')
-        self.ensure_backup_directory()
+        # Páginas copiadas por passo da API de backup e pausa entre passos,
+        # para que os escritores consigam o lock entre um passo e outro
+        self.snapshot_paginas = int(os.getenv('BACKUP_SNAPSHOT_PAGINAS', 1024))
+        self.snapshot_pausa = float(os.getenv('BACKUP_SNAPSHOT_PAUSA_MS', 5)) / 1000
+        # Nível do gzip (0 desliga a compressão)
+        self.snapshot_compressao = int(os.getenv('BACKUP_SNAPSHOT_COMPRESSAO', 6))
     
     def ensure_backup_directory(self):
         """Garante que o diretório de backup existe"""
@@ -22,20 +36,26 @@ class BackupService:
             str: Caminho do arquivo JSON criado
         """
         try:
-            # Buscar todas as cobranças
-            cobrancas = Cobranca.query.all()
+            self.ensure_backup_directory()
+            
+            # Buscar todas as cobranças (payloads em uma consulta só)
+            cobrancas = Cobranca.query.options(db.selectinload(Cobranca.payload)).all()
             
             # Converter para dicionários
             cobrancas_data = []
             for cobranca in cobrancas:
-                cobranca_dict = cobranca.to_dict()
+                cobranca_dict = cobranca.to_dict(incluir_payload=True)
                 cobrancas_data.append(cobranca_dict)
             
+            # Clientes, para o restore manter o agrupamento das cobranças
+            clientes_data = [cliente.to_dict() for cliente in Cliente.query.order_by(Cliente.id)]
+            
             # Criar estrutura do backup
             backup_data = {
                 'export_date': datetime.utcnow().isoformat(),
                 'total_cobrancas': len(cobrancas_data),
                 'cobrancas': cobrancas_data,
+                'clientes': clientes_data,
                 'metadata': {
                     'version': '1.0',
                     'system': 'Sistema de Cobrança Mercado Pago',
@@ -65,28 +85,38 @@ class BackupService:
             str: Caminho do arquivo JSON criado
         """
         try:
+            self.ensure_backup_directory()
+            
             from datetime import timedelta
             
             # Data limite (últimas 24 horas)
             data_limite = datetime.utcnow() - timedelta(hours=24)
             
             # Buscar cobranças recentes
-            cobrancas = Cobranca.query.filter(
+            cobrancas = Cobranca.query.options(db.selectinload(Cobranca.payload)).filter(
                 Cobranca.data_atualizacao >= data_limite
             ).all()
             
             # Converter para dicionários
             cobrancas_data = []
             for cobranca in cobrancas:
-                cobranca_dict = cobranca.to_dict()
+                cobranca_dict = cobranca.to_dict(incluir_payload=True)
                 cobrancas_data.append(cobranca_dict)
             
+            # Só os clientes das cobranças exportadas
+            cliente_ids = {cobranca.cliente_id for cobranca in cobrancas if cobranca.cliente_id}
+            clientes_data = [
+                cliente.to_dict()
+                for cliente in (Cliente.query.filter(Cliente.id.in_(cliente_ids)).order_by(Cliente.id) if cliente_ids else [])
+            ]
+            
             # Criar estrutura do backup
             backup_data = {
                 'export_date': datetime.utcnow().isoformat(),
                 'period': 'last_24_hours',
                 'total_cobrancas': len(cobrancas_data),
                 'cobrancas': cobrancas_data,
+                'clientes': clientes_data,
                 'metadata': {
                     'version': '1.0',
                     'system': 'Sistema de Cobrança Mercado Pago',
@@ -108,13 +138,274 @@ class BackupService:
         except Exception as e:
             raise Exception(f"Erro ao exportar cobranças recentes: {str(e)}")
     
-    def commit_to_git(self, filepath, commit_message=None):
+    def caminho_banco(self):
+        """
+        Caminho do arquivo do banco SQLite em uso
+        
+        Raises:
+            Exception: Se o banco configurado não for um arquivo SQLite
+        """
+        url = db.engine.url
+        if url.get_backend_name() != 'sqlite' or not url.database or url.database == ':memory:':
+            raise Exception("Snapshot disponível apenas para banco SQLite em arquivo")
+        return url.database
+    
+    def calcular_sha256(self, filepath):
+        sha256 = hashlib.sha256()
+        with open(filepath, 'rb') as f:
+            for bloco in iter(lambda: f.read(1024 * 1024), b''):
+                sha256.update(bloco)
+        return sha256.hexdigest()
+    
+    def verificar_integridade(self, filepath):
+        """Roda o PRAGMA integrity_check em um arquivo SQLite"""
+        conn = sqlite3.connect(filepath)
+        try:
+            resultado = conn.execute('PRAGMA integrity_check').fetchone()[0]
+        finally:
+            conn.close()
+        if resultado != 'ok':
+            raise Exception(f"Snapshot corrompido: {resultado}")
+    
+    def criar_snapshot(self, metodo='backup', comprimir=True):
+        """
+        Cria um snapshot binário do banco SQLite
+        
+        Args:
+            metodo (str): 'backup' copia as páginas com a API de backup do
+                SQLite, em passos, sem bloquear os escritores; 'vacuum' usa
+                VACUUM INTO e gera uma cópia compactada (sem páginas livres)
+            comprimir (bool): Comprime o snapshot com gzip
+        
+        Returns:
+            dict: Arquivo criado, tamanho e sha256
+        """
+        try:
+            self.ensure_backup_directory()
+            caminho = self.caminho_banco()
+            
+            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            nome = f'cobrancas_snapshot_{timestamp}.db'
+            
+            # Temporários com ponto e .tmp: nunca aparecem na listagem nem podem ser restaurados
+            fd, temporario = tempfile.mkstemp(prefix='.snapshot-', suffix='.tmp', dir=self.backup_dir)
+            os.close(fd)
+            compactado = None
+            
+            try:
+                origem = sqlite3.connect(caminho)
+                try:
+                    if metodo == 'vacuum':
+                        # VACUUM INTO exige que o destino não exista
+                        os.remove(temporario)
+                        origem.execute('VACUUM INTO ?', (temporario,))
+                    else:
+                        destino = sqlite3.connect(temporario)
+                        try:
+                            origem.backup(destino, pages=self.snapshot_paginas, sleep=self.snapshot_pausa)
+                        finally:
+                            destino.close()
+                finally:
+                    origem.close()
+                
+                self.verificar_integridade(temporario)
+                tamanho_banco = os.path.getsize(temporario)
+                
+                pronto = temporario
+                if comprimir and self.snapshot_compressao > 0:
+                    nome += '.gz'
+                    fd, compactado = tempfile.mkstemp(prefix='.snapshot-', suffix='.gz.tmp', dir=self.backup_dir)
+                    with open(temporario, 'rb') as entrada, os.fdopen(fd, 'wb') as arquivo, \
+                            gzip.GzipFile(filename=nome[:-3], mode='wb', fileobj=arquivo, compresslevel=self.snapshot_compressao) as saida:
+                        shutil.copyfileobj(entrada, saida, 1024 * 1024)
+                    pronto = compactado
+                
+                # Checksum no formato do sha256sum, gravado antes do snapshot
+                # aparecer: todo snapshot listado tem o seu .sha256
+                filepath = os.path.join(self.backup_dir, nome)
+                sha256 = self.calcular_sha256(pronto)
+                with open(filepath + '.sha256.tmp', 'w', encoding='utf-8') as f:
+                    f.write(f'{sha256}  {nome}\n')
+                os.replace(filepath + '.sha256.tmp', filepath + '.sha256')
+                os.replace(pronto, filepath)
+            finally:
+                for restante in (temporario, compactado):
+                    if restante and os.path.exists(restante):
+                        os.remove(restante)
+            
+            return {
+                'success': True,
+                'backup_file': filepath,
+                'metodo': metodo,
+                'tamanho_banco': tamanho_banco,
+                'tamanho': os.path.getsize(filepath),
+                'sha256': sha256
+            }
+            
+        except Exception as e:
+            raise Exception(f"Erro ao criar snapshot: {str(e)}")
+    
+    def restaurar_snapshot(self, filepath):
+        """
+        Restaura o banco a partir de um snapshot binário
+        
+        Exige o .sha256 ao lado do snapshot e confere o checksum; descomprime
+        e valida o snapshot em um arquivo temporário, e então copia todas as
+        páginas para o banco em uso com a API de backup em um único passo: a
+        troca é atômica para as outras conexões (inclusive de outros
+        processos) e respeita o WAL.
+        
+        Args:
+            filepath (str): Caminho do snapshot (.db ou .db.gz)
+        
+        Returns:
+            dict: Resultado da operação
+        """
+        temporario = None
+        try:
+            checksum_path = filepath + '.sha256'
+            if not os.path.exists(checksum_path):
+                return {
+                    'success': False,
+                    'error': 'Snapshot sem arquivo .sha256: restauração recusada'
+                }
+            with open(checksum_path, 'r', encoding='utf-8') as f:
+                esperado = (f.read().split() or [''])[0]
+            if self.calcular_sha256(filepath) != esperado:
+                return {
+                    'success': False,
+                    'error': 'Checksum do snapshot não confere'
+                }
+            
+            caminho = self.caminho_banco()
+            fd, temporario = tempfile.mkstemp(prefix='.restauracao-', suffix='.tmp', dir=os.path.dirname(os.path.abspath(caminho)))
+            with os.fdopen(fd, 'wb') as saida:
+                if filepath.endswith('.gz'):
+                    with gzip.open(filepath, 'rb') as entrada:
+                        shutil.copyfileobj(entrada, saida, 1024 * 1024)
+                else:
+                    with open(filepath, 'rb') as entrada:
+                        shutil.copyfileobj(entrada, saida, 1024 * 1024)
+            
+            self.verificar_integridade(temporario)
+            
+            # Descarta o estado da sessão e as conexões do pool antes da troca
+            db.session.remove()
+            db.engine.dispose()
+            
+            origem = sqlite3.connect(temporario)
+            destino = sqlite3.connect(caminho, timeout=30)
+            try:
+                origem.backup(destino)
+            finally:
+                destino.close()
+                origem.close()
+            
+            return {
+                'success': True,
+                'restored_from': filepath,
+                'total_cobrancas': Cobranca.query.count()
+            }
+            
+        except Exception as e:
+            db.session.rollback()
+            return {
+                'success': False,
+                'error': str(e)
+            }
+        
+        finally:
+            if temporario and os.path.exists(temporario):
+                os.remove(temporario)
+    
+    def backup_arquivos(self):
+        """
+        Copia para o backup os arquivos de cobranças arquivadas novos ou alterados
+        
+        Um mês já arquivado recebe as cobranças que ficam elegíveis depois
+        (por exemplo, quando o email delas sai da outbox). O manifest
+        (backup_data/arquivo/manifest.json) guarda tamanho, mtime e sha256 de
+        cada cópia: arquivos com tamanho e mtime iguais nem são lidos; os
+        demais são copiados para um temporário e só substituem a cópia
+        anterior se o sha256 mudou.
+        
+        Returns:
+            list: Caminhos das cópias feitas nesta execução
+        """
+        try:
+            from src.services.arquivo_service import get_arquivo_service
+            
+            periodos = get_arquivo_service().periodos()
+            if not periodos:
+                return []
+            
+            destino_dir = os.path.join(self.backup_dir, 'arquivo')
+            os.makedirs(destino_dir, exist_ok=True)
+            manifest_path = os.path.join(destino_dir, 'manifest.json')
+            
+            manifest = {}
+            if os.path.exists(manifest_path):
+                with open(manifest_path, 'r', encoding='utf-8') as f:
+                    manifest = json.load(f)
+            
+            copiados = []
+            manifest_alterado = False
+            for item in periodos:
+                stat = os.stat(item['filepath'])
+                registro = manifest.get(item['filename'])
+                if registro and registro['size'] == stat.st_size and registro['mtime'] == stat.st_mtime:
+                    continue
+                
+                # API de backup do SQLite: cópia consistente mesmo com o arquivo aberto
+                destino = os.path.join(destino_dir, item['filename'])
+                temporario = os.path.join(destino_dir, f".{item['filename']}.tmp")
+                origem_conn = sqlite3.connect(item['filepath'])
+                destino_conn = sqlite3.connect(temporario)
+                try:
+                    origem_conn.backup(destino_conn)
+                finally:
+                    destino_conn.close()
+                    origem_conn.close()
+                
+                sha256 = hashlib.sha256()
+                with open(temporario, 'rb') as f:
+                    for bloco in iter(lambda: f.read(1024 * 1024), b''):
+                        sha256.update(bloco)
+                
+                manifest_alterado = True
+                if registro and registro['sha256'] == sha256.hexdigest() and os.path.exists(destino):
+                    # Só o mtime mudou: a cópia anterior continua valendo
+                    os.remove(temporario)
+                    registro.update(size=stat.st_size, mtime=stat.st_mtime)
+                    continue
+                
+                os.replace(temporario, destino)
+                manifest[item['filename']] = {
+                    'size': stat.st_size,
+                    'mtime': stat.st_mtime,
+                    'sha256': sha256.hexdigest(),
+                    'backup_date': datetime.utcnow().isoformat()
+                }
+                copiados.append(destino)
+            
+            if manifest_alterado:
+                with open(manifest_path, 'w', encoding='utf-8') as f:
+                    json.dump(manifest, f, ensure_ascii=False, indent=2)
+                copiados.append(manifest_path)
+            
+            return copiados
+            
+        except Exception as e:
+            raise Exception(f"Erro ao copiar arquivos de cobranças arquivadas: {str(e)}")
+    
+    def commit_to_git(self, filepath, commit_message=None, extra_files=None):
         """
         Faz commit do arquivo de backup no Git
         
         Args:
             filepath (str): Caminho do arquivo para commit
             commit_message (str): Mensagem do commit (opcional)
+            extra_files (list): Outros arquivos do mesmo commit (opcional)
         
         Returns:
             dict: Resultado da operação
@@ -128,7 +419,7 @@ class BackupService:
                 }
             
             # Adicionar arquivo ao Git
-            subprocess.run(['git', 'add', filepath], check=True, cwd=os.path.dirname(filepath))
+            subprocess.run(['git', 'add', filepath, *(extra_files or [])], check=True, cwd=os.path.dirname(filepath))
             
             # Mensagem padrão se não fornecida
             if not commit_message:
@@ -160,26 +451,43 @@ class BackupService:
         Executa backup completo e commit no Git
         
         Args:
-            backup_type (str): 'full' para backup completo, 'latest' para últimas 24h
+            backup_type (str): 'full' para backup completo, 'latest' para últimas 24h,
+                'snapshot' para snapshot binário do SQLite, 'dedup' para o store deduplicado
         
         Returns:
             dict: Resultado da operação
         """
         try:
             # Escolher tipo de backup
+            extras = []
             if backup_type == 'latest':
                 filepath = self.export_latest_cobrancas()
                 commit_msg = f"Backup incremental - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
+            elif backup_type == 'dedup':
+                from src.services.backup_store_service import get_backup_store
+                backup_store = get_backup_store()
+                filepath = backup_store.criar_backup()['manifest_file']
+                # Diretório inteiro: objetos novos e os removidos pela coleta de lixo
+                extras.append(backup_store.store_dir)
+                commit_msg = f"Backup deduplicado - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
+            elif backup_type == 'snapshot':
+                filepath = self.criar_snapshot()['backup_file']
+                extras.append(filepath + '.sha256')
+                commit_msg = f"Snapshot do banco - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
             else:
                 filepath = self.export_cobrancas_to_json()
                 commit_msg = f"Backup completo - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
             
+            # Arquivos de cobranças arquivadas: só os novos ou com conteúdo alterado
+            arquivos = self.backup_arquivos()
+            
             # Fazer commit
-            git_result = self.commit_to_git(filepath, commit_msg)
+            git_result = self.commit_to_git(filepath, commit_msg, extra_files=extras + arquivos)
             
             return {
                 'success': True,
                 'backup_file': filepath,
+                'archive_files': arquivos,
                 'git_result': git_result,
                 'backup_type': backup_type
             }
@@ -216,41 +524,61 @@ class BackupService:
             restored_count = 0
             skipped_count = 0
             
-            # Restaurar cada cobrança
-            for cobranca_dict in cobrancas_data:
-                # Verificar se já existe (por external_reference)
-                existing = Cobranca.query.filter_by(
-                    external_reference=cobranca_dict['external_reference']
-                ).first()
+            # Um evento por cobrança restaurada lotaria os streams: os clientes
+            # recebem um único reset no fim
+            from src.services.eventos_service import get_event_broker, sem_eventos
+            with sem_eventos(db.session):
+                # Clientes do backup (backups antigos não têm): id no backup -> cliente
+                from src.services.cliente_service import get_cliente_service
+                clientes = {}
+                for cliente_dict in backup_data.get('clientes', []):
+                    clientes[cliente_dict['id']] = get_cliente_service().obter_ou_criar(
+                        cliente_dict['nome'],
+                        cliente_dict['email'],
+                        cliente_dict.get('telefone'),
+                        cliente_dict.get('documento')
+                    )
+            
+                # Restaurar cada cobrança
+                for cobranca_dict in cobrancas_data:
+                    # Verificar se já existe (por external_reference)
+                    existing = Cobranca.query.filter_by(
+                        external_reference=cobranca_dict['external_reference']
+                    ).first()
                 
-                if existing:
-                    skipped_count += 1
-                    continue
+                    if existing:
+                        skipped_count += 1
+                        continue
                 
-                # Criar nova cobrança
-                cobranca = Cobranca(
-                    external_reference=cobranca_dict['external_reference'],
-                    mercadopago_id=cobranca_dict.get('mercadopago_id'),
-                    cliente_nome=cobranca_dict['cliente_nome'],
-                    cliente_email=cobranca_dict['cliente_email'],
-                    cliente_telefone=cobranca_dict.get('cliente_telefone'),
-                    cliente_documento=cobranca_dict.get('cliente_documento'),
-                    titulo=cobranca_dict['titulo'],
-                    descricao=cobranca_dict.get('descricao'),
-                    valor=cobranca_dict['valor'],
-                    status=cobranca_dict['status'],
-                    payment_url=cobranca_dict.get('payment_url')
-                )
+                    # Criar nova cobrança
+                    cobranca = Cobranca(
+                        external_reference=cobranca_dict['external_reference'],
+                        mercadopago_id=cobranca_dict.get('mercadopago_id'),
+                        cliente_nome=cobranca_dict['cliente_nome'],
+                        cliente_email=cobranca_dict['cliente_email'],
+                        cliente_telefone=cobranca_dict.get('cliente_telefone'),
+                        cliente_documento=cobranca_dict.get('cliente_documento'),
+                        titulo=cobranca_dict['titulo'],
+                        descricao=cobranca_dict.get('descricao'),
+                        valor=cobranca_dict['valor'],
+                        status=cobranca_dict['status'],
+                        payment_url=cobranca_dict.get('payment_url'),
+                        # Sem cliente no backup, o vínculo é feito no flush pelos dados da cobrança
+                        cliente=clientes.get(cobranca_dict.get('cliente_id'))
+                    )
                 
-                # Definir dados do Mercado Pago se existirem
-                if cobranca_dict.get('dados_mercadopago'):
-                    cobranca.set_dados_mercadopago(cobranca_dict['dados_mercadopago'])
+                    # Definir dados do Mercado Pago se existirem
+                    if cobranca_dict.get('dados_mercadopago'):
+                        cobranca.set_dados_mercadopago(cobranca_dict['dados_mercadopago'])
                 
-                db.session.add(cobranca)
-                restored_count += 1
+                    db.session.add(cobranca)
+                    restored_count += 1
             
-            # Salvar no banco
-            db.session.commit()
+                # Salvar no banco
+                db.session.commit()
+
+            if restored_count:
+                get_event_broker().publicar('reset', {})
             
             return {
                 'success': True,
@@ -276,14 +604,20 @@ class BackupService:
         try:
             backup_files = []
             
+            if not os.path.exists(self.backup_dir):
+                return backup_files
+            
             for filename in os.listdir(self.backup_dir):
-                if filename.endswith('.json'):
+                if filename.startswith('.'):
+                    continue
+                if filename.endswith('.json') or filename.endswith(self.SNAPSHOT_EXTENSOES):
                     filepath = os.path.join(self.backup_dir, filename)
                     stat = os.stat(filepath)
                     
                     backup_files.append({
                         'filename': filename,
                         'filepath': filepath,
+                        'format': 'json' if filename.endswith('.json') else 'snapshot',
                         'size': stat.st_size,
                         'created': datetime.fromtimestamp(stat.st_ctime).isoformat(),
                         'modified': datetime.fromtimestamp(stat.st_mtime).isoformat()
@@ -296,3 +630,8 @@ class BackupService:
             
         except Exception as e:
             return []
+
+@lru_cache(maxsize=None)
+def get_backup_service():
+    """Retorna a instância compartilhada do serviço, criada no primeiro uso"""
+    return BackupService()
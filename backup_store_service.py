@@ -0,0 +1,387 @@
+import hashlib
+import json
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from functools import lru_cache
+from src.models.cobranca import Cobranca, CobrancaPayload, db
+
+class BackupStore:
+    """
+    Backup deduplicado por conteúdo (content-addressed)
+
+    Cada versão de uma cobrança é gravada uma única vez em
+    store/objects/<hh>/<sha256>, com o JSON canônico da linha. As linhas são
+    agrupadas em páginas de PAGINA ids consecutivos; cada página (lista de
+    [id, data_atualizacao, versao, hash da linha]) também é um objeto. Um
+    backup é um manifesto pequeno com os hashes das páginas.
+
+    Como a maioria das cobranças não muda entre dois backups, as páginas
+    antigas se repetem e só as linhas novas ou alteradas geram objetos. Só
+    essas linhas são lidas por inteiro do banco: as demais são reconhecidas
+    por (id, data_atualizacao, versao) no manifesto anterior. A coluna versao
+    é incrementada por trigger em toda escrita na linha ou no seu payload,
+    inclusive nas que preservam data_atualizacao (vínculo de clientes,
+    migrações).
+
+    Backup e coleta de lixo não rodam ao mesmo tempo (flock em store/.lock):
+    a coleta não apaga objetos que um backup em andamento está reaproveitando.
+    """
+
+    VERSAO = '2'
+    PAGINA = 1000
+
+    def __init__(self, backup_dir):
+        self.store_dir = os.path.join(backup_dir, 'store')
+        self.objects_dir = os.path.join(self.store_dir, 'objects')
+        self.manifests_dir = os.path.join(self.store_dir, 'manifests')
+        # Manifestos mantidos pela coleta de lixo (os mais recentes)
+        self.manter = int(os.getenv('BACKUP_STORE_MANTER', 30))
+
+    @contextmanager
+    def _bloqueio(self):
+        """Exclusão mútua entre backups e coleta de lixo, inclusive de outros processos"""
+        import fcntl
+
+        os.makedirs(self.store_dir, exist_ok=True)
+        with open(os.path.join(self.store_dir, '.lock'), 'a') as arquivo:
+            fcntl.flock(arquivo, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(arquivo, fcntl.LOCK_UN)
+
+    def _caminho_objeto(self, hash_):
+        return os.path.join(self.objects_dir, hash_[:2], hash_)
+
+    def _gravar_atomico(self, caminho, conteudo):
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        temporario = f'{caminho}.tmp{os.getpid()}'
+        with open(temporario, 'wb') as f:
+            f.write(conteudo)
+        os.replace(temporario, caminho)
+
+    def gravar_objeto(self, dados):
+        """
+        Grava um objeto pelo hash do seu JSON canônico, se ainda não existir
+
+        Returns:
+            tuple: (hash, novo)
+        """
+        conteudo = json.dumps(dados, ensure_ascii=False, sort_keys=True, separators=(',', ':')).encode('utf-8')
+        hash_ = hashlib.sha256(conteudo).hexdigest()
+        caminho = self._caminho_objeto(hash_)
+        if os.path.exists(caminho):
+            return hash_, False
+        self._gravar_atomico(caminho, conteudo)
+        return hash_, True
+
+    def ler_objeto(self, hash_):
+        with open(self._caminho_objeto(hash_), 'rb') as f:
+            return json.loads(f.read())
+
+    def serializar_linha(self, linha, payload=None):
+        """Linha completa da tabela cobrancas, com datas em ISO 8601 e o payload do Mercado Pago"""
+        dados = {
+            chave: valor.isoformat() if isinstance(valor, datetime) else valor
+            for chave, valor in linha.items()
+        }
+        if payload is not None:
+            dados['dados_mercadopago'] = payload
+        return dados
+
+    def listar_manifestos(self):
+        """
+        Lista os manifestos, do mais recente para o mais antigo
+
+        Returns:
+            list: [{'nome', 'filepath', 'created', 'total', 'size'}]
+        """
+        if not os.path.isdir(self.manifests_dir):
+            return []
+
+        manifestos = []
+        for filename in sorted(os.listdir(self.manifests_dir), reverse=True):
+            if not filename.endswith('.json'):
+                continue
+            filepath = os.path.join(self.manifests_dir, filename)
+            with open(filepath, 'r', encoding='utf-8') as f:
+                manifesto = json.load(f)
+            manifestos.append({
+                'nome': filename[:-len('.json')],
+                'filepath': filepath,
+                'created': manifesto['created'],
+                'total': manifesto['total'],
+                'size': os.path.getsize(filepath)
+            })
+        return manifestos
+
+    def ler_manifesto(self, nome):
+        filepath = os.path.join(self.manifests_dir, f'{os.path.basename(nome)}.json')
+        if not os.path.exists(filepath):
+            return None
+        with open(filepath, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _entradas_anteriores(self):
+        """id -> (data_atualizacao, versao, hash) segundo o manifesto mais recente"""
+        manifestos = self.listar_manifestos()
+        if not manifestos:
+            return {}
+
+        anteriores = {}
+        for hash_pagina in self.ler_manifesto(manifestos[0]['nome'])['paginas']:
+            for entrada in self.ler_objeto(hash_pagina):
+                if len(entrada) == 3:
+                    # Manifestos da versão 1, sem a versão da linha: relidas no próximo backup
+                    cobranca_id, data_atualizacao, hash_linha = entrada
+                    anteriores[cobranca_id] = (data_atualizacao, None, hash_linha)
+                else:
+                    cobranca_id, data_atualizacao, versao, hash_linha = entrada
+                    anteriores[cobranca_id] = (data_atualizacao, versao, hash_linha)
+        return anteriores
+
+    def criar_backup(self):
+        """
+        Cria um backup incremental (novo manifesto)
+
+        Returns:
+            dict: Manifesto criado e quantos objetos foram gravados ou reaproveitados
+        """
+        with self._bloqueio():
+            return self._criar_backup()
+
+    def _criar_backup(self):
+        inicio = time.perf_counter()
+        anteriores = self._entradas_anteriores()
+
+        versoes = db.session.execute(
+            db.select(Cobranca.id, Cobranca.data_atualizacao, Cobranca.versao).order_by(Cobranca.id)
+        ).all()
+
+        entradas = {}
+        alteradas = []
+        for cobranca_id, data_atualizacao, versao in versoes:
+            data_iso = data_atualizacao.isoformat() if data_atualizacao else None
+            anterior = anteriores.get(cobranca_id)
+            if anterior and anterior[:2] == (data_iso, versao):
+                entradas[cobranca_id] = anterior
+            else:
+                alteradas.append(cobranca_id)
+
+        # Linhas novas ou alteradas: lidas por inteiro, em lotes
+        novos_objetos = 0
+        tabela = Cobranca.__table__
+        for i in range(0, len(alteradas), 500):
+            lote = alteradas[i:i + 500]
+            linhas = db.session.execute(
+                db.select(tabela).where(tabela.c.id.in_(lote))
+            ).mappings().all()
+            payloads = {
+                payload.cobranca_id: payload.descomprimir()
+                for payload in db.session.execute(
+                    db.select(CobrancaPayload).where(CobrancaPayload.cobranca_id.in_(lote))
+                ).scalars()
+            }
+            for linha in linhas:
+                dados = self.serializar_linha(linha, payloads.get(linha['id']))
+                hash_, novo = self.gravar_objeto(dados)
+                novos_objetos += novo
+                entradas[dados['id']] = (dados['data_atualizacao'], dados['versao'], hash_)
+
+        # Páginas por faixa de ids: páginas sem mudança geram o mesmo hash
+        paginas = {}
+        for cobranca_id in sorted(entradas):
+            paginas.setdefault(cobranca_id // self.PAGINA, []).append([cobranca_id, *entradas[cobranca_id]])
+
+        hashes_paginas = []
+        for numero in sorted(paginas):
+            hash_, novo = self.gravar_objeto(paginas[numero])
+            novos_objetos += novo
+            hashes_paginas.append(hash_)
+
+        agora = datetime.utcnow()
+        nome = agora.strftime('%Y%m%d_%H%M%S_%f')
+        manifesto = {
+            'version': self.VERSAO,
+            'created': agora.isoformat(),
+            'total': len(entradas),
+            'paginas': hashes_paginas
+        }
+        filepath = os.path.join(self.manifests_dir, f'{nome}.json')
+        self._gravar_atomico(filepath, json.dumps(manifesto, indent=1).encode('utf-8'))
+
+        return {
+            'success': True,
+            'manifest': nome,
+            'manifest_file': filepath,
+            'total_cobrancas': len(entradas),
+            'linhas_alteradas': len(alteradas),
+            'objetos_novos': novos_objetos,
+            'duracao_ms': round((time.perf_counter() - inicio) * 1000, 2)
+        }
+
+    def materializar(self, nome):
+        """
+        Reconstrói as linhas de um manifesto
+
+        Yields:
+            dict: Linha completa da tabela cobrancas (datas em ISO 8601)
+        """
+        manifesto = self.ler_manifesto(nome)
+        if manifesto is None:
+            raise Exception(f"Manifesto não encontrado: {nome}")
+
+        for hash_pagina in manifesto['paginas']:
+            for entrada in self.ler_objeto(hash_pagina):
+                # O hash da linha é sempre o último campo da entrada
+                yield self.ler_objeto(entrada[-1])
+
+    def restaurar(self, nome):
+        """
+        Restaura as cobranças de um manifesto que não existem no banco
+
+        As linhas voltam com todas as colunas (inclusive ids e datas) e com o
+        payload do Mercado Pago; as que já existem (mesma external_reference)
+        são mantidas como estão. Os clientes não fazem parte do store: as
+        cobranças restauradas são religadas a eles pelos dados de cada uma.
+
+        Returns:
+            dict: Resultado da operação
+        """
+        try:
+            tabela = Cobranca.__table__
+            colunas_data = {coluna.name for coluna in tabela.columns if isinstance(coluna.type, db.DateTime)}
+            restauradas = 0
+            ignoradas = 0
+            lote = []
+
+            def gravar(lote):
+                existentes = set(db.session.execute(
+                    db.select(Cobranca.external_reference)
+                    .where(Cobranca.external_reference.in_([linha['external_reference'] for linha in lote]))
+                ).scalars())
+                novas = [linha for linha in lote if linha['external_reference'] not in existentes]
+                if novas:
+                    db.session.execute(tabela.insert().prefix_with('OR IGNORE'), novas)
+                    payloads = [
+                        {
+                            'cobranca_id': linha['id'],
+                            'dados': CobrancaPayload.comprimir(payloads_lote[linha['id']]),
+                            'data_atualizacao': linha['data_atualizacao']
+                        }
+                        for linha in novas if payloads_lote.get(linha['id'])
+                    ]
+                    if payloads:
+                        db.session.execute(CobrancaPayload.__table__.insert().prefix_with('OR IGNORE'), payloads)
+                payloads_lote.clear()
+                return len(novas), len(lote) - len(novas)
+
+            payloads_lote = {}
+            for dados in self.materializar(nome):
+                payload = dados.pop('dados_mercadopago', None)
+                if isinstance(payload, str):
+                    # Objetos gravados antes da tabela cobrancas_payloads
+                    payload = json.loads(payload)
+                payloads_lote[dados['id']] = payload
+
+                # Todas as colunas em todas as linhas (objetos antigos não têm as mais novas)
+                dados = {coluna.name: dados.get(coluna.name) for coluna in tabela.columns}
+                dados['cliente_id'] = None
+                for coluna in colunas_data:
+                    if dados.get(coluna):
+                        dados[coluna] = datetime.fromisoformat(dados[coluna])
+                lote.append(dados)
+                if len(lote) >= 500:
+                    novas, repetidas = gravar(lote)
+                    restauradas += novas
+                    ignoradas += repetidas
+                    lote = []
+
+            if lote:
+                novas, repetidas = gravar(lote)
+                restauradas += novas
+                ignoradas += repetidas
+
+            db.session.commit()
+
+            from src.services.cliente_service import get_cliente_service
+            get_cliente_service().vincular_cobrancas()
+
+            return {
+                'success': True,
+                'restored_count': restauradas,
+                'skipped_count': ignoradas
+            }
+
+        except Exception as e:
+            db.session.rollback()
+            return {
+                'success': False,
+                'error': str(e)
+            }
+
+    def coletar_lixo(self, manter=None):
+        """
+        Remove os manifestos além dos `manter` mais recentes e os objetos que
+        nenhum manifesto restante referencia (exceto os criados na última hora)
+
+        Returns:
+            dict: Quantidade de manifestos e objetos removidos
+
+        Raises:
+            ValueError: Se manter não for um inteiro maior ou igual a 1 (com
+                0 todos os manifestos, e depois todos os objetos, seriam apagados)
+        """
+        manter = self.manter if manter is None else manter
+        if isinstance(manter, bool) or not isinstance(manter, int) or manter < 1:
+            raise ValueError(f'manter deve ser um inteiro maior ou igual a 1 (recebido: {manter!r})')
+
+        with self._bloqueio():
+            return self._coletar_lixo(manter)
+
+    def _coletar_lixo(self, manter):
+        manifestos = self.listar_manifestos()
+
+        removidos_manifestos = 0
+        for item in manifestos[manter:]:
+            os.remove(item['filepath'])
+            removidos_manifestos += 1
+
+        referenciados = set()
+        for item in manifestos[:manter]:
+            for hash_pagina in self.ler_manifesto(item['nome'])['paginas']:
+                if hash_pagina in referenciados:
+                    continue
+                referenciados.add(hash_pagina)
+                referenciados.update(entrada[-1] for entrada in self.ler_objeto(hash_pagina))
+
+        # Objetos recentes podem ser de um backup interrompido antes de gravar o manifesto
+        limite = time.time() - 3600
+
+        removidos_objetos = 0
+        liberados = 0
+        if os.path.isdir(self.objects_dir):
+            for prefixo in os.listdir(self.objects_dir):
+                diretorio = os.path.join(self.objects_dir, prefixo)
+                for hash_ in os.listdir(diretorio):
+                    caminho = os.path.join(diretorio, hash_)
+                    if hash_ in referenciados or os.path.getmtime(caminho) > limite:
+                        continue
+                    liberados += os.path.getsize(caminho)
+                    os.remove(caminho)
+                    removidos_objetos += 1
+
+        return {
+            'success': True,
+            'manifestos_removidos': removidos_manifestos,
+            'objetos_removidos': removidos_objetos,
+            'bytes_liberados': liberados
+        }
+
+@lru_cache(maxsize=None)
+def get_backup_store():
+    """Retorna a instância compartilhada do store, criada no primeiro uso"""
+    from src.services.backup_service import get_backup_service
+    return BackupStore(get_backup_service().backup_dir)
@@ -0,0 +1,116 @@
+"""
+Benchmark da busca textual (FTS5) sobre cobranças sintéticas
+
+Popula um banco SQLite temporário com N cobranças (com os triggers ativos),
+mede a reconstrução completa do índice e a latência de consultas típicas
+(nome, email, documento, referência) em p50/p95.
+
+Uso:
+    python -m benchmarks.bench_busca --rows 1000000 --repeat 50
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import string
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from sqlalchemy import create_engine, insert, text
+from src.models.cobranca import Cobranca
+from src.services.busca_service import BuscaService, FTS_BUSCA
+
+NOMES = ['José', 'Maria', 'João', 'Ana', 'Antônio', 'Francisca', 'Carlos', 'Paula', 'Luís', 'Márcia']
+SOBRENOMES = ['Silva', 'Santos', 'Oliveira', 'Souza', 'Conceição', 'Pereira', 'Lima', 'Araújo', 'Gonçalves']
+TITULOS = ['Mensalidade', 'Consultoria', 'Manutenção', 'Licença anual', 'Serviço avulso', 'Assinatura']
+
+def gerar_linhas(inicio, quantidade, rnd):
+    agora = datetime.utcnow()
+    linhas = []
+    for i in range(inicio, inicio + quantidade):
+        nome = f'{rnd.choice(NOMES)} {rnd.choice(SOBRENOMES)} {rnd.choice(SOBRENOMES)}'
+        usuario = ''.join(rnd.choices(string.ascii_lowercase, k=8))
+        linhas.append({
+            'external_reference': f'COB-{i:08d}',
+            'cliente_nome': nome,
+            'cliente_email': f'{usuario}@exemplo.com.br',
+            'cliente_documento': f'{rnd.randrange(10**11):011d}',
+            'titulo': f'{rnd.choice(TITULOS)} {i % 12 + 1:02d}/2026',
+            'valor': round(rnd.uniform(10, 5000), 2),
+            'status': 'pending',
+            'data_criacao': agora,
+            'data_atualizacao': agora
+        })
+    return linhas
+
+def medir(connection, consulta, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        connection.execute(text(FTS_BUSCA), {'consulta': consulta, 'limite': 20, 'offset': 0}).all()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    tempos.sort()
+    return {
+        'p50_ms': round(statistics.median(tempos), 3),
+        'p95_ms': round(tempos[int(len(tempos) * 0.95) - 1], 3)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark da busca FTS5')
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--batch', type=int, default=20_000)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    rnd = random.Random(42)
+    busca_service = BuscaService()
+    resultado = {'rows': args.rows}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'busca.db')}")
+        Cobranca.__table__.create(engine)
+
+        with engine.begin() as connection:
+            busca_service.garantir_indice(connection)
+
+        inicio = time.perf_counter()
+        for offset in range(0, args.rows, args.batch):
+            with engine.begin() as connection:
+                connection.execute(insert(Cobranca.__table__), gerar_linhas(offset, min(args.batch, args.rows - offset), rnd))
+        resultado['insert_with_triggers_s'] = round(time.perf_counter() - inicio, 2)
+
+        inicio = time.perf_counter()
+        with engine.begin() as connection:
+            busca_service.reconstruir(connection)
+        resultado['rebuild_s'] = round(time.perf_counter() - inicio, 2)
+
+        with engine.connect() as connection:
+            exemplo = connection.execute(text(
+                'SELECT cliente_email, cliente_documento, external_reference FROM cobrancas WHERE id = :id'
+            ), {'id': args.rows // 2}).one()
+
+            consultas = {
+                'nome_prefixo': 'conce',
+                'nome_completo': 'maria souza lima',
+                'email_prefixo': exemplo.cliente_email[:5],
+                'documento': exemplo.cliente_documento,
+                'referencia': exemplo.external_reference,
+                'titulo': 'licenca'
+            }
+            resultado['queries'] = {
+                nome: medir(connection, busca_service.montar_consulta(termo), args.repeat)
+                for nome, termo in consultas.items()
+            }
+
+        engine.dispose()
+
+    print(json.dumps(resultado, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+"""
+Benchmark de cold start e invocações quentes da função Netlify (api.py)
+
+Cada rodada roda em um interpretador novo, como um container recém-criado:
+mede o import do módulo, a primeira invocação (fria) e a mediana de
+invocações seguintes (quentes) de cada cenário. Para comparação, o cenário
+"aplicacao" faz a mesma listagem pela aplicação Flask completa.
+
+Uso:
+    python -m benchmarks.bench_netlify --rounds 5 --warm 50 --cobrancas 1000
+    python -m benchmarks.bench_netlify --only listagem --max-cold-ms 50
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Caminho de cada cenário: (método, path, query string)
+CENARIOS = {
+    'listagem': ('GET', '/api/cobrancas', 'page=1&per_page=10'),
+    'detalhe': ('GET', '/api/cobrancas/1', ''),
+    'aplicacao': ('GET', '/api/backup/status', '')
+}
+
+PREPARO = """
+import sys
+from datetime import datetime
+from sqlalchemy import insert
+from src.main import create_app
+from src.models.cobranca import Cobranca, db
+
+quantidade = int(sys.argv[1])
+app = create_app()
+with app.app_context():
+    agora = datetime.utcnow()
+    db.session.execute(insert(Cobranca), [
+        {
+            'external_reference': f'COB-{i:08d}',
+            'cliente_nome': f'Cliente {i}',
+            'cliente_email': f'cliente{i}@exemplo.com.br',
+            'titulo': 'Mensalidade',
+            'valor': 100.0 + i,
+            'status': 'pending' if i % 3 else 'approved',
+            'data_criacao': agora,
+            'data_atualizacao': agora,
+            'data_vencimento': agora
+        }
+        for i in range(quantidade)
+    ])
+    db.session.commit()
+"""
+
+RODADA = """
+import json, os, sys, time
+metodo, path, query, quentes = sys.argv[1], sys.argv[2], sys.argv[3], int(sys.argv[4])
+evento = {'httpMethod': metodo, 'path': path, 'rawQuery': query, 'headers': {}, 'body': None}
+
+t0 = time.perf_counter()
+sys.path.insert(0, os.path.join(os.getcwd(), 'netlify', 'functions'))
+import api
+t1 = time.perf_counter()
+resposta = api.handler(evento, None)
+t2 = time.perf_counter()
+
+tempos = []
+for _ in range(quentes):
+    inicio = time.perf_counter()
+    api.handler(evento, None)
+    tempos.append((time.perf_counter() - inicio) * 1000)
+
+modulos_pesados = [nome for nome in ('flask', 'sqlalchemy', 'flask_sqlalchemy', 'mercadopago', 'dotenv') if nome in sys.modules]
+print(json.dumps({
+    'import_ms': (t1 - t0) * 1000,
+    'cold_ms': (t2 - t1) * 1000,
+    'warm_ms': sorted(tempos)[len(tempos) // 2] if tempos else None,
+    'status_code': resposta['statusCode'],
+    'modulos_pesados': modulos_pesados
+}))
+"""
+
+def executar(codigo, env, *args):
+    resultado = subprocess.run(
+        [sys.executable, '-c', codigo, *map(str, args)],
+        cwd=ROOT_DIR, env=env, capture_output=True, text=True, check=True
+    )
+    return resultado.stdout.strip().splitlines()[-1] if resultado.stdout.strip() else ''
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de cold start da função Netlify')
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--warm', type=int, default=50, help='Invocações quentes por rodada')
+    parser.add_argument('--cobrancas', type=int, default=1000, help='Cobranças no banco de teste')
+    parser.add_argument('--only', default=None, help='Cenários separados por vírgula')
+    parser.add_argument('--max-cold-ms', type=float, default=None, help='Limite para import + primeira invocação da listagem')
+    parser.add_argument('--output', default=None)
+    args = parser.parse_args()
+
+    cenarios = args.only.split(',') if args.only else list(CENARIOS)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        executar(PREPARO, env, args.cobrancas)
+
+        resultados = {}
+        for nome in cenarios:
+            metodo, path, query = CENARIOS[nome]
+            rodadas = [json.loads(executar(RODADA, env, metodo, path, query, args.warm)) for _ in range(args.rounds)]
+            resultados[nome] = {
+                chave: round(statistics.median(r[chave] for r in rodadas), 3)
+                for chave in ('import_ms', 'cold_ms', 'warm_ms')
+            }
+            resultados[nome]['status_code'] = rodadas[-1]['status_code']
+            resultados[nome]['modulos_pesados'] = rodadas[-1]['modulos_pesados']
+
+    print(json.dumps(resultados, indent=2))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(resultados, f, indent=2)
+
+    if args.max_cold_ms is not None and 'listagem' in resultados:
+        frio = resultados['listagem']['import_ms'] + resultados['listagem']['cold_ms']
+        if frio > args.max_cold_ms:
+            print(f"REGRESSÃO: cold start da listagem {frio:.2f} ms > {args.max_cold_ms}", file=sys.stderr)
+            return 1
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,75 @@
+"""
+Benchmark de inicialização da aplicação
+
+Mede, em um interpretador novo a cada rodada, o tempo de importar o módulo
+principal, de executar create_app() e da primeira requisição. Falha (código
+de saída 1) se a mediana passar dos limites informados.
+
+Uso:
+    python -m benchmarks.bench_startup --rounds 5 --max-import-ms 150 --max-first-request-ms 500
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+RODADA = """
+import json, time
+t0 = time.perf_counter()
+from src.main import create_app
+t1 = time.perf_counter()
+app = create_app()
+t2 = time.perf_counter()
+response = app.test_client().get('/api/backup/status')
+t3 = time.perf_counter()
+print(json.dumps({
+    'import_ms': (t1 - t0) * 1000,
+    'create_app_ms': (t2 - t1) * 1000,
+    'first_request_ms': (t3 - t2) * 1000,
+    'status_code': response.status_code
+}))
+"""
+
+def executar_rodada(database_url):
+    env = dict(os.environ, DATABASE_URL=database_url)
+    resultado = subprocess.run(
+        [sys.executable, '-c', RODADA],
+        cwd=ROOT_DIR, env=env, capture_output=True, text=True, check=True
+    )
+    return json.loads(resultado.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de inicialização')
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--max-import-ms', type=float, default=None)
+    parser.add_argument('--max-first-request-ms', type=float, default=None)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        rodadas = [executar_rodada(database_url) for _ in range(args.rounds)]
+
+    resumo = {
+        chave: round(statistics.median(r[chave] for r in rodadas), 2)
+        for chave in ('import_ms', 'create_app_ms', 'first_request_ms')
+    }
+    print(json.dumps(resumo, indent=2))
+
+    falhas = []
+    if args.max_import_ms is not None and resumo['import_ms'] > args.max_import_ms:
+        falhas.append(f"import_ms {resumo['import_ms']} > {args.max_import_ms}")
+    if args.max_first_request_ms is not None and resumo['first_request_ms'] > args.max_first_request_ms:
+        falhas.append(f"first_request_ms {resumo['first_request_ms']} > {args.max_first_request_ms}")
+
+    for falha in falhas:
+        print(f"REGRESSÃO: {falha}", file=sys.stderr)
+
+    return 1 if falhas else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,321 @@
+"""
+Suíte de microbenchmarks dos caminhos quentes, com baselines em JSON
+
+Roda sobre dados sintéticos:
+- Cobranca.to_dict em 100 mil objetos
+- EmailService.gerar_email_cobranca
+- MercadoPagoService.validar_webhook_signature
+- montagem do payload em criar_pagamento (SDK substituído por um stub)
+- BackupService.export_cobrancas_to_json e restore_from_json em cada tamanho
+- BackupService.list_backup_files com milhares de arquivos
+
+Uso:
+    python -m benchmarks.bench_suite run --output resultado.json
+    python -m benchmarks.bench_suite run --full --output resultado.json
+    python -m benchmarks.bench_suite run --sizes 10000 --only to_dict,email --output resultado.json
+    python -m benchmarks.bench_suite compare benchmarks/baselines/main.json resultado.json --threshold 0.15
+
+O compare sai com código 1 se algum benchmark ficar mais lento que a
+baseline além do limite (mediana atual / mediana da baseline > 1 + threshold).
+
+Por padrão o backup/restore roda com 10 mil e 100 mil cobranças, alguns
+minutos no total; --full inclui 1 milhão (perto de uma hora só no restore).
+A baseline em benchmarks/baselines/main.json usa os tamanhos padrão.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import string
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+# Sem limite de taxa nem espera: o SDK é um stub
+os.environ.setdefault('MP_LIMITE_PADRAO', '1000000000')
+os.environ.setdefault('WEBHOOK_SECRET', 'segredo-benchmark')
+
+TAMANHOS_PADRAO = [10_000, 100_000]
+TAMANHO_FULL = 1_000_000
+
+NOMES = ['José', 'Maria', 'João', 'Ana', 'Antônio', 'Francisca', 'Carlos', 'Paula', 'Luís', 'Márcia']
+SOBRENOMES = ['Silva', 'Santos', 'Oliveira', 'Souza', 'Conceição', 'Pereira', 'Lima', 'Araújo', 'Gonçalves']
+TITULOS = ['Mensalidade', 'Consultoria', 'Manutenção', 'Licença anual', 'Serviço avulso', 'Assinatura']
+STATUS = ['pending', 'approved', 'rejected', 'cancelled', 'in_process']
+
+def gerar_dados(inicio, quantidade, rnd):
+    """Dicionários com todas as colunas de cobrancas, prontos para INSERT"""
+    agora = datetime.utcnow()
+    linhas = []
+    for i in range(inicio, inicio + quantidade):
+        usuario = ''.join(rnd.choices(string.ascii_lowercase, k=8))
+        status = rnd.choice(STATUS)
+        linhas.append({
+            'external_reference': f'COB-{i:08d}',
+            'mercadopago_id': f'{rnd.randrange(10**12)}-pref-{i}',
+            'cliente_nome': f'{rnd.choice(NOMES)} {rnd.choice(SOBRENOMES)} {rnd.choice(SOBRENOMES)}',
+            'cliente_email': f'{usuario}@exemplo.com.br',
+            'cliente_telefone': f'(11) 9{rnd.randrange(10**8):08d}',
+            'cliente_documento': f'{rnd.randrange(10**11):011d}',
+            'titulo': f'{rnd.choice(TITULOS)} {i % 12 + 1:02d}/2026',
+            'descricao': 'Cobrança gerada para benchmark',
+            'valor': round(rnd.uniform(10, 5000), 2),
+            'status': status,
+            'data_criacao': agora,
+            'data_atualizacao': agora,
+            'data_vencimento': agora,
+            'data_pagamento': agora if status == 'approved' else None,
+            'payment_url': f'https://www.mercadopago.com.br/checkout/v1/redirect?pref_id={i}',
+            'mp_payment_id': str(rnd.randrange(10**10)) if status == 'approved' else None,
+            'mp_metodo_pagamento': 'pix' if status == 'approved' else None,
+            'mp_data_aprovacao': agora if status == 'approved' else None,
+            'mp_taxas': 0.99 if status == 'approved' else None
+        })
+    return linhas
+
+def medir(funcao, repeticoes, preparar=None):
+    """
+    Executa a função `repeticoes` vezes e retorna as estatísticas em ms
+
+    `preparar` roda antes de cada repetição, fora da medição.
+    """
+    tempos = []
+    for _ in range(repeticoes):
+        if preparar:
+            preparar()
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return {
+        'mediana_ms': round(statistics.median(tempos), 3),
+        'min_ms': round(min(tempos), 3),
+        'repeticoes': repeticoes
+    }
+
+def bench_to_dict(args, rnd):
+    from src.models.cobranca import Cobranca
+
+    cobrancas = [Cobranca(**dados) for dados in gerar_dados(0, 100_000, rnd)]
+    resultado = medir(lambda: [cobranca.to_dict() for cobranca in cobrancas], args.repeat)
+    return {'to_dict_100k': dict(resultado, n=len(cobrancas))}
+
+def bench_email(args, rnd):
+    from src.services.email_service import EmailService
+
+    email_service = EmailService()
+    dados = gerar_dados(0, 1, rnd)[0]
+    n = 10_000
+    resultado = medir(
+        lambda: [email_service.gerar_email_cobranca(dados, dados['payment_url']) for _ in range(n)],
+        args.repeat
+    )
+    return {'gerar_email_cobranca_10k': dict(resultado, n=n)}
+
+def bench_webhook(args, rnd):
+    import hashlib
+    import hmac
+    from src.services.mercadopago_service import MercadoPagoService
+
+    mercadopago_service = MercadoPagoService()
+    ts = '1704908010'
+    manifest = f'id:123456;request-id:req-1;ts:{ts};'
+    assinatura = hmac.new(os.environ['WEBHOOK_SECRET'].encode(), manifest.encode(), hashlib.sha256).hexdigest()
+    x_signature = f'ts={ts},v1={assinatura}'
+    assert mercadopago_service.validar_webhook_signature(x_signature, 'req-1', '123456')
+
+    n = 100_000
+    resultado = medir(
+        lambda: [mercadopago_service.validar_webhook_signature(x_signature, 'req-1', '123456') for _ in range(n)],
+        args.repeat
+    )
+    return {'validar_webhook_signature_100k': dict(resultado, n=n)}
+
+def bench_criar_pagamento(args, rnd):
+    from src.services.mercadopago_service import MercadoPagoService
+
+    class PreferenceStub:
+        def create(self, data):
+            return {'status': 201, 'response': {'id': 'pref', 'init_point': 'url', 'sandbox_init_point': 'url'}}
+
+    class SdkStub:
+        def preference(self):
+            return PreferenceStub()
+
+    mercadopago_service = MercadoPagoService()
+    mercadopago_service._sdk = SdkStub()
+    dados = gerar_dados(0, 1, rnd)[0]
+    assert mercadopago_service.criar_pagamento(dados)['success']
+
+    n = 10_000
+    resultado = medir(lambda: [mercadopago_service.criar_pagamento(dados) for _ in range(n)], args.repeat)
+    return {'criar_pagamento_payload_10k': dict(resultado, n=n)}
+
+def bench_backup(args, rnd):
+    from sqlalchemy import delete, insert
+    from src.main import create_app
+    from src.models.cobranca import Cobranca, db
+    from src.services.backup_service import BackupService
+
+    resultados = {}
+
+    for tamanho in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(tmp, 'bench.db')}"})
+            backup_service = BackupService()
+            backup_service.backup_dir = os.path.join(tmp, 'backup_data')
+
+            with app.app_context():
+                for offset in range(0, tamanho, 20_000):
+                    db.session.execute(insert(Cobranca), gerar_dados(offset, min(20_000, tamanho - offset), rnd))
+                db.session.commit()
+
+                arquivos = []
+                # Backups grandes: uma repetição basta e evita horas de execução
+                repeticoes = args.repeat if tamanho <= 100_000 else 1
+
+                resultado = medir(lambda: arquivos.append(backup_service.export_cobrancas_to_json()), repeticoes)
+                resultados[f'export_cobrancas_to_json_{tamanho}'] = dict(resultado, n=tamanho)
+
+                def esvaziar():
+                    db.session.execute(delete(Cobranca))
+                    db.session.commit()
+                    db.session.expunge_all()
+
+                resultado = medir(lambda: backup_service.restore_from_json(arquivos[-1]), repeticoes, preparar=esvaziar)
+                resultados[f'restore_from_json_{tamanho}'] = dict(resultado, n=tamanho)
+
+                db.session.remove()
+                db.engine.dispose()
+
+    return resultados
+
+def bench_list_backup_files(args, rnd):
+    from src.services.backup_service import BackupService
+
+    n = 5_000
+    with tempfile.TemporaryDirectory() as tmp:
+        backup_service = BackupService()
+        backup_service.backup_dir = tmp
+        for i in range(n):
+            with open(os.path.join(tmp, f'cobrancas_backup_{i:06d}.json'), 'w') as f:
+                f.write('{}')
+
+        resultado = medir(backup_service.list_backup_files, args.repeat)
+    return {'list_backup_files_5k': dict(resultado, n=n)}
+
+BENCHMARKS = {
+    'to_dict': bench_to_dict,
+    'email': bench_email,
+    'webhook': bench_webhook,
+    'criar_pagamento': bench_criar_pagamento,
+    'backup': bench_backup,
+    'list_backup_files': bench_list_backup_files
+}
+
+def commit_atual():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            # Caminho real: o pacote src pode ser montado com symlinks fora do repositório
+            cwd=os.path.dirname(os.path.realpath(__file__)), capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+def executar(args):
+    selecionados = args.only.split(',') if args.only else list(BENCHMARKS)
+    desconhecidos = [nome for nome in selecionados if nome not in BENCHMARKS]
+    if desconhecidos:
+        print(f"Benchmarks desconhecidos: {', '.join(desconhecidos)}", file=sys.stderr)
+        return 2
+
+    resultado = {
+        'meta': {
+            'data': datetime.utcnow().isoformat(),
+            'commit': commit_atual(),
+            'python': platform.python_version(),
+            'plataforma': platform.platform(),
+            'sizes': args.sizes
+        },
+        'benchmarks': {}
+    }
+
+    for nome in selecionados:
+        # Mesma semente por benchmark: dados iguais entre execuções
+        medidas = BENCHMARKS[nome](args, random.Random(42))
+        for chave, valor in medidas.items():
+            print(f"{chave:40s} {valor['mediana_ms']:12.3f} ms", file=sys.stderr, flush=True)
+        resultado['benchmarks'].update(medidas)
+
+    saida = json.dumps(resultado, indent=2)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(saida + '\n')
+    else:
+        print(saida)
+    return 0
+
+def comparar(args):
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)['benchmarks']
+    with open(args.atual, 'r', encoding='utf-8') as f:
+        atual = json.load(f)['benchmarks']
+
+    regressoes = []
+    print(f"{'benchmark':40s} {'baseline':>12s} {'atual':>12s} {'razão':>8s}")
+    for nome in sorted(set(baseline) | set(atual)):
+        if nome not in baseline or nome not in atual:
+            print(f"{nome:40s} {'(só em ' + ('baseline' if nome in baseline else 'atual') + ')':>34s}")
+            continue
+
+        antes = baseline[nome]['mediana_ms']
+        depois = atual[nome]['mediana_ms']
+        razao = depois / antes if antes else float('inf')
+        marcador = ''
+        if razao > 1 + args.threshold:
+            regressoes.append(nome)
+            marcador = '  REGRESSÃO'
+        print(f"{nome:40s} {antes:12.3f} {depois:12.3f} {razao:8.2f}{marcador}")
+
+    if regressoes:
+        print(f"\n{len(regressoes)} regressão(ões) acima de {args.threshold:.0%}: {', '.join(regressoes)}")
+        return 1
+
+    print(f"\nSem regressões acima de {args.threshold:.0%}")
+    return 0
+
+def main():
+    parser = argparse.ArgumentParser(description='Microbenchmarks dos caminhos quentes')
+    subparsers = parser.add_subparsers(dest='comando', required=True)
+
+    run = subparsers.add_parser('run', help='Executa os benchmarks')
+    run.add_argument('--sizes', default=None,
+                     type=lambda valor: [int(item) for item in valor.split(',') if item.strip()],
+                     help='Tamanhos do backup/restore (padrão: 10000,100000)')
+    run.add_argument('--full', action='store_true',
+                     help='Inclui o backup/restore de 1 milhão de cobranças nos tamanhos padrão')
+    run.add_argument('--repeat', type=int, default=3)
+    run.add_argument('--only', help=f"Subconjunto separado por vírgula: {', '.join(BENCHMARKS)}")
+    run.add_argument('--output', help='Arquivo JSON de saída (padrão: stdout)')
+
+    compare = subparsers.add_parser('compare', help='Compara um resultado com a baseline')
+    compare.add_argument('baseline')
+    compare.add_argument('atual')
+    compare.add_argument('--threshold', type=float, default=0.15,
+                         help='Piora relativa tolerada (padrão: 0.15 = 15%%)')
+
+    args = parser.parse_args()
+    if args.comando == 'run' and args.sizes is None:
+        args.sizes = TAMANHOS_PADRAO + ([TAMANHO_FULL] if args.full else [])
+    sys.exit(executar(args) if args.comando == 'run' else comparar(args))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+import click
+from flask import Blueprint, request, jsonify
+from src.models.cobranca import db
+from src.services.busca_service import get_busca_service
+
+busca_bp = Blueprint('busca', __name__)
+
+@busca_bp.route('/cobrancas/busca', methods=['GET'])
+def buscar_cobrancas():
+    """
+    Busca cobranças por nome, email, CPF/CNPJ, título ou referência externa
+
+    Query params:
+        q: texto buscado (mínimo 2 caracteres; cada palavra casa por prefixo)
+        limit: máximo de resultados (padrão 20, máximo 100)
+        offset: deslocamento para paginação
+    """
+    try:
+        termo = request.args.get('q', '').strip()
+        limite = min(request.args.get('limit', 20, type=int), 100)
+        offset = max(request.args.get('offset', 0, type=int), 0)
+
+        if len(termo) < 2:
+            return jsonify({
+                'success': False,
+                'error': 'Informe ao menos 2 caracteres para a busca'
+            }), 400
+
+        # Busca um a mais para saber se há próxima página sem contar tudo
+        cobrancas = get_busca_service().buscar(termo, limite + 1, offset)
+
+        return jsonify({
+            'success': True,
+            'query': termo,
+            'cobrancas': [cobranca.to_dict() for cobranca in cobrancas[:limite]],
+            'limit': limite,
+            'offset': offset,
+            'has_more': len(cobrancas) > limite
+        })
+
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@busca_bp.cli.command('rebuild')
+def rebuild_command():
+    """Recria o índice de busca (flask --app src.main busca rebuild)"""
+    busca_service = get_busca_service()
+
+    with db.engine.begin() as connection:
+        if not busca_service.garantir_indice(connection):
+            click.echo('FTS5 indisponível neste banco; nada a fazer.')
+            return
+        busca_service.reconstruir(connection)
+
+    click.echo('Índice de busca reconstruído.')
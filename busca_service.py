@@ -0,0 +1,181 @@
+import re
+from functools import lru_cache
+from sqlalchemy import text
+from src.models.cobranca import Cobranca, db
+
+# Documento só com dígitos, para que "123.456.789-00" e "12345678900" casem
+_DOCUMENTO_SQL = "replace(replace(replace(replace(coalesce({col}, ''), '.', ''), '-', ''), '/', ''), ' ', '')"
+
+_VALORES_NOVOS = (
+    "new.id, new.cliente_nome, new.cliente_email, "
+    + _DOCUMENTO_SQL.format(col='new.cliente_documento')
+    + ", new.titulo, new.external_reference"
+)
+
+FTS_DDL = [
+    # unicode61 com remove_diacritics ignora acentos e caixa; prefix acelera buscas "abc*"
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS cobrancas_fts USING fts5(
+        cliente_nome, cliente_email, documento, titulo, external_reference,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3 4'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS cobrancas_fts_ai AFTER INSERT ON cobrancas BEGIN
+        INSERT INTO cobrancas_fts(rowid, cliente_nome, cliente_email, documento, titulo, external_reference)
+        VALUES ({_VALORES_NOVOS});
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS cobrancas_fts_ad AFTER DELETE ON cobrancas BEGIN
+        DELETE FROM cobrancas_fts WHERE rowid = old.id;
+    END
+    """,
+    # Só reindexa quando um campo pesquisável muda (atualizações de status não pagam nada)
+    f"""
+    CREATE TRIGGER IF NOT EXISTS cobrancas_fts_au
+    AFTER UPDATE OF cliente_nome, cliente_email, cliente_documento, titulo, external_reference ON cobrancas BEGIN
+        DELETE FROM cobrancas_fts WHERE rowid = old.id;
+        INSERT INTO cobrancas_fts(rowid, cliente_nome, cliente_email, documento, titulo, external_reference)
+        VALUES ({_VALORES_NOVOS});
+    END
+    """
+]
+
+FTS_REBUILD = [
+    "DELETE FROM cobrancas_fts",
+    f"""
+    INSERT INTO cobrancas_fts(rowid, cliente_nome, cliente_email, documento, titulo, external_reference)
+    SELECT id, cliente_nome, cliente_email, {_DOCUMENTO_SQL.format(col='cliente_documento')}, titulo, external_reference
+    FROM cobrancas
+    """,
+    "INSERT INTO cobrancas_fts(cobrancas_fts) VALUES ('optimize')"
+]
+
+# Pesos do bm25 na ordem das colunas: nome, email, documento, título, referência
+FTS_BUSCA = """
+    SELECT rowid FROM cobrancas_fts
+    WHERE cobrancas_fts MATCH :consulta
+    ORDER BY bm25(cobrancas_fts, 10.0, 6.0, 10.0, 3.0, 8.0)
+    LIMIT :limite OFFSET :offset
+"""
+
+class BuscaService:
+    def __init__(self):
+        self._fts_disponivel = None
+
+    def fts_disponivel(self, connection):
+        """Verifica se o banco é SQLite com o módulo FTS5 compilado"""
+        if self._fts_disponivel is None:
+            if connection.dialect.name != 'sqlite':
+                self._fts_disponivel = False
+            else:
+                opcoes = connection.execute(text('PRAGMA compile_options')).scalars().all()
+                self._fts_disponivel = 'ENABLE_FTS5' in opcoes
+        return self._fts_disponivel
+
+    def garantir_indice(self, connection):
+        """
+        Cria a tabela FTS e os triggers de sincronização, se ainda não existirem
+
+        Quando a tabela é criada agora, ela é populada a partir de cobrancas.
+
+        Args:
+            connection: Conexão do SQLAlchemy (dentro de uma transação)
+
+        Returns:
+            bool: True se o índice está disponível
+        """
+        if not self.fts_disponivel(connection):
+            return False
+
+        existia = connection.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'cobrancas_fts'")
+        ).first() is not None
+
+        for ddl in FTS_DDL:
+            connection.execute(text(ddl))
+
+        if not existia:
+            self.reconstruir(connection)
+
+        return True
+
+    def reconstruir(self, connection):
+        """
+        Recria todo o conteúdo do índice a partir da tabela cobrancas
+
+        Args:
+            connection: Conexão do SQLAlchemy (dentro de uma transação)
+        """
+        for sql in FTS_REBUILD:
+            connection.execute(text(sql))
+
+    def montar_consulta(self, termo):
+        """
+        Converte o texto digitado em uma consulta FTS5
+
+        Cada palavra vira um prefixo ("silv"*) e todas precisam casar. Um
+        CPF/CNPJ digitado com pontuação é reduzido aos dígitos.
+
+        Args:
+            termo (str): Texto digitado pelo usuário
+
+        Returns:
+            str: Expressão MATCH ou None se não houver palavras
+        """
+        termo = termo.strip()
+        if re.fullmatch(r'[\d.\-/\s]+', termo):
+            termo = re.sub(r'\D', '', termo)
+
+        palavras = re.findall(r'\w+', termo)
+        if not palavras:
+            return None
+
+        return ' '.join(f'"{palavra}"*' for palavra in palavras)
+
+    def buscar(self, termo, limite=20, offset=0):
+        """
+        Busca cobranças por nome, email, documento, título ou referência
+
+        Args:
+            termo (str): Texto digitado pelo usuário
+            limite (int): Máximo de resultados
+            offset (int): Deslocamento para paginação
+
+        Returns:
+            list: Cobranças ordenadas por relevância
+        """
+        consulta = self.montar_consulta(termo)
+        if consulta is None:
+            return []
+
+        connection = db.session.connection()
+        if not self.fts_disponivel(connection):
+            return self._buscar_sem_fts(termo, limite, offset)
+
+        ids = connection.execute(
+            text(FTS_BUSCA), {'consulta': consulta, 'limite': limite, 'offset': offset}
+        ).scalars().all()
+        if not ids:
+            return []
+
+        cobrancas = {c.id: c for c in Cobranca.query.filter(Cobranca.id.in_(ids)).all()}
+        return [cobrancas[i] for i in ids if i in cobrancas]
+
+    def _buscar_sem_fts(self, termo, limite, offset):
+        """Busca por LIKE para bancos sem FTS5 (sem ranking)"""
+        padrao = f'%{termo.strip()}%'
+        return Cobranca.query.filter(db.or_(
+            Cobranca.cliente_nome.ilike(padrao),
+            Cobranca.cliente_email.ilike(padrao),
+            Cobranca.cliente_documento.ilike(padrao),
+            Cobranca.titulo.ilike(padrao),
+            Cobranca.external_reference.ilike(padrao)
+        )).order_by(Cobranca.data_criacao.desc()).limit(limite).offset(offset).all()
+
+@lru_cache(maxsize=None)
+def get_busca_service():
+    """Retorna a instância compartilhada do serviço, criada no primeiro uso"""
+    return BuscaService()
@@ -0,0 +1,257 @@
+from functools import lru_cache
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from src.models.cobranca import Cliente, Cobranca, db
+
+def _atualizar_cliente(cliente, dados):
+    """Aplica ao cliente existente os dados informados (Cliente.identificar) não vazios"""
+    for campo, valor in dados.items():
+        if valor and getattr(cliente, campo) != valor:
+            setattr(cliente, campo, valor)
+
+class ClienteService:
+    """
+    Clientes deduplicados a partir dos dados informados nas cobranças
+
+    Cada cliente tem uma chave única: o CPF/CNPJ só com dígitos ou, sem
+    documento, o email normalizado. Cobranças novas são ligadas ao cliente
+    no flush (vincular_novas); as antigas, em lote (vincular_cobrancas).
+    """
+
+    def __init__(self, tamanho_lote=1000):
+        self.tamanho_lote = tamanho_lote
+
+    def buscar(self, documento=None, email=None):
+        """Cliente pelo CPF/CNPJ ou, sem documento, pelo email"""
+        if not documento and not email:
+            return None
+        return Cliente.query.filter_by(chave=Cliente.gerar_chave(documento, email)).first()
+
+    def obter_ou_criar(self, nome, email, telefone=None, documento=None):
+        """
+        Cliente com a chave dos dados informados, criado se ainda não existir
+
+        Nome e telefone mais recentes substituem os anteriores.
+        """
+        dados = Cliente.identificar(nome, email, telefone, documento)
+
+        with db.session.no_autoflush:
+            cliente = Cliente.query.filter_by(chave=dados['chave']).first()
+
+        if cliente is None:
+            cliente = Cliente(**dados)
+            db.session.add(cliente)
+        else:
+            _atualizar_cliente(cliente, dados)
+        return cliente
+
+    def _ids_por_chave(self, identificacoes):
+        """
+        Garante um cliente para cada chave e retorna chave -> id
+
+        Args:
+            identificacoes (dict): chave -> Cliente.identificar(...)
+        """
+        chaves = list(identificacoes)
+        ids = dict(db.session.execute(
+            db.select(Cliente.chave, Cliente.id).where(Cliente.chave.in_(chaves))
+        ).all())
+
+        novos = [dados for chave, dados in identificacoes.items() if chave not in ids]
+        if novos:
+            db.session.execute(Cliente.__table__.insert().prefix_with('OR IGNORE'), novos)
+            ids.update(db.session.execute(
+                db.select(Cliente.chave, Cliente.id).where(Cliente.chave.in_([dados['chave'] for dados in novos]))
+            ).all())
+        return ids
+
+    def vincular_cobrancas(self):
+        """
+        Liga as cobranças sem cliente_id aos clientes, criando os que faltarem
+
+        Em lotes por id; data_atualizacao das cobranças é preservada.
+
+        Returns:
+            int: Cobranças vinculadas
+        """
+        tabela = Cobranca.__table__
+        vinculadas = 0
+        ultimo_id = 0
+
+        while True:
+            linhas = db.session.execute(
+                db.select(
+                    Cobranca.id, Cobranca.cliente_nome, Cobranca.cliente_email,
+                    Cobranca.cliente_telefone, Cobranca.cliente_documento
+                )
+                .where(Cobranca.cliente_id.is_(None), Cobranca.id > ultimo_id)
+                .order_by(Cobranca.id)
+                .limit(self.tamanho_lote)
+            ).all()
+            if not linhas:
+                break
+            ultimo_id = linhas[-1].id
+
+            # A cobrança mais recente (maior id) define nome e telefone do cliente novo
+            identificacoes = {}
+            chaves = {}
+            for linha in linhas:
+                dados = Cliente.identificar(
+                    linha.cliente_nome, linha.cliente_email, linha.cliente_telefone, linha.cliente_documento
+                )
+                identificacoes[dados['chave']] = dados
+                chaves[linha.id] = dados['chave']
+
+            ids = self._ids_por_chave(identificacoes)
+            db.session.execute(
+                db.update(tabela)
+                .where(tabela.c.id == db.bindparam('b_id'))
+                .values(cliente_id=db.bindparam('b_cliente_id'), data_atualizacao=tabela.c.data_atualizacao),
+                [{'b_id': cobranca_id, 'b_cliente_id': ids[chave]} for cobranca_id, chave in chaves.items()]
+            )
+            db.session.commit()
+            vinculadas += len(linhas)
+
+            if len(linhas) < self.tamanho_lote:
+                break
+
+        return vinculadas
+
+    def historico(self, cliente_id, status=None, limite=50, offset=0, incluir_arquivo=False):
+        """
+        Cobranças de um cliente (mais recentes primeiro) e totais por status
+
+        Usa o índice (cliente_id, data_criacao). Sem incluir_arquivo, só as
+        cobranças do banco principal entram na lista e nos totais; com ele,
+        também as arquivadas (marcadas com 'arquivada').
+
+        Returns:
+            dict: {'cliente', 'totais', 'cobrancas', 'total'} ou None
+        """
+        cliente = db.session.get(Cliente, cliente_id)
+        if cliente is None:
+            return None
+
+        tabela = Cobranca.__table__
+        consulta_totais = (
+            db.select(tabela.c.status, db.func.count(tabela.c.id), db.func.coalesce(db.func.sum(tabela.c.valor), 0))
+            .where(tabela.c.cliente_id == cliente_id)
+            .group_by(tabela.c.status)
+        )
+        agregados = list(db.session.execute(consulta_totais).all())
+
+        arquivo = None
+        if incluir_arquivo:
+            from src.services.arquivo_service import get_arquivo_service
+            arquivo = get_arquivo_service()
+            for _, linhas in arquivo.executar_em_arquivos(consulta_totais):
+                agregados.extend(linhas)
+
+        por_status = {}
+        for status_, quantidade, valor in agregados:
+            item = por_status.setdefault(status_, {'quantidade': 0, 'valor': 0})
+            item['quantidade'] += quantidade
+            item['valor'] = round(item['valor'] + valor, 2)
+        totais = {
+            'quantidade': sum(item['quantidade'] for item in por_status.values()),
+            'valor': round(sum(item['valor'] for item in por_status.values()), 2),
+            'valor_pago': por_status.get('approved', {}).get('valor', 0),
+            'valor_pendente': por_status.get('pending', {}).get('valor', 0),
+            'por_status': por_status
+        }
+
+        consulta = Cobranca.query.filter(Cobranca.cliente_id == cliente_id)
+        if status:
+            consulta = consulta.filter(Cobranca.status == status)
+            total = por_status.get(status, {}).get('quantidade', 0)
+        else:
+            total = totais['quantidade']
+
+        if arquivo is None:
+            cobrancas = consulta.order_by(Cobranca.data_criacao.desc(), Cobranca.id.desc()).offset(offset).limit(limite).all()
+            return {
+                'cliente': cliente.to_dict(),
+                'totais': totais,
+                'cobrancas': [cobranca.to_dict() for cobranca in cobrancas],
+                'total': total
+            }
+
+        # Banco principal e arquivos intercalados pela mesma ordem: cada fonte
+        # contribui com no máximo offset + limite linhas
+        janela = offset + limite
+        candidatas = [
+            (cobranca, False)
+            for cobranca in consulta.order_by(Cobranca.data_criacao.desc(), Cobranca.id.desc()).limit(janela).all()
+        ]
+        consulta_arquivo = db.select(tabela).where(tabela.c.cliente_id == cliente_id)
+        if status:
+            consulta_arquivo = consulta_arquivo.where(tabela.c.status == status)
+        consulta_arquivo = consulta_arquivo.order_by(tabela.c.data_criacao.desc(), tabela.c.id.desc()).limit(janela)
+        for _, linhas in arquivo.executar_em_arquivos(consulta_arquivo):
+            candidatas.extend((Cobranca(**linha._asdict()), True) for linha in linhas)
+
+        candidatas.sort(key=lambda item: (item[0].data_criacao, item[0].id), reverse=True)
+        cobrancas = []
+        for cobranca, arquivada in candidatas[offset:janela]:
+            dados = cobranca.to_dict()
+            dados['arquivada'] = arquivada
+            cobrancas.append(dados)
+
+        return {
+            'cliente': cliente.to_dict(),
+            'totais': totais,
+            'cobrancas': cobrancas,
+            'total': total
+        }
+
+def vincular_novas(session, flush_context, instances):
+    """
+    Liga cada cobrança nova sem cliente ao cliente dos seus dados (before_flush)
+
+    O cliente que falta é criado com INSERT OR IGNORE e lido em seguida:
+    se outra requisição criou a mesma chave entre a consulta e a inserção,
+    a cobrança fica com o cliente dela em vez de falhar na restrição única.
+    Como em obter_ou_criar, nome e telefone da cobrança mais recente
+    substituem os do cliente já existente.
+    """
+    novas = [
+        obj for obj in session.new
+        if isinstance(obj, Cobranca) and obj.cliente is None and obj.cliente_id is None
+    ]
+    if not novas:
+        return
+
+    # Clientes ainda pendentes na sessão também contam
+    clientes = {obj.chave: obj for obj in session.new if isinstance(obj, Cliente)}
+    with session.no_autoflush:
+        for cobranca in novas:
+            dados = Cliente.identificar(
+                cobranca.cliente_nome, cobranca.cliente_email,
+                cobranca.cliente_telefone, cobranca.cliente_documento
+            )
+            cliente = clientes.get(dados['chave'])
+            if cliente is None:
+                consulta = db.select(Cliente).where(Cliente.chave == dados['chave'])
+                cliente = session.execute(consulta).scalar_one_or_none()
+                if cliente is None:
+                    session.execute(Cliente.__table__.insert().prefix_with('OR IGNORE'), [dados])
+                    cliente = session.execute(consulta).scalar_one()
+                clientes[dados['chave']] = cliente
+            _atualizar_cliente(cliente, dados)
+            cobranca.cliente = cliente
+
+_listeners_registrados = False
+
+def registrar_listeners():
+    """Liga a criação/vinculação de clientes ao flush das cobranças novas"""
+    global _listeners_registrados
+    if _listeners_registrados:
+        return
+
+    event.listen(Session, 'before_flush', vincular_novas)
+    _listeners_registrados = True
+
+@lru_cache(maxsize=None)
+def get_cliente_service():
+    """Retorna a instância compartilhada do serviço, criada no primeiro uso"""
+    return ClienteService()
@@ -0,0 +1,84 @@
+from flask import Blueprint, request, jsonify
+from src.services.cliente_service import get_cliente_service
+
+clientes_bp = Blueprint('clientes', __name__)
+
+@clientes_bp.route('/clientes', methods=['GET'])
+def buscar_cliente():
+    """
+    Busca um cliente pelo CPF/CNPJ ou pelo email
+
+    Query params:
+        documento: CPF/CNPJ (com ou sem pontuação)
+        email: email do cliente (usado quando não há documento)
+    """
+    try:
+        documento = request.args.get('documento', '').strip()
+        email = request.args.get('email', '').strip()
+
+        if not documento and not email:
+            return jsonify({
+                'success': False,
+                'error': 'Informe documento ou email'
+            }), 400
+
+        cliente = get_cliente_service().buscar(documento, email)
+
+        if not cliente:
+            return jsonify({
+                'success': False,
+                'error': 'Cliente não encontrado'
+            }), 404
+
+        return jsonify({
+            'success': True,
+            'cliente': cliente.to_dict()
+        })
+
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@clientes_bp.route('/clientes/<int:cliente_id>/cobrancas', methods=['GET'])
+def historico_cliente(cliente_id):
+    """
+    Histórico de cobranças de um cliente, com totais por status
+
+    Query params:
+        status: filtra as cobranças listadas (os totais são sempre completos)
+        limit: máximo de cobranças (padrão 50, máximo 200)
+        offset: deslocamento para paginação
+        incluir_arquivo: 1 para incluir as cobranças arquivadas na lista e nos totais
+    """
+    try:
+        limite = min(request.args.get('limit', 50, type=int), 200)
+        offset = max(request.args.get('offset', 0, type=int), 0)
+
+        historico = get_cliente_service().historico(
+            cliente_id,
+            status=request.args.get('status'),
+            limite=limite,
+            offset=offset,
+            incluir_arquivo=request.args.get('incluir_arquivo', '').lower() in ('1', 'true', 'yes')
+        )
+
+        if historico is None:
+            return jsonify({
+                'success': False,
+                'error': 'Cliente não encontrado'
+            }), 404
+
+        return jsonify({
+            'success': True,
+            **historico,
+            'limit': limite,
+            'offset': offset
+        })
+
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
@@ -0,0 +1,96 @@
+import re
+from flask import Response, g, request
+from src import etag as etags
+from src.models.cobranca import Cobranca, db
+
+class ConditionalGetService:
+    """
+    GET condicional (ETag / Last-Modified) para a listagem e o detalhe de cobranças
+
+    Antes da view rodar, calcula um validador barato a partir do banco:
+    - listagem: max(data_atualizacao) e count(*) do conjunto filtrado, mais a query string
+    - detalhe: (id, data_atualizacao, versao); a versão muda também quando só
+      o payload do Mercado Pago, que vai na resposta do detalhe, é regravado
+
+    Se o cliente enviar um If-None-Match igual, responde 304 sem consultar
+    nem serializar as cobranças. A fórmula dos ETags fica em src/etag.py,
+    compartilhada com o caminho leve da função Netlify.
+    """
+
+    VERSAO = etags.VERSAO
+
+    ROTA_LISTAGEM = re.compile(r'^/api/cobrancas/?$')
+    ROTA_DETALHE = re.compile(r'^/api/cobrancas/(\d+)/?$')
+
+    def init_app(self, app):
+        app.before_request(self._verificar)
+        app.after_request(self._anotar)
+
+    def calcular_validador(self):
+        """
+        Calcula ETag e Last-Modified da requisição atual
+
+        Returns:
+            tuple: (etag, last_modified) ou None se a rota não for suportada
+        """
+        if request.method not in ('GET', 'HEAD') or request.blueprint != 'cobranca':
+            return None
+
+        if self.ROTA_LISTAGEM.match(request.path):
+            consulta = db.select(db.func.max(Cobranca.data_atualizacao), db.func.count(Cobranca.id))
+            if request.args.get('status'):
+                consulta = consulta.where(Cobranca.status == request.args['status'])
+
+            ultima_atualizacao, total = db.session.execute(consulta).one()
+            etag = etags.etag_listagem(ultima_atualizacao, total, request.query_string.decode('utf-8', 'replace'))
+        else:
+            match = self.ROTA_DETALHE.match(request.path)
+            if not match:
+                return None
+
+            cobranca_id = int(match.group(1))
+            linha = db.session.execute(
+                db.select(Cobranca.data_atualizacao, Cobranca.versao).where(Cobranca.id == cobranca_id)
+            ).one_or_none()
+            if linha is None:
+                return None
+
+            ultima_atualizacao, versao = linha
+            etag = etags.etag_detalhe(cobranca_id, ultima_atualizacao, versao)
+
+        return etag, ultima_atualizacao
+
+    def _verificar(self):
+        validador = self.calcular_validador()
+        if validador is None:
+            return None
+
+        etag, last_modified = validador
+        g._etag_cobrancas = validador
+
+        if request.if_none_match:
+            nao_modificado = request.if_none_match.contains(etag)
+        elif request.if_modified_since and last_modified:
+            nao_modificado = last_modified.replace(microsecond=0) <= request.if_modified_since.replace(tzinfo=None)
+        else:
+            nao_modificado = False
+
+        if nao_modificado:
+            response = Response(status=304)
+            self._aplicar_cabecalhos(response, etag, last_modified)
+            return response
+
+        return None
+
+    def _anotar(self, response):
+        validador = g.pop('_etag_cobrancas', None)
+        if validador is not None and response.status_code == 200:
+            self._aplicar_cabecalhos(response, *validador)
+        return response
+
+    def _aplicar_cabecalhos(self, response, etag, last_modified):
+        response.set_etag(etag)
+        if last_modified:
+            response.last_modified = last_modified
+        # Sempre revalidar: o navegador guarda a resposta, mas pergunta antes de usar
+        response.headers['Cache-Control'] = 'private, no-cache'
@@ -0,0 +1,66 @@
+import os
+
+_carregada = False
+
+def load_config():
+    """
+    Carrega as variáveis de ambiente do arquivo .env
+
+    Pode ser chamada de qualquer módulo: o arquivo é lido apenas na primeira vez.
+    """
+    global _carregada
+    if _carregada:
+        return
+
+    from dotenv import load_dotenv
+    load_dotenv()
+    _carregada = True
+
+def build_config():
+    """
+    Monta a configuração da aplicação Flask a partir do ambiente
+
+    Returns:
+        dict: Chaves de configuração do Flask
+    """
+    load_config()
+
+    default_db = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
+
+    return {
+        'SECRET_KEY': os.getenv('SECRET_KEY', 'asdf#FGSgvasgf$5$WGT'),
+        'SQLALCHEMY_DATABASE_URI': os.getenv('DATABASE_URL', default_db),
+        'SQLALCHEMY_TRACK_MODIFICATIONS': False,
+        'AUTO_CREATE_TABLES': os.getenv('AUTO_CREATE_TABLES', 'true').lower() in ('1', 'true', 'yes')
+    }
+
+def dias_expiracao_pagamento():
+    """Validade, em dias, do link de pagamento (expiration_date_to da preferência)"""
+    load_config()
+    return int(os.getenv('PAGAMENTO_EXPIRACAO_DIAS', 30))
+
+def configure_sqlite(engine):
+    """
+    Ajusta o SQLite para acesso concorrente por vários processos
+
+    Ativa WAL (leitores não bloqueiam o escritor), um busy_timeout para que
+    escritas concorrentes esperem em vez de falhar com "database is locked"
+    e synchronous=NORMAL, seguro em modo WAL.
+
+    Args:
+        engine: Engine do SQLAlchemy
+    """
+    if engine.dialect.name != 'sqlite':
+        return
+
+    from sqlalchemy import event
+
+    busy_timeout_ms = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', 30000))
+
+    @event.listens_for(engine, 'connect')
+    def _configurar_conexao(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute(f'PRAGMA busy_timeout={busy_timeout_ms}')
+        cursor.execute('PRAGMA synchronous=NORMAL')
+        cursor.close()
@@ -2,26 +2,48 @@ import smtplib
 import os
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from dotenv import load_dotenv
-
-load_dotenv()
+from functools import lru_cache
+from src.config import load_config
 
 class EmailService:
     def __init__(self):
+        load_config()
         self.smtp_server = os.getenv('SMTP_SERVER', 'smtp.gmail.com')
         self.smtp_port = int(os.getenv('SMTP_PORT', 587))
         self.email_user = os.getenv('EMAIL_USER')
         self.email_password = os.getenv('EMAIL_PASSWORD')
+        self.smtp_timeout = float(os.getenv('SMTP_TIMEOUT', 30))
+    
+    def conectar(self):
+        """
+        Abre uma conexão SMTP autenticada, para reutilizar em vários envios
+        
+        Returns:
+            smtplib.SMTP: Conexão aberta (feche com quit() ou use em um with)
+        """
+        server = smtplib.SMTP(self.smtp_server, self.smtp_port, timeout=self.smtp_timeout)
+        try:
+            server.starttls()
+            server.login(self.email_user, self.email_password)
+        except Exception:
+            server.close()
+            raise
+        return server
     
-    def enviar_email(self, destinatario, assunto, corpo_html, corpo_texto=None):
+    def enviar_email(self, destinatario, assunto, corpo_html, corpo_texto=None, conexao=None):
         """
-        Envia um email
+        Envia um email na hora, pelo SMTP
+        
+        Usado pelo worker da outbox. Rotas e jobs enfileiram com
+        enfileirar_email (ou enfileirar_email_cobranca /
+        enfileirar_email_confirmacao), sem esperar o servidor SMTP.
         
         Args:
             destinatario (str): Email do destinatário
             assunto (str): Assunto do email
             corpo_html (str): Corpo do email em HTML
             corpo_texto (str): Corpo do email em texto simples (opcional)
+            conexao (smtplib.SMTP): Conexão aberta por conectar() (opcional)
         
         Returns:
             dict: Resultado do envio
@@ -42,11 +64,12 @@ class EmailService:
             part2 = MIMEText(corpo_html, 'html', 'utf-8')
             msg.attach(part2)
             
-            # Conectar ao servidor SMTP e enviar
-            with smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
-                server.starttls()
-                server.login(self.email_user, self.email_password)
-                server.send_message(msg)
+            # Reutilizar a conexão recebida ou abrir uma só para este envio
+            if conexao is not None:
+                conexao.send_message(msg)
+            else:
+                with self.conectar() as server:
+                    server.send_message(msg)
             
             return {
                 "success": True,
@@ -59,6 +82,56 @@ class EmailService:
                 "error": str(e)
             }
     
+    def enfileirar_email(self, destinatario, assunto, corpo_html, corpo_texto=None, tipo='generico', cobranca_id=None):
+        """
+        Coloca um email na outbox, para envio assíncrono pelo worker
+        
+        Não fala com o servidor SMTP: apenas grava a mensagem na sessão
+        atual, que deve ser commitada por quem chamar (normalmente junto com
+        a cobrança).
+        
+        Returns:
+            EmailOutbox: Registro criado
+        """
+        from src.services.outbox_service import get_outbox_service
+        return get_outbox_service().enfileirar(
+            destinatario, assunto, corpo_html, corpo_texto,
+            tipo=tipo, cobranca_id=cobranca_id
+        )
+    
+    def enfileirar_email_cobranca(self, cobranca):
+        """
+        Enfileira o email com o link de pagamento de uma cobrança (criação e reenvio)
+        
+        Args:
+            cobranca (Cobranca): Cobrança com payment_url preenchida
+        
+        Returns:
+            EmailOutbox: Registro criado (commit fica com quem chamar)
+        """
+        assunto, corpo_html, corpo_texto = self.gerar_email_cobranca(cobranca.to_dict(), cobranca.payment_url)
+        return self.enfileirar_email(
+            cobranca.cliente_email, assunto, corpo_html, corpo_texto,
+            tipo='cobranca', cobranca_id=cobranca.id
+        )
+    
+    def enfileirar_email_confirmacao(self, cobranca, dados_pagamento):
+        """
+        Enfileira o email de confirmação de pagamento (webhook)
+        
+        Args:
+            cobranca (Cobranca): Cobrança paga
+            dados_pagamento (dict): Dados do pagamento do Mercado Pago
+        
+        Returns:
+            EmailOutbox: Registro criado (commit fica com quem chamar)
+        """
+        assunto, corpo_html, corpo_texto = self.gerar_email_confirmacao_pagamento(cobranca.to_dict(), dados_pagamento)
+        return self.enfileirar_email(
+            cobranca.cliente_email, assunto, corpo_html, corpo_texto,
+            tipo='confirmacao_pagamento', cobranca_id=cobranca.id
+        )
+    
     def gerar_email_cobranca(self, dados_cobranca, payment_url):
         """
         Gera o HTML do email de cobrança
@@ -196,6 +269,143 @@ class EmailService:
         
         return assunto, corpo_html, corpo_texto
     
+    def gerar_email_lembrete(self, dados_cobranca, payment_url, dias_restantes):
+        """
+        Gera o HTML do email de lembrete de cobrança pendente
+        
+        Args:
+            dados_cobranca (dict): Dados da cobrança
+            payment_url (str): URL de pagamento
+            dias_restantes (int): Dias até o vencimento do link de pagamento
+        
+        Returns:
+            tuple: (assunto, corpo_html, corpo_texto)
+        """
+        assunto = f"Lembrete: {dados_cobranca['titulo']}"
+        
+        if dias_restantes <= 0:
+            prazo = "vence hoje"
+        elif dias_restantes == 1:
+            prazo = "vence amanhã"
+        else:
+            prazo = f"vence em {dias_restantes} dias"
+        
+        corpo_html = f"""
+        <!DOCTYPE html>
+        <html>
+        <head>
+            <meta charset="UTF-8">
+            <meta name="viewport" content="width=device-width, initial-scale=1.0">
+            <title>Lembrete de Cobrança</title>
+            <style>
+                body {{
+                    font-family: Arial, sans-serif;
+                    line-height: 1.6;
+                    color: #333;
+                    max-width: 600px;
+                    margin: 0 auto;
+                    padding: 20px;
+                }}
+                .header {{
+                    background-color: #f5a623;
+                    color: white;
+                    padding: 20px;
+                    text-align: center;
+                    border-radius: 8px 8px 0 0;
+                }}
+                .content {{
+                    background-color: #f9f9f9;
+                    padding: 30px;
+                    border-radius: 0 0 8px 8px;
+                }}
+                .cobranca-info {{
+                    background-color: white;
+                    padding: 20px;
+                    border-radius: 8px;
+                    margin: 20px 0;
+                    border-left: 4px solid #f5a623;
+                }}
+                .valor {{
+                    font-size: 24px;
+                    font-weight: bold;
+                    color: #009ee3;
+                    text-align: center;
+                    margin: 20px 0;
+                }}
+                .botao-pagar {{
+                    display: inline-block;
+                    background-color: #009ee3;
+                    color: white;
+                    padding: 15px 30px;
+                    text-decoration: none;
+                    border-radius: 5px;
+                    font-weight: bold;
+                    text-align: center;
+                    margin: 20px 0;
+                }}
+                .footer {{
+                    text-align: center;
+                    margin-top: 30px;
+                    font-size: 12px;
+                    color: #666;
+                }}
+            </style>
+        </head>
+        <body>
+            <div class="header">
+                <h1>Lembrete de Cobrança</h1>
+            </div>
+            
+            <div class="content">
+                <p>Olá <strong>{dados_cobranca['cliente_nome']}</strong>,</p>
+                
+                <p>Identificamos que a cobrança abaixo ainda está em aberto. O link de pagamento <strong>{prazo}</strong>.</p>
+                
+                <div class="cobranca-info">
+                    <h3>{dados_cobranca['titulo']}</h3>
+                    
+                    <div class="valor">
+                        R$ {dados_cobranca['valor']:.2f}
+                    </div>
+                    
+                    <p><strong>Referência:</strong> {dados_cobranca['external_reference']}</p>
+                </div>
+                
+                <div style="text-align: center;">
+                    <a href="{payment_url}" class="botao-pagar">PAGAR AGORA</a>
+                </div>
+                
+                <p>Se você já realizou o pagamento, desconsidere esta mensagem.</p>
+            </div>
+            
+            <div class="footer">
+                <p>Este é um email automático, não responda a esta mensagem.</p>
+                <p>Em caso de dúvidas, entre em contato conosco.</p>
+            </div>
+        </body>
+        </html>
+        """
+        
+        corpo_texto = f"""
+        Lembrete de Cobrança
+        
+        Olá {dados_cobranca['cliente_nome']},
+        
+        A cobrança abaixo ainda está em aberto. O link de pagamento {prazo}.
+        
+        Título: {dados_cobranca['titulo']}
+        Valor: R$ {dados_cobranca['valor']:.2f}
+        Referência: {dados_cobranca['external_reference']}
+        
+        Para pagar, acesse o link: {payment_url}
+        
+        Se você já realizou o pagamento, desconsidere esta mensagem.
+        
+        Este é um email automático, não responda a esta mensagem.
+        """
+        
+        return assunto, corpo_html, corpo_texto
+    
     def gerar_email_confirmacao_pagamento(self, dados_cobranca, dados_pagamento):
         """
         Gera o HTML do email de confirmação de pagamento
@@ -321,3 +531,8 @@ class EmailService:
         """
         
         return assunto, corpo_html, corpo_texto
+
+@lru_cache(maxsize=None)
+def get_email_service():
+    """Retorna a instância compartilhada do serviço, criada no primeiro uso"""
+    return EmailService()
@@ -0,0 +1,23 @@
+"""
+ETags da listagem e do detalhe de cobranças
+
+Usado pelo ConditionalGetService (aplicação Flask) e pelo caminho leve da
+função Netlify, que responde as mesmas rotas sem Flask nem SQLAlchemy: por
+isso este módulo importa só hashlib. Os dois lados passam os mesmos valores
+(datas no formato de str(datetime)), e um ETag emitido por um vale no outro.
+"""
+import hashlib
+
+# Trocar quando o formato das respostas mudar, para invalidar os caches
+VERSAO = '3'
+
+def _etag(chave):
+    return hashlib.sha1(f'{VERSAO}|{chave}'.encode('utf-8')).hexdigest()[:20]
+
+def etag_listagem(ultima_atualizacao, total, query_string):
+    """ETag da listagem: max(data_atualizacao) e count(*) do conjunto filtrado, mais a query string"""
+    return _etag(f'lista|{ultima_atualizacao}|{total}|{query_string}')
+
+def etag_detalhe(cobranca_id, ultima_atualizacao, versao):
+    """ETag do detalhe: (id, data_atualizacao, versao)"""
+    return _etag(f'detalhe|{cobranca_id}|{ultima_atualizacao}|{versao}')
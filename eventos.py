@@ -0,0 +1,74 @@
+import json
+import os
+import queue
+import time
+from flask import Blueprint, Response, jsonify, request
+from src.services.eventos_service import get_event_broker
+
+eventos_bp = Blueprint('eventos', __name__)
+
+# Intervalo de heartbeat e duração máxima de uma conexão; ao fim dela o
+# navegador reconecta sozinho com Last-Event-ID, liberando a thread do servidor
+HEARTBEAT_SEGUNDOS = 15
+DURACAO_MAXIMA_SEGUNDOS = int(os.getenv('EVENTOS_DURACAO_MAXIMA', 300))
+# Espera sugerida ao cliente recusado pelo limite de conexões
+RETRY_LIMITE_SEGUNDOS = 30
+
+def formatar_evento(evento_id, tipo, dados):
+    return f"id: {evento_id}\nevent: {tipo}\ndata: {json.dumps(dados, ensure_ascii=False)}\n\n"
+
+@eventos_bp.route('/eventos', methods=['GET'])
+def stream_eventos():
+    """
+    Stream (Server-Sent Events) de criações e mudanças de status de cobranças
+
+    Eventos:
+        cobranca_criada: cobrança completa (mesmo formato da listagem)
+        cobranca_status: {id, status, status_anterior, data_atualizacao, data_pagamento}
+        reset: o cliente perdeu eventos e deve recarregar a listagem
+
+    Responde 503 quando o processo já tem EVENTOS_MAX_CONEXOES streams
+    abertos, para não ocupar todas as threads do servidor.
+    """
+    broker = get_event_broker()
+    ultimo_evento_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    assinatura = broker.assinar(ultimo_evento_id)
+    if assinatura is None:
+        response = jsonify({
+            'success': False,
+            'error': 'Limite de conexões de eventos atingido; tente novamente mais tarde'
+        })
+        response.status_code = 503
+        response.headers['Retry-After'] = str(RETRY_LIMITE_SEGUNDOS)
+        return response
+
+    def gerar():
+        try:
+            yield 'retry: 3000\n\n'
+            fim = time.monotonic() + DURACAO_MAXIMA_SEGUNDOS
+
+            while time.monotonic() < fim:
+                try:
+                    evento_id, tipo, dados = assinatura.get(timeout=HEARTBEAT_SEGUNDOS)
+                except queue.Empty:
+                    if assinatura.transbordou:
+                        break
+                    yield ': ping\n\n'
+                    continue
+
+                yield formatar_evento(evento_id, tipo, dados)
+
+                if assinatura.transbordou and assinatura.empty():
+                    # Cliente lento: encerra para ele retomar pelo histórico
+                    break
+        finally:
+            broker.cancelar(assinatura)
+
+    return Response(
+        gerar(),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        }
+    )
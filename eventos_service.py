@@ -0,0 +1,306 @@
+import json
+import os
+import queue
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from functools import lru_cache
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+class Assinatura(queue.Queue):
+    """Buffer limitado de eventos de um cliente conectado"""
+
+    def __init__(self, maxsize):
+        super().__init__(maxsize)
+        self.transbordou = False
+        # Id do último evento entregue a este cliente
+        self.ultimo_id = 0
+
+class EventBroker:
+    """
+    Pub/sub de eventos de cobranças entre todos os processos
+
+    Os eventos são gravados na tabela eventos_cobranca, na mesma transação
+    da mudança que os gerou; o id da linha é o id do evento no stream. Cada
+    processo tem uma thread que, enquanto houver clientes conectados, lê os
+    eventos novos por id (a cada EVENTOS_INTERVALO_MS, ou logo depois de um
+    commit no próprio processo) e os distribui.
+
+    Cada cliente recebe um buffer limitado; um cliente lento que enche o
+    buffer é desconectado e, ao reconectar com Last-Event-ID, recupera o que
+    perdeu a partir da tabela (eventos mantidos por EVENTOS_RETENCAO_HORAS).
+    Um Last-Event-ID que a tabela não alcança mais gera um evento "reset"
+    para o cliente recarregar os dados.
+
+    Cada processo aceita até EVENTOS_MAX_CONEXOES clientes: cada stream ocupa
+    uma thread do pool do servidor enquanto dura.
+    """
+
+    LOTE_LEITURA = 500
+
+    def __init__(self, tamanho_buffer=100, intervalo=0.5, retencao=timedelta(hours=24), max_conexoes=4):
+        self.tamanho_buffer = tamanho_buffer
+        self.intervalo = intervalo
+        self.retencao = retencao
+        self.max_conexoes = max_conexoes
+        self._app = None
+        self._assinaturas = set()
+        # Último id já lido da tabela pela thread deste processo
+        self._cursor = 0
+        self._acordado = False
+        self._leitura = None
+        self._lock = threading.Condition()
+
+    def init_app(self, app):
+        self._app = app
+
+    def publicar(self, tipo, dados):
+        """
+        Publica um evento para os clientes de todos os processos
+
+        Para eventos fora de uma sessão do ORM (ex.: atualizações em lote);
+        grava em transação própria.
+
+        Args:
+            tipo (str): Tipo do evento (ex.: cobranca_status_lote)
+            dados (dict): Conteúdo serializável em JSON
+        """
+        from src.models.cobranca import EventoCobranca, db
+
+        with db.engine.begin() as connection:
+            connection.execute(EventoCobranca.__table__.insert(), [_linha_evento(tipo, dados)])
+        self.acordar()
+
+    def acordar(self):
+        """Antecipa a próxima leitura deste processo (chamado depois de um commit com eventos)"""
+        with self._lock:
+            self._acordado = True
+            self._lock.notify_all()
+
+    def _ler(self, depois_de, ate=None, limite=None):
+        """Eventos da tabela com id > depois_de (e <= ate), em ordem"""
+        from src.models.cobranca import EventoCobranca, db
+
+        consulta = db.select(EventoCobranca.id, EventoCobranca.tipo, EventoCobranca.dados).where(EventoCobranca.id > depois_de)
+        if ate is not None:
+            consulta = consulta.where(EventoCobranca.id <= ate)
+        consulta = consulta.order_by(EventoCobranca.id).limit(limite or self.LOTE_LEITURA)
+
+        with self._app.app_context(), db.engine.connect() as connection:
+            return [(str(id_), tipo, json.loads(dados)) for id_, tipo, dados in connection.execute(consulta)]
+
+    def _limites(self):
+        from src.models.cobranca import EventoCobranca, db
+
+        with self._app.app_context(), db.engine.connect() as connection:
+            return connection.execute(db.select(db.func.min(EventoCobranca.id), db.func.max(EventoCobranca.id))).one()
+
+    def assinar(self, ultimo_evento_id=None):
+        """
+        Registra um novo cliente
+
+        Args:
+            ultimo_evento_id (str): Valor do cabeçalho Last-Event-ID, se houver
+
+        Returns:
+            Assinatura: Fila de eventos do cliente, ou None se o processo já
+                está com EVENTOS_MAX_CONEXOES clientes
+        """
+        assinatura = Assinatura(self.tamanho_buffer)
+
+        with self._lock:
+            if len(self._assinaturas) >= self.max_conexoes:
+                return None
+
+            if self._leitura is None:
+                # Thread parada: recomeça do fim da tabela
+                self._cursor = self._limites()[1] or 0
+                self._leitura = threading.Thread(target=self._acompanhar, name='eventos-leitura', daemon=True)
+                self._leitura.start()
+
+            assinatura.ultimo_id = self._cursor
+            if ultimo_evento_id:
+                self._retomar(assinatura, ultimo_evento_id)
+            if not assinatura.transbordou:
+                self._assinaturas.add(assinatura)
+
+        return assinatura
+
+    def _retomar(self, assinatura, ultimo_evento_id):
+        """Coloca na fila os eventos entre o Last-Event-ID e a posição atual da leitura (chamado com o lock)"""
+        reset = (str(self._cursor), 'reset', {})
+        if not ultimo_evento_id.isdigit():
+            assinatura.put_nowait(reset)
+            return
+
+        ultimo = int(ultimo_evento_id)
+        primeiro, maximo = self._limites()
+
+        if ultimo >= self._cursor:
+            if ultimo == self._cursor or ultimo <= (maximo or 0):
+                # Já recebido por meio de outro processo, que leu a tabela antes deste
+                assinatura.ultimo_id = ultimo
+            else:
+                assinatura.put_nowait(reset)
+            return
+
+        if primeiro is None or primeiro > ultimo + 1:
+            # A limpeza já removeu eventos que o cliente não recebeu
+            assinatura.put_nowait(reset)
+            return
+
+        eventos = self._ler(ultimo, ate=self._cursor, limite=self.tamanho_buffer + 1)
+        for evento in eventos[:self.tamanho_buffer]:
+            assinatura.put_nowait(evento)
+        if len(eventos) > self.tamanho_buffer:
+            # Entrega o buffer e encerra; o cliente retoma do último evento recebido
+            assinatura.transbordou = True
+
+    def _acompanhar(self):
+        """Lê os eventos novos da tabela e distribui aos clientes deste processo"""
+        while True:
+            with self._lock:
+                if not self._acordado:
+                    self._lock.wait(self.intervalo)
+                self._acordado = False
+                if not self._assinaturas:
+                    self._leitura = None
+                    return
+                cursor = self._cursor
+
+            try:
+                eventos = self._ler(cursor)
+            except Exception as e:
+                print(f"Erro ao ler eventos de cobranças: {e}")
+                continue
+
+            if not eventos:
+                continue
+
+            with self._lock:
+                self._cursor = int(eventos[-1][0])
+                for assinatura in list(self._assinaturas):
+                    for evento in eventos:
+                        if int(evento[0]) <= assinatura.ultimo_id:
+                            continue
+                        try:
+                            assinatura.put_nowait(evento)
+                        except queue.Full:
+                            assinatura.transbordou = True
+                            self._assinaturas.discard(assinatura)
+                            break
+                        assinatura.ultimo_id = int(evento[0])
+
+            if len(eventos) == self.LOTE_LEITURA:
+                # Ainda há eventos na tabela: lê o próximo lote sem esperar
+                self.acordar()
+
+    def cancelar(self, assinatura):
+        """Remove um cliente desconectado"""
+        with self._lock:
+            self._assinaturas.discard(assinatura)
+
+    def limpar(self):
+        """
+        Remove os eventos mais antigos que EVENTOS_RETENCAO_HORAS
+
+        Returns:
+            int: Eventos removidos
+        """
+        from src.models.cobranca import EventoCobranca, db
+
+        with db.engine.begin() as connection:
+            return connection.execute(
+                EventoCobranca.__table__.delete().where(EventoCobranca.data_criacao < datetime.utcnow() - self.retencao)
+            ).rowcount
+
+    @property
+    def total_clientes(self):
+        with self._lock:
+            return len(self._assinaturas)
+
+def _linha_evento(tipo, dados):
+    return {'tipo': tipo, 'dados': json.dumps(dados, ensure_ascii=False), 'data_criacao': datetime.utcnow()}
+
+def _dados_status(cobranca, status_anterior):
+    return {
+        'id': cobranca.id,
+        'status': cobranca.status,
+        'status_anterior': status_anterior,
+        'data_atualizacao': cobranca.data_atualizacao.isoformat() if cobranca.data_atualizacao else None,
+        'data_pagamento': cobranca.data_pagamento.isoformat() if cobranca.data_pagamento else None
+    }
+
+def _gravar_eventos(session, flush_context):
+    from src.models.cobranca import Cobranca, EventoCobranca
+
+    if session.info.get('sem_eventos'):
+        return
+
+    eventos = []
+    for obj in session.new:
+        if isinstance(obj, Cobranca):
+            eventos.append(_linha_evento('cobranca_criada', obj.to_dict()))
+
+    for obj in session.dirty:
+        if isinstance(obj, Cobranca):
+            historico = inspect(obj).attrs.status.history
+            if historico.has_changes():
+                anterior = historico.deleted[0] if historico.deleted else None
+                eventos.append(_linha_evento('cobranca_status', _dados_status(obj, anterior)))
+
+    if eventos:
+        # Na transação da própria mudança: um rollback descarta os eventos junto
+        session.connection().execute(EventoCobranca.__table__.insert(), eventos)
+        session.info['eventos_cobranca'] = True
+
+def _avisar_commit(session):
+    if session.info.pop('eventos_cobranca', None):
+        get_event_broker().acordar()
+
+def _descartar_aviso(session):
+    session.info.pop('eventos_cobranca', None)
+
+@contextmanager
+def sem_eventos(session):
+    """
+    Não grava eventos das mudanças feitas na sessão dentro do bloco
+
+    Para restaurações e cargas em lote, que gerariam um evento por cobrança;
+    quem usa publica depois, se preciso, um único evento (ex.: reset).
+    """
+    session.info['sem_eventos'] = True
+    try:
+        yield
+    finally:
+        session.info.pop('sem_eventos', None)
+
+_listeners_registrados = False
+
+def registrar_listeners():
+    """
+    Liga a publicação de eventos às transações do SQLAlchemy
+
+    Criações e mudanças de status de Cobranca viram linhas de
+    eventos_cobranca a cada flush, na mesma transação; depois do commit a
+    leitura deste processo é antecipada.
+    """
+    global _listeners_registrados
+    if _listeners_registrados:
+        return
+
+    event.listen(Session, 'after_flush', _gravar_eventos)
+    event.listen(Session, 'after_commit', _avisar_commit)
+    event.listen(Session, 'after_rollback', _descartar_aviso)
+    _listeners_registrados = True
+
+@lru_cache(maxsize=None)
+def get_event_broker():
+    """Retorna o broker compartilhado do processo, criado no primeiro uso"""
+    return EventBroker(
+        tamanho_buffer=int(os.getenv('EVENTOS_BUFFER_CLIENTE', 100)),
+        intervalo=float(os.getenv('EVENTOS_INTERVALO_MS', 500)) / 1000,
+        retencao=timedelta(hours=float(os.getenv('EVENTOS_RETENCAO_HORAS', 24))),
+        max_conexoes=int(os.getenv('EVENTOS_MAX_CONEXOES', 4))
+    )
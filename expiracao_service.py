@@ -0,0 +1,143 @@
+import os
+import threading
+import time
+from datetime import datetime
+from functools import lru_cache
+from src.models.cobranca import Cobranca, db
+
+class ExpiracaoService:
+    """
+    Varredura de cobranças pendentes com link de pagamento vencido
+
+    Encontra as cobranças por um range scan no índice (status,
+    data_vencimento) e as marca como "expired" em lotes pequenos, cada um
+    em sua própria transação, para não segurar o lock de escrita do banco.
+    """
+
+    def __init__(self):
+        self.tamanho_lote = int(os.getenv('EXPIRACAO_LOTE', 500))
+        self.pausa_segundos = float(os.getenv('EXPIRACAO_PAUSA_MS', 50)) / 1000
+        self.ultima_execucao = None
+        self.total_expiradas = 0
+        self._lock = threading.Lock()
+
+    def _filtro_vencidas(self, agora):
+        return (Cobranca.status == 'pending', Cobranca.data_vencimento < agora)
+
+    def varrer(self, dry_run=False, agora=None):
+        """
+        Marca como expiradas as cobranças pendentes vencidas
+
+        Args:
+            dry_run (bool): Apenas conta e lista as cobranças que seriam expiradas
+            agora (datetime): Instante de referência (UTC); padrão é o atual
+
+        Returns:
+            dict: Métricas da execução
+        """
+        # Evita duas varreduras simultâneas no mesmo processo
+        if not self._lock.acquire(blocking=False):
+            return {'success': False, 'error': 'Varredura já em andamento'}
+
+        try:
+            agora = agora or datetime.utcnow()
+            inicio = time.perf_counter()
+
+            metricas = {
+                'success': True,
+                'dry_run': dry_run,
+                'referencia': agora.isoformat(),
+                'encontradas': 0,
+                'expiradas': 0,
+                'lotes': 0
+            }
+
+            if dry_run:
+                metricas['encontradas'] = db.session.execute(
+                    db.select(db.func.count(Cobranca.id)).where(*self._filtro_vencidas(agora))
+                ).scalar()
+                metricas['amostra_ids'] = db.session.execute(
+                    db.select(Cobranca.id)
+                    .where(*self._filtro_vencidas(agora))
+                    .order_by(Cobranca.data_vencimento, Cobranca.id)
+                    .limit(20)
+                ).scalars().all()
+            else:
+                self._expirar_em_lotes(agora, metricas)
+
+            metricas['duracao_ms'] = round((time.perf_counter() - inicio) * 1000, 2)
+
+            if not dry_run:
+                self.total_expiradas += metricas['expiradas']
+                self.ultima_execucao = metricas
+
+            return metricas
+
+        except Exception as e:
+            db.session.rollback()
+            return {'success': False, 'error': str(e)}
+
+        finally:
+            self._lock.release()
+
+    def _expirar_em_lotes(self, agora, metricas):
+        from src.services.eventos_service import get_event_broker
+
+        while True:
+            ids = db.session.execute(
+                db.select(Cobranca.id)
+                .where(*self._filtro_vencidas(agora))
+                .order_by(Cobranca.data_vencimento, Cobranca.id)
+                .limit(self.tamanho_lote)
+            ).scalars().all()
+
+            if not ids:
+                break
+
+            # data_atualizacao precisa mudar para invalidar os ETags da listagem
+            atualizado_em = datetime.utcnow()
+            resultado = db.session.execute(
+                db.update(Cobranca)
+                .where(Cobranca.id.in_(ids), Cobranca.status == 'pending')
+                .values(status='expired', data_atualizacao=atualizado_em)
+                .execution_options(synchronize_session=False)
+            )
+            db.session.commit()
+
+            metricas['encontradas'] += len(ids)
+            metricas['expiradas'] += resultado.rowcount
+            metricas['lotes'] += 1
+
+            get_event_broker().publicar('cobranca_status_lote', {
+                'ids': ids,
+                'status': 'expired',
+                'status_anterior': 'pending',
+                'data_atualizacao': atualizado_em.isoformat(),
+                'data_pagamento': None
+            })
+
+            if len(ids) < self.tamanho_lote:
+                break
+
+            # Dá espaço para outros escritores entre um lote e outro
+            time.sleep(self.pausa_segundos)
+
+    def metricas(self):
+        """
+        Retorna as métricas acumuladas e o backlog atual
+
+        Returns:
+            dict: Última execução, total expirado pelo processo e pendentes vencidas agora
+        """
+        return {
+            'ultima_execucao': self.ultima_execucao,
+            'total_expiradas': self.total_expiradas,
+            'pendentes_vencidas': db.session.execute(
+                db.select(db.func.count(Cobranca.id)).where(*self._filtro_vencidas(datetime.utcnow()))
+            ).scalar()
+        }
+
+@lru_cache(maxsize=None)
+def get_expiracao_service():
+    """Retorna a instância compartilhada do serviço, criada no primeiro uso"""
+    return ExpiracaoService()
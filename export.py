@@ -0,0 +1,46 @@
+from datetime import datetime
+from flask import Blueprint, Response, request, jsonify, stream_with_context
+from src.services.export_service import get_export_service
+
+export_bp = Blueprint('export', __name__)
+
+@export_bp.route('/cobrancas/export.csv', methods=['GET'])
+def export_csv():
+    """
+    Exporta cobranças em CSV (streaming) para a contabilidade
+
+    Query params (todos opcionais):
+        status: status ou lista separada por vírgula (ex.: approved,pending)
+        mes: mês de criação no formato YYYY-MM
+        data_inicio / data_fim: período de criação (YYYY-MM-DD, inclusivo)
+        cliente: email exato ou parte do nome do cliente
+        incluir_arquivo: 1 para incluir as cobranças arquivadas
+    """
+    try:
+        export_service = get_export_service()
+        filtros = export_service.montar_filtros(
+            status=request.args.get('status'),
+            data_inicio=request.args.get('data_inicio'),
+            data_fim=request.args.get('data_fim'),
+            mes=request.args.get('mes'),
+            cliente=request.args.get('cliente')
+        )
+    except ValueError:
+        return jsonify({
+            'success': False,
+            'error': 'Data inválida: use YYYY-MM-DD para data_inicio/data_fim e YYYY-MM para mes'
+        }), 400
+
+    sufixo = request.args.get('mes') or datetime.now().strftime('%Y%m%d_%H%M%S')
+
+    return Response(
+        stream_with_context(export_service.gerar_csv(
+            filtros,
+            incluir_arquivo=request.args.get('incluir_arquivo', '').lower() in ('1', 'true', 'yes')
+        )),
+        mimetype='text/csv',
+        headers={
+            'Content-Disposition': f'attachment; filename=cobrancas_{sufixo}.csv',
+            'Cache-Control': 'no-store'
+        }
+    )
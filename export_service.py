@@ -0,0 +1,170 @@
+import csv
+import io
+from datetime import datetime, timedelta
+from functools import lru_cache
+from src.models.cobranca import Cobranca, db
+
+class ExportService:
+    """
+    Exportação de cobranças em CSV para a contabilidade
+
+    As linhas são lidas em janelas por id (keyset) e escritas direto na
+    resposta, sem montar o arquivo nem carregar o resultado inteiro.
+    """
+
+    COLUNAS = [
+        ('id', Cobranca.id),
+        ('external_reference', Cobranca.external_reference),
+        ('mercadopago_id', Cobranca.mercadopago_id),
+        ('cliente_nome', Cobranca.cliente_nome),
+        ('cliente_email', Cobranca.cliente_email),
+        ('cliente_documento', Cobranca.cliente_documento),
+        ('titulo', Cobranca.titulo),
+        ('valor', Cobranca.valor),
+        ('status', Cobranca.status),
+        ('data_criacao', Cobranca.data_criacao),
+        ('data_vencimento', Cobranca.data_vencimento),
+        ('data_pagamento', Cobranca.data_pagamento)
+    ]
+
+    FORMATO_DATA = '%Y-%m-%d %H:%M:%S'
+
+    # Início de célula que o Excel/LibreOffice interpretam como fórmula
+    PREFIXOS_FORMULA = ('=', '+', '-', '@', '\t', '\r')
+
+    def __init__(self, janela=1000):
+        self.janela = janela
+
+    def montar_filtros(self, status=None, data_inicio=None, data_fim=None, mes=None, cliente=None):
+        """
+        Converte os parâmetros da requisição em filtros do SQLAlchemy
+
+        Args:
+            status (str): Status, ou vários separados por vírgula
+            data_inicio (str): Data inicial (YYYY-MM-DD) de criação, inclusiva
+            data_fim (str): Data final (YYYY-MM-DD) de criação, inclusiva
+            mes (str): Mês de criação (YYYY-MM), atalho para o período
+            cliente (str): Email exato ou parte do nome do cliente
+
+        Returns:
+            list: Expressões de filtro
+
+        Raises:
+            ValueError: Se alguma data estiver em formato inválido
+        """
+        filtros = []
+
+        if status:
+            filtros.append(Cobranca.status.in_([s.strip() for s in status.split(',') if s.strip()]))
+
+        if mes:
+            inicio = datetime.strptime(mes, '%Y-%m')
+            proximo = (inicio.replace(day=28) + timedelta(days=4)).replace(day=1)
+            filtros.append(Cobranca.data_criacao >= inicio)
+            filtros.append(Cobranca.data_criacao < proximo)
+
+        if data_inicio:
+            filtros.append(Cobranca.data_criacao >= datetime.strptime(data_inicio, '%Y-%m-%d'))
+
+        if data_fim:
+            filtros.append(Cobranca.data_criacao < datetime.strptime(data_fim, '%Y-%m-%d') + timedelta(days=1))
+
+        if cliente:
+            cliente = cliente.strip()
+            if '@' in cliente:
+                filtros.append(db.func.lower(Cobranca.cliente_email) == cliente.lower())
+            else:
+                filtros.append(Cobranca.cliente_nome.ilike(f'%{cliente}%'))
+
+        return filtros
+
+    def formatar_valor(self, valor):
+        """Valor com duas casas e vírgula decimal (padrão das planilhas pt-BR)"""
+        return f'{valor:.2f}'.replace('.', ',') if valor is not None else ''
+
+    def texto(self, valor):
+        """Texto informado pelo usuário, com ' na frente se a planilha o leria como fórmula"""
+        if not valor:
+            return ''
+        return f"'{valor}" if valor.startswith(self.PREFIXOS_FORMULA) else valor
+
+    def formatar_data(self, data):
+        return data.strftime(self.FORMATO_DATA) if data else ''
+
+    def gerar_csv(self, filtros, incluir_arquivo=False):
+        """
+        Gera o CSV em pedaços, uma janela de linhas por vez
+
+        Args:
+            filtros (list): Expressões retornadas por montar_filtros
+            incluir_arquivo (bool): Inclui as cobranças arquivadas (antes das do banco principal)
+
+        Yields:
+            str: Pedaços do arquivo CSV
+        """
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, delimiter=';', lineterminator='\r\n')
+
+        # BOM para o Excel reconhecer UTF-8
+        buffer.write('\ufeff')
+        writer.writerow([nome for nome, _ in self.COLUNAS])
+
+        fontes = []
+        if incluir_arquivo:
+            from src.services.arquivo_service import get_arquivo_service
+            arquivo_service = get_arquivo_service()
+            # Períodos mais antigos primeiro, para manter a ordem aproximada por id
+            for item in reversed(arquivo_service.periodos()):
+                fontes.append(arquivo_service.engine(item['filepath']))
+        fontes.append(None)
+
+        for fonte in fontes:
+            if fonte is None:
+                yield from self._gerar_linhas(db.session.execute, filtros, buffer, writer)
+            else:
+                with fonte.connect() as connection:
+                    yield from self._gerar_linhas(connection.execute, filtros, buffer, writer)
+
+    def _gerar_linhas(self, executar, filtros, buffer, writer):
+        colunas = [coluna for _, coluna in self.COLUNAS]
+        ultimo_id = 0
+
+        while True:
+            linhas = executar(
+                db.select(*colunas)
+                .where(Cobranca.id > ultimo_id, *filtros)
+                .order_by(Cobranca.id)
+                .limit(self.janela)
+            ).all()
+
+            for linha in linhas:
+                writer.writerow([
+                    linha.id,
+                    self.texto(linha.external_reference),
+                    self.texto(linha.mercadopago_id),
+                    self.texto(linha.cliente_nome),
+                    self.texto(linha.cliente_email),
+                    self.texto(linha.cliente_documento),
+                    self.texto(linha.titulo),
+                    self.formatar_valor(linha.valor),
+                    linha.status,
+                    self.formatar_data(linha.data_criacao),
+                    self.formatar_data(linha.data_vencimento),
+                    self.formatar_data(linha.data_pagamento)
+                ])
+
+            chunk = buffer.getvalue()
+            if chunk:
+                yield chunk
+                buffer.seek(0)
+                buffer.truncate(0)
+
+            if len(linhas) < self.janela:
+                break
+
+            ultimo_id = linhas[-1].id
+
+@lru_cache(maxsize=None)
+def get_export_service():
+    """Retorna a instância compartilhada do serviço, criada no primeiro uso"""
+    return ExportService()
@@ -0,0 +1,236 @@
+import hashlib
+import os
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from functools import lru_cache
+from flask import Response, g, jsonify, request
+from src.models.cobranca import RequisicaoIdempotente, db
+
+class IdempotenciaService:
+    """
+    Idempotency-Key na criação de cobranças (POST /api/cobrancas)
+
+    A primeira requisição com uma chave a reserva (INSERT OR IGNORE na
+    tabela requisicoes_idempotentes) e segue para a view; a resposta é
+    guardada por IDEMPOTENCIA_TTL_HORAS. Repetições com a mesma chave
+    recebem a resposta guardada sem criar preferência, cobrança ou email.
+    Repetições que chegam enquanto a primeira ainda está em andamento
+    esperam por ela (até IDEMPOTENCIA_ESPERA_SEGUNDOS).
+
+    Respostas 5xx e exceções liberam a chave, para a próxima tentativa
+    executar de novo. Cada reserva leva um token da requisição dona, e só
+    ela grava a resposta ou libera a chave. Enquanto a view roda, uma
+    thread renova as reservas deste processo a cada terço de
+    IDEMPOTENCIA_RESERVA_SEGUNDOS; se o processo cair no meio, a reserva
+    vence e outra requisição assume a chave.
+    """
+
+    CABECALHO = 'Idempotency-Key'
+    TAMANHO_MAXIMO = 255
+    ROTA_CRIACAO = re.compile(r'^/api/cobrancas/?$')
+
+    def __init__(self):
+        self.ttl = timedelta(hours=float(os.getenv('IDEMPOTENCIA_TTL_HORAS', 24)))
+        self.reserva = timedelta(seconds=float(os.getenv('IDEMPOTENCIA_RESERVA_SEGUNDOS', 60)))
+        self.espera = float(os.getenv('IDEMPOTENCIA_ESPERA_SEGUNDOS', 30))
+        # Acorda as repetições deste processo quando uma chave é concluída ou liberada
+        self._condicao = threading.Condition()
+        # Reservas em andamento neste processo (chave -> dono), renovadas por _renovar
+        self._ativas = {}
+        self._renovacao = None
+        self._app = None
+
+    def init_app(self, app):
+        self._app = app
+        app.before_request(self._verificar)
+        app.after_request(self._gravar)
+        app.teardown_request(self._liberar)
+
+    def _suportada(self):
+        return (
+            request.method == 'POST'
+            and request.blueprint == 'cobranca'
+            and self.ROTA_CRIACAO.match(request.path) is not None
+        )
+
+    def _reservar(self, chave, hash_requisicao, dono):
+        """
+        Reserva a chave para a requisição atual
+
+        Returns:
+            Row: Registro existente da chave, ou None se a reserva foi feita
+        """
+        tabela = RequisicaoIdempotente.__table__
+        agora = datetime.utcnow()
+        reserva = {
+            'hash_requisicao': hash_requisicao,
+            'status': 'processando',
+            'dono': dono,
+            'status_http': None,
+            'content_type': None,
+            'resposta': None,
+            'data_criacao': agora,
+            'expira_em': agora + self.reserva
+        }
+
+        with db.engine.begin() as connection:
+            inserida = connection.execute(
+                tabela.insert().prefix_with('OR IGNORE').values(chave=chave, **reserva)
+            ).rowcount
+            if inserida:
+                return None
+
+            # Reserva abandonada ou resposta fora do TTL: a chave pode ser reutilizada
+            assumida = connection.execute(
+                tabela.update().where(tabela.c.chave == chave, tabela.c.expira_em < agora).values(**reserva)
+            ).rowcount
+            if assumida:
+                return None
+
+            return connection.execute(db.select(tabela).where(tabela.c.chave == chave)).one_or_none()
+
+    def _verificar(self):
+        chave = request.headers.get(self.CABECALHO)
+        if chave is None or not self._suportada():
+            return None
+
+        chave = chave.strip()
+        if not chave or len(chave) > self.TAMANHO_MAXIMO:
+            return jsonify({
+                'success': False,
+                'error': f'{self.CABECALHO} inválida (1 a {self.TAMANHO_MAXIMO} caracteres)'
+            }), 400
+
+        hash_requisicao = hashlib.sha256(
+            f'{request.method}|{request.path}|'.encode('utf-8') + request.get_data()
+        ).hexdigest()
+        prazo = time.monotonic() + self.espera
+        dono = uuid.uuid4().hex
+
+        while True:
+            registro = self._reservar(chave, hash_requisicao, dono)
+            if registro is None:
+                g._idempotencia = (chave, dono)
+                self._acompanhar(chave, dono)
+                return None
+
+            if registro.hash_requisicao != hash_requisicao:
+                return jsonify({
+                    'success': False,
+                    'error': f'{self.CABECALHO} já usada em outra requisição'
+                }), 422
+
+            if registro.status == 'concluida':
+                response = Response(registro.resposta, status=registro.status_http, content_type=registro.content_type)
+                response.headers['Idempotent-Replayed'] = 'true'
+                return response
+
+            restante = prazo - time.monotonic()
+            if restante <= 0:
+                response = jsonify({
+                    'success': False,
+                    'error': 'Requisição com esta chave ainda em processamento'
+                })
+                response.status_code = 409
+                response.headers['Retry-After'] = '1'
+                return response
+
+            # Outros processos não avisam: consulta de novo a cada 250 ms
+            with self._condicao:
+                self._condicao.wait(min(restante, 0.25))
+
+    def _acompanhar(self, chave, dono):
+        """Inclui a reserva nas renovações, iniciando a thread no primeiro uso"""
+        with self._condicao:
+            self._ativas[chave] = dono
+            if self._renovacao is None or not self._renovacao.is_alive():
+                self._renovacao = threading.Thread(target=self._renovar, name='idempotencia-renovacao', daemon=True)
+                self._renovacao.start()
+
+    def _soltar(self, chave, dono):
+        with self._condicao:
+            if self._ativas.get(chave) == dono:
+                del self._ativas[chave]
+            self._condicao.notify_all()
+
+    def _renovar(self):
+        """Estende as reservas em andamento neste processo enquanto houver alguma"""
+        tabela = RequisicaoIdempotente.__table__
+        intervalo = self.reserva.total_seconds() / 3
+
+        while True:
+            with self._condicao:
+                self._condicao.wait_for(lambda: not self._ativas, timeout=intervalo)
+                if not self._ativas:
+                    self._renovacao = None
+                    return
+                ativas = list(self._ativas.items())
+
+            with self._app.app_context(), db.engine.begin() as connection:
+                connection.execute(
+                    tabela.update()
+                    .where(
+                        tabela.c.chave == db.bindparam('b_chave'),
+                        tabela.c.dono == db.bindparam('b_dono'),
+                        tabela.c.status == 'processando'
+                    )
+                    .values(expira_em=datetime.utcnow() + self.reserva),
+                    [{'b_chave': chave, 'b_dono': dono} for chave, dono in ativas]
+                )
+
+    def _gravar(self, response):
+        reserva = g.get('_idempotencia')
+        if reserva is None or response.status_code >= 500 or response.is_streamed:
+            # Sem resposta para guardar: _liberar solta a chave
+            return response
+
+        chave, dono = reserva
+        tabela = RequisicaoIdempotente.__table__
+        with db.engine.begin() as connection:
+            connection.execute(
+                tabela.update()
+                .where(tabela.c.chave == chave, tabela.c.dono == dono, tabela.c.status == 'processando')
+                .values(
+                    status='concluida',
+                    status_http=response.status_code,
+                    content_type=response.content_type,
+                    resposta=response.get_data(as_text=True),
+                    expira_em=datetime.utcnow() + self.ttl
+                )
+            )
+
+        g.pop('_idempotencia', None)
+        self._soltar(chave, dono)
+        return response
+
+    def _liberar(self, exc):
+        reserva = g.pop('_idempotencia', None)
+        if reserva is None:
+            return
+
+        chave, dono = reserva
+        tabela = RequisicaoIdempotente.__table__
+        with db.engine.begin() as connection:
+            connection.execute(
+                tabela.delete().where(tabela.c.chave == chave, tabela.c.dono == dono, tabela.c.status == 'processando')
+            )
+        self._soltar(chave, dono)
+
+    def limpar(self):
+        """
+        Remove as chaves vencidas (respostas fora do TTL e reservas abandonadas)
+
+        Returns:
+            int: Registros removidos
+        """
+        tabela = RequisicaoIdempotente.__table__
+        with db.engine.begin() as connection:
+            return connection.execute(tabela.delete().where(tabela.c.expira_em < datetime.utcnow())).rowcount
+
+@lru_cache(maxsize=None)
+def get_idempotencia_service():
+    """Retorna a instância compartilhada do serviço, criada no primeiro uso"""
+    return IdempotenciaService()
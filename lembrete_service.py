@@ -0,0 +1,208 @@
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from functools import lru_cache
+from src.models.cobranca import Cobranca, EmailOutbox, LembreteCobranca, db
+
+class LembreteService:
+    """
+    Campanhas de lembrete para cobranças pendentes
+
+    Cada execução percorre as faixas de vencimento configuradas (dias antes
+    do vencimento do link, ex.: 7, 3 e 1) com range scans no índice (status,
+    data_vencimento), renderiza os emails com os templates do EmailService e
+    os grava em lote na outbox, que os envia reutilizando as conexões SMTP.
+    O histórico (lembretes_cobranca) garante um lembrete por faixa e
+    permite limitar quantos lembretes cada cliente recebe.
+    """
+
+    def __init__(self):
+        dias = os.getenv('LEMBRETES_DIAS_ANTES', '7,3,1')
+        self.faixas = sorted({int(d) for d in dias.split(',') if d.strip()}, reverse=True)
+        # Intervalo mínimo entre dois lembretes para o mesmo email
+        self.intervalo_cliente = timedelta(hours=float(os.getenv('LEMBRETES_INTERVALO_CLIENTE_HORAS', 24)))
+        self.tamanho_lote = int(os.getenv('LEMBRETES_LOTE', 1000))
+        self.ultima_execucao = None
+        self._lock = threading.Lock()
+
+    def janelas(self, agora):
+        """
+        Faixas de vencimento como intervalos (inicio, fim] de data_vencimento
+
+        Cada cobrança cai em uma única faixa: a de menor prazo que já alcançou.
+
+        Returns:
+            list: [(faixa, inicio, fim)]
+        """
+        janelas = []
+        for i, dias in enumerate(self.faixas):
+            proxima = self.faixas[i + 1] if i + 1 < len(self.faixas) else 0
+            janelas.append((f'd-{dias}', agora + timedelta(days=proxima), agora + timedelta(days=dias)))
+        return janelas
+
+    def _selecionar(self, faixa, inicio, fim, cursor):
+        ja_lembrada = (
+            db.select(LembreteCobranca.id)
+            .where(LembreteCobranca.cobranca_id == Cobranca.id, LembreteCobranca.faixa == faixa)
+            .exists()
+        )
+        consulta = (
+            db.select(
+                Cobranca.id, Cobranca.cliente_nome, Cobranca.cliente_email, Cobranca.titulo,
+                Cobranca.valor, Cobranca.external_reference, Cobranca.payment_url,
+                Cobranca.data_vencimento
+            )
+            .where(
+                Cobranca.status == 'pending',
+                Cobranca.data_vencimento > inicio,
+                Cobranca.data_vencimento <= fim,
+                Cobranca.payment_url.isnot(None),
+                ~ja_lembrada
+            )
+            .order_by(Cobranca.data_vencimento, Cobranca.id)
+            .limit(self.tamanho_lote)
+        )
+        if cursor:
+            consulta = consulta.where(db.tuple_(Cobranca.data_vencimento, Cobranca.id) > cursor)
+        return db.session.execute(consulta).all()
+
+    def _lembrados_recentemente(self, emails, agora):
+        if not emails:
+            return set()
+        return set(db.session.execute(
+            db.select(LembreteCobranca.destinatario)
+            .where(
+                LembreteCobranca.destinatario.in_(emails),
+                LembreteCobranca.data_envio >= agora - self.intervalo_cliente
+            )
+            .distinct()
+        ).scalars())
+
+    def executar(self, dry_run=False, agora=None):
+        """
+        Executa uma campanha de lembretes
+
+        Args:
+            dry_run (bool): Apenas conta quantos lembretes seriam enfileirados
+            agora (datetime): Instante de referência (UTC); padrão é o atual
+
+        Returns:
+            dict: Métricas da execução, por faixa
+        """
+        from src.services.email_service import get_email_service
+
+        if not self._lock.acquire(blocking=False):
+            return {'success': False, 'error': 'Campanha já em andamento'}
+
+        try:
+            agora = agora or datetime.utcnow()
+            inicio_execucao = time.perf_counter()
+            email_service = get_email_service()
+
+            metricas = {
+                'success': True,
+                'dry_run': dry_run,
+                'referencia': agora.isoformat(),
+                'enfileirados': 0,
+                'limitados_por_cliente': 0,
+                'faixas': {}
+            }
+            # Clientes que já receberam lembrete nesta execução
+            lembrados = set()
+
+            for faixa, inicio, fim in self.janelas(agora):
+                contagem = {'enfileirados': 0, 'limitados_por_cliente': 0}
+                cursor = None
+
+                while True:
+                    linhas = self._selecionar(faixa, inicio, fim, cursor)
+                    if not linhas:
+                        break
+                    cursor = (linhas[-1].data_vencimento, linhas[-1].id)
+
+                    recentes = self._lembrados_recentemente({linha.cliente_email for linha in linhas}, agora)
+                    mensagens = []
+                    historico = []
+
+                    for linha in linhas:
+                        email = linha.cliente_email
+                        if email in lembrados or email in recentes:
+                            contagem['limitados_por_cliente'] += 1
+                            continue
+                        lembrados.add(email)
+
+                        dias_restantes = int((linha.data_vencimento - agora).total_seconds() // 86400)
+                        assunto, corpo_html, corpo_texto = email_service.gerar_email_lembrete(
+                            linha._asdict(), linha.payment_url, dias_restantes
+                        )
+                        mensagens.append({
+                            'cobranca_id': linha.id,
+                            'tipo': 'lembrete',
+                            'destinatario': email,
+                            'assunto': assunto,
+                            'corpo_html': corpo_html,
+                            'corpo_texto': corpo_texto,
+                            'status': 'pending',
+                            'tentativas': 0,
+                            'proxima_tentativa': agora,
+                            'data_criacao': agora
+                        })
+                        historico.append({
+                            'cobranca_id': linha.id,
+                            'faixa': faixa,
+                            'destinatario': email,
+                            'data_envio': agora
+                        })
+
+                    contagem['enfileirados'] += len(mensagens)
+
+                    if mensagens and not dry_run:
+                        # Outbox e histórico do lote na mesma transação
+                        outbox_ids = db.session.execute(
+                            db.insert(EmailOutbox).returning(EmailOutbox.id, sort_by_parameter_order=True),
+                            mensagens
+                        ).scalars().all()
+                        for registro, outbox_id in zip(historico, outbox_ids):
+                            registro['outbox_id'] = outbox_id
+                        db.session.execute(db.insert(LembreteCobranca), historico)
+                        db.session.commit()
+
+                    if len(linhas) < self.tamanho_lote:
+                        break
+
+                metricas['faixas'][faixa] = contagem
+                metricas['enfileirados'] += contagem['enfileirados']
+                metricas['limitados_por_cliente'] += contagem['limitados_por_cliente']
+
+            metricas['duracao_ms'] = round((time.perf_counter() - inicio_execucao) * 1000, 2)
+            if not dry_run:
+                self.ultima_execucao = metricas
+            return metricas
+
+        except Exception as e:
+            db.session.rollback()
+            return {'success': False, 'error': str(e)}
+
+        finally:
+            self._lock.release()
+
+    def historico(self, cobranca_id=None, limite=50, offset=0):
+        """
+        Lista o histórico de lembretes, mais recentes primeiro
+
+        Returns:
+            tuple: (lista de LembreteCobranca, total)
+        """
+        consulta = LembreteCobranca.query
+        if cobranca_id:
+            consulta = consulta.filter(LembreteCobranca.cobranca_id == cobranca_id)
+
+        total = consulta.count()
+        itens = consulta.order_by(LembreteCobranca.id.desc()).offset(offset).limit(limite).all()
+        return itens, total
+
+@lru_cache(maxsize=None)
+def get_lembrete_service():
+    """Retorna a instância compartilhada do serviço, criada no primeiro uso"""
+    return LembreteService()
@@ -3,57 +3,122 @@ import sys
 # DON'T CHANGE THIS !!!
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
-from flask import Flask, send_from_directory
-from flask_cors import CORS
-from dotenv import load_dotenv
-
-# Carregar variáveis de ambiente
-load_dotenv()
-
-from src.models.user import db
-from src.models.cobranca import Cobranca
-from src.routes.user import user_bp
-from src.routes.cobranca import cobranca_bp
-from src.routes.backup import backup_bp
-
-app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
-
-# Configurar CORS para permitir requisições do frontend
-CORS(app)
-
-# Configurações
-app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'asdf#FGSgvasgf$5$WGT')
-
-# Registrar blueprints
-app.register_blueprint(user_bp, url_prefix='/api')
-app.register_blueprint(cobranca_bp, url_prefix='/api')
-app.register_blueprint(backup_bp, url_prefix='/api')
-
-# Configuração do banco de dados
-app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-db.init_app(app)
-
-# Criar tabelas
-with app.app_context():
-    db.create_all()
-
-@app.route('/', defaults={'path': ''})
-@app.route('/<path:path>')
-def serve(path):
-    static_folder_path = app.static_folder
-    if static_folder_path is None:
-            return "Static folder not configured", 404
-
-    if path != "" and os.path.exists(os.path.join(static_folder_path, path)):
-        return send_from_directory(static_folder_path, path)
-    else:
-        index_path = os.path.join(static_folder_path, 'index.html')
-        if os.path.exists(index_path):
-            return send_from_directory(static_folder_path, 'index.html')
-        else:
-            return "index.html not found", 404
+from flask import Flask
+from src.config import load_config, build_config, configure_sqlite
+from src.static_assets import StaticAssets
+
+def create_app(config=None):
+    """
+    Cria e configura a aplicação Flask
+
+    Os imports pesados (ORM, blueprints) ficam aqui dentro para que importar
+    este módulo seja barato; os serviços (Mercado Pago, email, backup) são
+    criados sob demanda no primeiro uso.
+
+    Args:
+        config (dict): Configurações que sobrescrevem as do ambiente (opcional)
+
+    Returns:
+        Flask: Aplicação configurada
+    """
+    load_config()
+
+    from flask_cors import CORS
+    from src.models.user import db
+    from src.models.cobranca import Cobranca
+    from src.routes.user import user_bp
+    from src.routes.cobranca import cobranca_bp
+    from src.routes.backup import backup_bp
+    from src.routes.admin import admin_bp
+    from src.routes.busca import busca_bp
+    from src.routes.export import export_bp
+    from src.routes.eventos import eventos_bp
+    from src.routes.arquivo import arquivo_bp
+    from src.routes.clientes import clientes_bp
+    from src.services.profiler_service import ProfilerService
+    from src.services.eventos_service import get_event_broker, registrar_listeners
+    from src.services.cliente_service import registrar_listeners as registrar_listeners_clientes
+    from src.services.conditional_get_service import ConditionalGetService
+    from src.services.idempotencia_service import get_idempotencia_service
+    from src.migrations import aplicar_migracoes, bloqueio_esquema
+
+    app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
+
+    # Configurar CORS para permitir requisições do frontend
+    CORS(app)
+
+    # Configurações
+    app.config.update(build_config())
+    if config:
+        app.config.update(config)
+
+    # Registrar blueprints
+    app.register_blueprint(user_bp, url_prefix='/api')
+    app.register_blueprint(cobranca_bp, url_prefix='/api')
+    app.register_blueprint(backup_bp, url_prefix='/api')
+    app.register_blueprint(admin_bp, url_prefix='/api')
+    app.register_blueprint(busca_bp, url_prefix='/api')
+    app.register_blueprint(export_bp, url_prefix='/api')
+    app.register_blueprint(eventos_bp, url_prefix='/api')
+    app.register_blueprint(arquivo_bp, url_prefix='/api')
+    app.register_blueprint(clientes_bp, url_prefix='/api')
+
+    # Publica criações e mudanças de status de cobranças no stream /api/eventos
+    registrar_listeners()
+    get_event_broker().init_app(app)
+
+    # Cobranças novas ligadas ao cliente (deduplicado por documento ou email)
+    registrar_listeners_clientes()
+
+    # ETag / Last-Modified na listagem e no detalhe de cobranças
+    ConditionalGetService().init_app(app)
+
+    # Idempotency-Key no POST /api/cobrancas: repetições devolvem a resposta guardada
+    get_idempotencia_service().init_app(app)
+
+    # Profiler de requisições lentas (opcional, via PROFILER_ENABLED)
+    ProfilerService().init_app(app)
+
+    # Configuração do banco de dados
+    db.init_app(app)
+
+    with app.app_context():
+        configure_sqlite(db.engine)
+
+        # Criar tabelas
+        if app.config['AUTO_CREATE_TABLES']:
+            # Um processo por vez: vários processos subindo juntos no mesmo banco
+            with bloqueio_esquema(db):
+                db.create_all()
+                aplicar_migracoes(db)
+
+                # Índice de busca textual (FTS5), mantido por triggers
+                from src.services.busca_service import get_busca_service
+                with db.engine.begin() as connection:
+                    get_busca_service().garantir_indice(connection)
+
+    # Arquivos estáticos com fingerprint, gzip e ETag, carregados uma vez em memória
+    if app.static_folder is not None:
+        app.extensions['static_assets'] = StaticAssets(app.static_folder)
+
+    @app.route('/', defaults={'path': ''})
+    @app.route('/<path:path>')
+    def serve(path):
+        static_assets = app.extensions.get('static_assets')
+        if static_assets is None:
+                return "Static folder not configured", 404
+
+        asset = static_assets.get(path, recarregar=app.debug) if path != "" else None
+        if asset is None:
+            asset = static_assets.get('index.html')
+            if asset is None:
+                return "index.html not found", 404
+
+        return static_assets.response(asset)
+
+    return app
 
 
 if __name__ == '__main__':
+    app = create_app()
     app.run(host='0.0.0.0', port=5000, debug=True)
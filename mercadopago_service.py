@@ -1,16 +1,106 @@
-import mercadopago
 import os
 from datetime import datetime, timedelta
-from dotenv import load_dotenv
+from functools import lru_cache
+from src.config import load_config, dias_expiracao_pagamento
+from src.rate_limit import LimitadorPrioritario
 
-load_dotenv()
+def _limites_por_endpoint():
+    """Lê MP_LIMITES no formato "preference.create=5,payment.get=20" (requisições/s)"""
+    limites = {}
+    for item in os.getenv('MP_LIMITES', '').split(','):
+        if '=' in item:
+            endpoint, taxa = item.split('=', 1)
+            limites[endpoint.strip()] = float(taxa)
+    return limites
 
 class MercadoPagoService:
     def __init__(self):
+        load_config()
         self.access_token = os.getenv('MERCADOPAGO_ACCESS_TOKEN', 'TEST-token-placeholder')
-        self.sdk = mercadopago.SDK(self.access_token)
+        self._sdk = None
+        
+        # Limitador compartilhado pelas chamadas deste processo: webhooks
+        # passam na frente das requisições interativas, que passam na frente
+        # dos lotes e da reconciliação.
+        #
+        # O estado do limitador (fichas e a redução depois de um 429) é de
+        # cada processo. MP_LIMITE_PADRAO e MP_LIMITES são o total da conta,
+        # dividido aqui pelos MP_PROCESSOS que chamam a API (o runner define
+        # o valor com os processos web mais o worker), para que a soma dos
+        # processos não passe do limite configurado.
+        processos = max(1, int(os.getenv('MP_PROCESSOS', 1)))
+        self.limitador = LimitadorPrioritario(
+            float(os.getenv('MP_LIMITE_PADRAO', 10)) / processos,
+            {endpoint: taxa / processos for endpoint, taxa in _limites_por_endpoint().items()}
+        )
+        self.espera_maxima = {
+            'webhook': float(os.getenv('MP_ESPERA_WEBHOOK', 30)),
+            'interativa': float(os.getenv('MP_ESPERA_INTERATIVA', 15)),
+            'lote': float(os.getenv('MP_ESPERA_LOTE', 300))
+        }
+        self.tentativas_429 = int(os.getenv('MP_TENTATIVAS_429', 3))
+    
+    @property
+    def sdk(self):
+        """SDK do Mercado Pago, importado e instanciado no primeiro uso"""
+        if self._sdk is None:
+            import mercadopago
+            from mercadopago.config import RequestOptions
+            
+            # O SDK repete sozinho as respostas 429 e, esgotadas as tentativas,
+            # levanta RetryError: o 429 nunca chegaria ao limitador. Ele só
+            # repete os erros 5xx; os 429 ficam com _chamar.
+            self._sdk = mercadopago.SDK(
+                self.access_token,
+                request_options=RequestOptions(retry_on=[500, 502, 503, 504])
+            )
+        return self._sdk
     
-    def criar_pagamento(self, dados_cobranca):
+    def _chamar(self, endpoint, prioridade, chamada):
+        """
+        Executa uma chamada ao SDK passando pelo limitador de taxa
+        
+        Repete a chamada quando a resposta é 429, depois que o limitador
+        reduzir a taxa e respeitar o Retry-After.
+        
+        Args:
+            endpoint (str): Nome do endpoint no limitador (ex.: payment.get)
+            prioridade (str): webhook, interativa ou lote
+            chamada (callable): Função sem argumentos que chama o SDK
+        
+        Returns:
+            dict: Resposta do SDK ({"status", "response"})
+        """
+        for _ in range(self.tentativas_429 + 1):
+            if not self.limitador.adquirir(endpoint, prioridade, timeout=self.espera_maxima[prioridade]):
+                return {
+                    "status": 429,
+                    "response": {"message": "Limite de requisições ao Mercado Pago: tempo de espera esgotado"}
+                }
+            
+            resposta = chamada()
+            status = resposta.get("status")
+            
+            retry_after = None
+            if status == 429:
+                cabecalhos = resposta.get("headers") or {}
+                try:
+                    retry_after = float(cabecalhos.get("Retry-After") or cabecalhos.get("retry-after"))
+                except (TypeError, ValueError):
+                    retry_after = None
+            
+            self.limitador.registrar_resposta(endpoint, status, retry_after)
+            
+            if status != 429:
+                return resposta
+        
+        return resposta
+    
+    def metricas_limitador(self):
+        """Filas por prioridade, taxas atuais e esperas médias de cada endpoint"""
+        return self.limitador.metricas()
+    
+    def criar_pagamento(self, dados_cobranca, prioridade='interativa', cliente=None):
         """
         Cria um pagamento no Mercado Pago
         
@@ -23,21 +113,28 @@ class MercadoPagoService:
                 - cliente_email: Email do cliente
                 - cliente_documento: CPF/CNPJ do cliente
                 - external_reference: Referência externa única
+            prioridade (str): interativa (padrão) ou lote, para criação em massa
+            cliente (Cliente): Cliente já cadastrado; usa a identificação
+                pré-calculada em vez de derivá-la dos dados da cobrança
         
         Returns:
             dict: Resposta da API do Mercado Pago
         """
+        from src.models.cobranca import Cliente
+        
+        if cliente is None:
+            cliente = Cliente(**Cliente.identificar(
+                dados_cobranca['cliente_nome'], dados_cobranca['cliente_email'],
+                documento=dados_cobranca.get('cliente_documento')
+            ))
+        pagador = cliente.dados_pagador()
         
         # Preparar dados do pagamento
         payment_data = {
             "transaction_amount": float(dados_cobranca['valor']),
             "description": dados_cobranca['descricao'] or dados_cobranca['titulo'],
             "external_reference": dados_cobranca['external_reference'],
-            "payer": {
-                "email": dados_cobranca['cliente_email'],
-                "first_name": dados_cobranca['cliente_nome'].split()[0] if dados_cobranca['cliente_nome'] else "",
-                "last_name": " ".join(dados_cobranca['cliente_nome'].split()[1:]) if len(dados_cobranca['cliente_nome'].split()) > 1 else "",
-            },
+            "payer": pagador,
             "notification_url": os.getenv('WEBHOOK_URL'),
             "auto_return": "approved",
             "back_urls": {
@@ -47,13 +144,6 @@ class MercadoPagoService:
             }
         }
         
-        # Adicionar identificação se fornecida
-        if dados_cobranca.get('cliente_documento'):
-            payment_data["payer"]["identification"] = {
-                "type": "CPF" if len(dados_cobranca['cliente_documento'].replace('.', '').replace('-', '')) == 11 else "CNPJ",
-                "number": dados_cobranca['cliente_documento'].replace('.', '').replace('-', '').replace('/', '')
-            }
-        
         # Adicionar informações adicionais do item
         payment_data["additional_info"] = {
             "items": [
@@ -67,8 +157,8 @@ class MercadoPagoService:
                 }
             ],
             "payer": {
-                "first_name": dados_cobranca['cliente_nome'].split()[0] if dados_cobranca['cliente_nome'] else "",
-                "last_name": " ".join(dados_cobranca['cliente_nome'].split()[1:]) if len(dados_cobranca['cliente_nome'].split()) > 1 else "",
+                "first_name": pagador["first_name"],
+                "last_name": pagador["last_name"],
             }
         }
         
@@ -92,10 +182,13 @@ class MercadoPagoService:
                 "external_reference": dados_cobranca['external_reference'],
                 "expires": True,
                 "expiration_date_from": datetime.now().isoformat(),
-                "expiration_date_to": (datetime.now() + timedelta(days=30)).isoformat()
+                "expiration_date_to": (datetime.now() + timedelta(days=dias_expiracao_pagamento())).isoformat()
             }
             
-            preference_response = self.sdk.preference().create(preference_data)
+            preference_response = self._chamar(
+                'preference.create', prioridade,
+                lambda: self.sdk.preference().create(preference_data)
+            )
             
             if preference_response["status"] == 201:
                 return {
@@ -119,18 +212,23 @@ class MercadoPagoService:
                 "response": None
             }
     
-    def obter_pagamento(self, payment_id):
+    def obter_pagamento(self, payment_id, prioridade='webhook'):
         """
         Obtém informações de um pagamento específico
         
         Args:
             payment_id (str): ID do pagamento no Mercado Pago
+            prioridade (str): webhook (padrão, usado pelas notificações),
+                interativa ou lote (reconciliação)
         
         Returns:
             dict: Dados do pagamento
         """
         try:
-            payment_response = self.sdk.payment().get(payment_id)
+            payment_response = self._chamar(
+                'payment.get', prioridade,
+                lambda: self.sdk.payment().get(payment_id)
+            )
             
             if payment_response["status"] == 200:
                 return {
@@ -200,3 +298,8 @@ class MercadoPagoService:
         except Exception as e:
             print(f"Erro ao validar assinatura do webhook: {e}")
             return False
+
+@lru_cache(maxsize=None)
+def get_mercadopago_service():
+    """Retorna a instância compartilhada do serviço, criada no primeiro uso"""
+    return MercadoPagoService()
@@ -0,0 +1,226 @@
+import json
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from sqlalchemy import inspect, text
+
+@contextmanager
+def bloqueio_esquema(db):
+    """
+    Serializa a preparação do esquema entre processos que usam o mesmo banco
+
+    Com SQLite em arquivo, um flock em <banco>.schema.lock garante que só um
+    processo por vez rode create_all e as migrações; os demais esperam e
+    depois encontram tudo aplicado.
+    """
+    caminho = db.engine.url.database if db.engine.dialect.name == 'sqlite' else None
+    if not caminho or caminho == ':memory:':
+        yield
+        return
+
+    import fcntl
+
+    with open(f'{caminho}.schema.lock', 'a') as arquivo:
+        fcntl.flock(arquivo, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(arquivo, fcntl.LOCK_UN)
+
+def _criar_tabela_controle(db):
+    with db.engine.begin() as connection:
+        connection.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_migrations ("
+            "nome VARCHAR(100) PRIMARY KEY, aplicada_em DATETIME NOT NULL)"
+        ))
+
+def _aplicadas(db):
+    with db.engine.connect() as connection:
+        return set(connection.execute(text('SELECT nome FROM schema_migrations')).scalars())
+
+def _registrar(db, nome):
+    with db.engine.begin() as connection:
+        connection.execute(
+            text('INSERT INTO schema_migrations (nome, aplicada_em) VALUES (:nome, :agora)'),
+            {'nome': nome, 'agora': datetime.utcnow()}
+        )
+
+def _adicionar_colunas(db):
+    """Adiciona às tabelas existentes as colunas (anuláveis) novas do modelo"""
+    inspector = inspect(db.engine)
+    tabelas = set(inspector.get_table_names())
+
+    with db.engine.begin() as connection:
+        for table in db.metadata.sorted_tables:
+            if table.name not in tabelas:
+                continue
+            existentes = {coluna['name'] for coluna in inspector.get_columns(table.name)}
+            for coluna in table.columns:
+                if coluna.name in existentes or not coluna.nullable:
+                    continue
+                tipo = coluna.type.compile(dialect=db.engine.dialect)
+                connection.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {coluna.name} {tipo}'))
+
+def preencher_data_vencimento(db, tamanho_lote=1000):
+    """
+    Preenche data_vencimento das cobranças antigas (data_criacao + prazo do link)
+
+    data_atualizacao é preservada.
+    """
+    from src.config import dias_expiracao_pagamento
+    from src.models.cobranca import Cobranca
+
+    prazo = timedelta(days=dias_expiracao_pagamento())
+    tabela = Cobranca.__table__
+
+    while True:
+        linhas = db.session.execute(
+            db.select(Cobranca.id, Cobranca.data_criacao)
+            .where(Cobranca.data_vencimento.is_(None))
+            .limit(tamanho_lote)
+        ).all()
+        if not linhas:
+            break
+
+        # data_atualizacao explícita: o onupdate do modelo não pode marcar as cobranças como alteradas
+        db.session.execute(
+            db.update(tabela)
+            .where(tabela.c.id == db.bindparam('b_id'))
+            .values(data_vencimento=db.bindparam('b_vencimento'), data_atualizacao=tabela.c.data_atualizacao),
+            [{'b_id': linha.id, 'b_vencimento': linha.data_criacao + prazo} for linha in linhas]
+        )
+        db.session.commit()
+
+def mover_payloads_mercadopago(db, tamanho_lote=500):
+    """
+    Tira o JSON do Mercado Pago da linha da cobrança (coluna dados_mercadopago)
+
+    Preenche as colunas mp_* e grava o payload comprimido em
+    cobrancas_payloads; a coluna antiga fica NULL (o espaço volta ao banco
+    no próximo VACUUM). data_atualizacao é preservada. Payloads que não
+    são JSON válido ficam onde estão e são avisados na saída.
+    """
+    from src.models.cobranca import Cobranca, CobrancaPayload, extrair_campos_pagamento
+
+    colunas = {coluna['name'] for coluna in inspect(db.engine).get_columns('cobrancas')}
+    if 'dados_mercadopago' not in colunas:
+        return
+
+    ultimo_id = 0
+    while True:
+        linhas = db.session.execute(text(
+            'SELECT id, dados_mercadopago FROM cobrancas '
+            'WHERE dados_mercadopago IS NOT NULL AND id > :ultimo_id ORDER BY id LIMIT :limite'
+        ), {'ultimo_id': ultimo_id, 'limite': tamanho_lote}).all()
+        if not linhas:
+            break
+        ultimo_id = linhas[-1].id
+
+        payloads = []
+        movidas = []
+        for cobranca_id, bruto in linhas:
+            try:
+                dados = json.loads(bruto)
+            except ValueError:
+                # Texto ilegível fica na coluna antiga, intacto, para análise manual
+                print(f"Cobrança {cobranca_id}: dados_mercadopago não é JSON válido; mantido na coluna antiga")
+                continue
+
+            movidas.append(cobranca_id)
+            if dados:
+                campos = extrair_campos_pagamento(dados)
+                if campos:
+                    db.session.execute(
+                        db.update(Cobranca)
+                        .where(Cobranca.id == cobranca_id)
+                        .values(data_atualizacao=Cobranca.data_atualizacao, **campos)
+                    )
+                payloads.append({
+                    'cobranca_id': cobranca_id,
+                    'dados': CobrancaPayload.comprimir(dados),
+                    'data_atualizacao': datetime.utcnow()
+                })
+
+        if payloads:
+            db.session.execute(CobrancaPayload.__table__.insert().prefix_with('OR REPLACE'), payloads)
+        if movidas:
+            db.session.execute(
+                text('UPDATE cobrancas SET dados_mercadopago = NULL WHERE id IN (%s)' % ','.join(str(int(i)) for i in movidas))
+            )
+        db.session.commit()
+
+# Mantêm cobrancas.versao, usada pelo backup incremental para achar as linhas
+# alteradas, também nas escritas em lote que preservam data_atualizacao
+TRIGGERS_VERSAO = [
+    # Só quando a própria escrita não mexeu na versão; a atualização do trigger não o dispara de novo
+    """
+    CREATE TRIGGER IF NOT EXISTS cobrancas_versao_au AFTER UPDATE ON cobrancas
+    WHEN new.versao IS old.versao BEGIN
+        UPDATE cobrancas SET versao = coalesce(old.versao, 0) + 1 WHERE id = new.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS cobrancas_payloads_versao_ai AFTER INSERT ON cobrancas_payloads BEGIN
+        UPDATE cobrancas SET versao = coalesce(versao, 0) + 1 WHERE id = new.cobranca_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS cobrancas_payloads_versao_au AFTER UPDATE ON cobrancas_payloads BEGIN
+        UPDATE cobrancas SET versao = coalesce(versao, 0) + 1 WHERE id = new.cobranca_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS cobrancas_payloads_versao_ad AFTER DELETE ON cobrancas_payloads BEGIN
+        UPDATE cobrancas SET versao = coalesce(versao, 0) + 1 WHERE id = old.cobranca_id;
+    END
+    """
+]
+
+def _criar_triggers_versao(db):
+    with db.engine.begin() as connection:
+        for ddl in TRIGGERS_VERSAO:
+            connection.execute(text(ddl))
+
+def vincular_clientes(db):
+    """Cria os clientes a partir das cobranças existentes e preenche cliente_id"""
+    from src.services.cliente_service import get_cliente_service
+    get_cliente_service().vincular_cobrancas()
+
+# Migrações de dados executadas uma única vez, na ordem
+MIGRACOES = [
+    ('0001_preencher_data_vencimento', preencher_data_vencimento),
+    ('0002_mover_payloads_mercadopago', mover_payloads_mercadopago),
+    ('0003_vincular_clientes', vincular_clientes),
+]
+
+def aplicar_migracoes(db):
+    """
+    Aplica ao banco existente as mudanças de esquema que o create_all não faz
+
+    O create_all só cria tabelas que ainda não existem; colunas, índices e
+    triggers novos em tabelas já existentes são criados aqui, seguidos das migrações
+    de dados pendentes (registradas na tabela schema_migrations).
+
+    Args:
+        db: Instância do Flask-SQLAlchemy (dentro do contexto da aplicação)
+    """
+    _adicionar_colunas(db)
+
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(db.engine, checkfirst=True)
+
+    # Antes das migrações de dados, para que as escritas delas também contem
+    _criar_triggers_versao(db)
+
+    _criar_tabela_controle(db)
+    aplicadas = _aplicadas(db)
+
+    # Migrações de dados não viram eventos no stream de cobranças
+    from src.services.eventos_service import sem_eventos
+
+    for nome, migracao in MIGRACOES:
+        if nome in aplicadas:
+            continue
+        with sem_eventos(db.session):
+            migracao(db)
+        _registrar(db, nome)
@@ -0,0 +1,254 @@
+"""
+Função serverless da API (Netlify), montada para cold start rápido
+
+Importar este módulo custa só json, os, re e src.etag (que usa hashlib).
+As leituras simples
+(listagem e detalhe de cobranças) são respondidas direto do SQLite, em
+modo somente leitura, sem Flask nem ORM. Qualquer outra rota, e qualquer
+falha no caminho leve (banco ainda sem as tabelas ou sem as colunas
+novas, por exemplo), vai para a aplicação Flask completa, importada e
+criada na primeira vez que for necessária e mantida enquanto o container
+estiver quente.
+
+No caminho leve a configuração vem só das variáveis de ambiente
+(DATABASE_URL); o .env é lido pela aplicação completa.
+
+Como a listagem e o detalhe da aplicação, o caminho leve lê só o banco
+principal: cobranças já arquivadas (ArquivoService) não aparecem. Um id
+arquivado cai no 404 da aplicação completa; a consulta ao arquivo é
+/api/arquivo/cobrancas/<id>.
+"""
+import json
+import os
+import re
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+# Mesmos ETags do ConditionalGetService: um validador vale nos dois caminhos
+from src.etag import etag_detalhe, etag_listagem
+
+PREFIXO_FUNCAO = '/.netlify/functions/api'
+
+ROTA_LISTAGEM = re.compile(r'^/api/cobrancas/?$')
+ROTA_DETALHE = re.compile(r'^/api/cobrancas/(\d+)/?$')
+
+# Colunas de Cobranca.to_dict() (o detalhe acrescenta o payload do Mercado Pago)
+COLUNAS = (
+    'id', 'mercadopago_id', 'external_reference', 'cliente_id', 'cliente_nome', 'cliente_email',
+    'cliente_telefone', 'cliente_documento', 'titulo', 'descricao', 'valor', 'status',
+    'data_criacao', 'data_atualizacao', 'data_vencimento', 'data_pagamento', 'payment_url',
+    'mp_payment_id', 'mp_metodo_pagamento', 'mp_data_aprovacao', 'mp_taxas'
+)
+COLUNAS_DATA = {'data_criacao', 'data_atualizacao', 'data_vencimento', 'data_pagamento', 'mp_data_aprovacao'}
+SELECT_COBRANCAS = f"SELECT {', '.join(COLUNAS)} FROM cobrancas"
+
+_conexao = None
+_app = None
+
+def _caminho_banco():
+    url = os.getenv('DATABASE_URL')
+    if not url:
+        return os.path.join(ROOT_DIR, 'src', 'database', 'app.db')
+    if not url.startswith('sqlite:///'):
+        return None
+    return url[len('sqlite:///'):]
+
+def _conectar():
+    """Conexão somente leitura, aberta no primeiro uso e reaproveitada nas invocações quentes"""
+    global _conexao
+    if _conexao is None:
+        import sqlite3
+
+        caminho = _caminho_banco()
+        if not caminho or not os.path.exists(caminho):
+            return None
+        conexao = sqlite3.connect(f'file:{caminho}?mode=ro', uri=True, check_same_thread=False)
+        conexao.execute('PRAGMA query_only=ON')
+        conexao.execute(f"PRAGMA busy_timeout={int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', 30000))}")
+        _conexao = conexao
+    return _conexao
+
+def _data_iso(valor):
+    """Texto gravado pelo SQLAlchemy ('AAAA-MM-DD HH:MM:SS.ffffff') no formato de datetime.isoformat()"""
+    if not valor:
+        return None
+    valor = valor.replace(' ', 'T', 1)
+    return valor[:-7] if valor.endswith('.000000') else valor
+
+def _linha_para_dict(linha):
+    return {
+        coluna: _data_iso(valor) if coluna in COLUNAS_DATA else valor
+        for coluna, valor in zip(COLUNAS, linha)
+    }
+
+def _str_datetime(valor):
+    """str() do datetime que o SQLAlchemy devolveria para o texto gravado"""
+    return valor[:-7] if valor and valor.endswith('.000000') else valor
+
+def _resposta(status, dados=None, etag=None):
+    headers = {'Cache-Control': 'private, no-cache'}
+    if etag:
+        headers['ETag'] = f'"{etag}"'
+    if dados is None:
+        return {'statusCode': status, 'headers': headers, 'body': ''}
+    headers['Content-Type'] = 'application/json'
+    return {'statusCode': status, 'headers': headers, 'body': json.dumps(dados, ensure_ascii=False)}
+
+def _nao_modificado(headers, etag):
+    cabecalho = headers.get('if-none-match')
+    if not cabecalho:
+        return False
+    return cabecalho.strip() == '*' or etag in [item.strip().strip('"').removeprefix('W/"') for item in cabecalho.split(',')]
+
+def _listar(conexao, parametros, query_string, headers):
+    status = parametros.get('status') or None
+    try:
+        pagina = max(int(parametros.get('page', 1)), 1)
+        por_pagina = min(max(int(parametros.get('per_page', 10)), 1), 100)
+    except ValueError:
+        return None
+
+    filtro, argumentos = ('WHERE status = ?', (status,)) if status else ('', ())
+
+    ultima_atualizacao, total = conexao.execute(
+        f'SELECT max(data_atualizacao), count(id) FROM cobrancas {filtro}', argumentos
+    ).fetchone()
+    etag = etag_listagem(_str_datetime(ultima_atualizacao), total, query_string)
+    if _nao_modificado(headers, etag):
+        return _resposta(304, etag=etag)
+
+    linhas = conexao.execute(
+        f'{SELECT_COBRANCAS} {filtro} ORDER BY data_criacao DESC LIMIT ? OFFSET ?',
+        argumentos + (por_pagina, (pagina - 1) * por_pagina)
+    ).fetchall()
+
+    return _resposta(200, {
+        'success': True,
+        'cobrancas': [_linha_para_dict(linha) for linha in linhas],
+        'total': total,
+        'pages': (total + por_pagina - 1) // por_pagina,
+        'current_page': pagina
+    }, etag)
+
+def _detalhar(conexao, cobranca_id, headers):
+    linha = conexao.execute(
+        f"SELECT {', '.join(COLUNAS)}, versao FROM cobrancas WHERE id = ?", (cobranca_id,)
+    ).fetchone()
+    if linha is None:
+        # Mensagem e formato do 404 ficam com a aplicação completa
+        return None
+
+    versao = linha[len(COLUNAS)]
+    etag = etag_detalhe(cobranca_id, _str_datetime(linha[COLUNAS.index('data_atualizacao')]), versao)
+    if _nao_modificado(headers, etag):
+        return _resposta(304, etag=etag)
+
+    cobranca = _linha_para_dict(linha)
+    # Payload comprimido como em CobrancaPayload.comprimir (zlib sobre o JSON)
+    payload = conexao.execute('SELECT dados FROM cobrancas_payloads WHERE cobranca_id = ?', (cobranca_id,)).fetchone()
+    if payload is None:
+        cobranca['dados_mercadopago'] = None
+    else:
+        import zlib
+        cobranca['dados_mercadopago'] = json.loads(zlib.decompress(payload[0]).decode('utf-8'))
+
+    return _resposta(200, {'success': True, 'cobranca': cobranca}, etag)
+
+def _caminho_leve(metodo, caminho, parametros, query_string, headers):
+    """
+    Responde as leituras simples sem carregar a aplicação
+
+    Returns:
+        dict: Resposta no formato do Netlify, ou None para usar a aplicação completa
+    """
+    if metodo not in ('GET', 'HEAD') or 'if-modified-since' in headers:
+        return None
+
+    listagem = ROTA_LISTAGEM.match(caminho)
+    detalhe = None if listagem else ROTA_DETALHE.match(caminho)
+    if not listagem and not detalhe:
+        return None
+
+    conexao = _conectar()
+    if conexao is None:
+        return None
+
+    import sqlite3
+    try:
+        if listagem:
+            return _listar(conexao, parametros, query_string, headers)
+        return _detalhar(conexao, int(detalhe.group(1)), headers)
+    except sqlite3.Error:
+        return None
+
+def _aplicacao():
+    """Aplicação Flask completa, criada na primeira requisição que precisar dela"""
+    global _app
+    if _app is None:
+        from src.main import create_app
+        _app = create_app()
+    return _app
+
+def _caminho_completo(metodo, caminho, query_string, headers, corpo):
+    import base64
+    from werkzeug.test import EnvironBuilder
+    from werkzeug.wrappers import Response
+
+    environ = EnvironBuilder(
+        path=caminho,
+        method=metodo,
+        query_string=query_string,
+        headers=list(headers.items()),
+        data=corpo
+    ).get_environ()
+    resposta = Response.from_app(_aplicacao().wsgi_app, environ)
+
+    dados = resposta.get_data()
+    texto = resposta.mimetype.startswith('text/') or resposta.mimetype in ('application/json', 'application/javascript')
+    return {
+        'statusCode': resposta.status_code,
+        'headers': dict(resposta.headers),
+        'body': dados.decode('utf-8') if texto else base64.b64encode(dados).decode('ascii'),
+        'isBase64Encoded': not texto
+    }
+
+def handler(event, context):
+    """
+    Ponto de entrada da função (evento no formato do Netlify/AWS Lambda)
+
+    Aceita tanto o caminho original (/api/...) quanto o da função
+    (/.netlify/functions/api/...).
+    """
+    metodo = (event.get('httpMethod') or 'GET').upper()
+    caminho = event.get('path') or '/'
+    if caminho.startswith(PREFIXO_FUNCAO):
+        caminho = '/api' + caminho[len(PREFIXO_FUNCAO):]
+
+    headers = {chave.lower(): valor for chave, valor in (event.get('headers') or {}).items()}
+    parametros = event.get('queryStringParameters')
+    query_string = event.get('rawQuery')
+    if query_string is None:
+        from urllib.parse import urlencode
+        parametros = parametros or {}
+        query_string = urlencode(parametros)
+    elif parametros is None:
+        from urllib.parse import parse_qsl
+        parametros = dict(parse_qsl(query_string))
+
+    resposta = _caminho_leve(metodo, caminho, parametros, query_string, headers)
+    if resposta is not None:
+        if metodo == 'HEAD':
+            resposta['body'] = ''
+        return resposta
+
+    corpo = event.get('body') or ''
+    if event.get('isBase64Encoded') and corpo:
+        import base64
+        corpo = base64.b64decode(corpo)
+    elif isinstance(corpo, str):
+        corpo = corpo.encode('utf-8')
+
+    return _caminho_completo(metodo, caminho, query_string, headers, corpo)
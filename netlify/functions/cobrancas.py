@@ -1,16 +1,31 @@
 from flask_sqlalchemy import SQLAlchemy
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 import json
+import zlib
+from src.config import dias_expiracao_pagamento
 
 db = SQLAlchemy()
 
 class Cobranca(db.Model):
     __tablename__ = 'cobrancas'
+    __table_args__ = (
+        # max(data_atualizacao) por status, usado nos ETags da listagem
+        db.Index('ix_cobrancas_status_atualizacao', 'status', 'data_atualizacao'),
+        # Varredura de cobranças pendentes vencidas (range scan por vencimento)
+        db.Index('ix_cobrancas_status_vencimento', 'status', 'data_vencimento'),
+        # Histórico de um cliente, mais recentes primeiro
+        db.Index('ix_cobrancas_cliente_criacao', 'cliente_id', 'data_criacao'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     mercadopago_id = db.Column(db.String(100), unique=True, nullable=True)
     external_reference = db.Column(db.String(100), unique=True, nullable=False)
     
+    # Cliente (deduplicado por documento ou email); as colunas cliente_*
+    # guardam os dados como informados na criação da cobrança
+    cliente_id = db.Column(db.Integer, db.ForeignKey('clientes.id'), nullable=True)
+    cliente = db.relationship('Cliente', lazy='select')
+    
     # Dados do cliente
     cliente_nome = db.Column(db.String(200), nullable=False)
     cliente_email = db.Column(db.String(200), nullable=False)
@@ -24,27 +39,47 @@ class Cobranca(db.Model):
     
     # Status e datas
     status = db.Column(db.String(50), default='pending', nullable=False)
-    # Status possíveis: pending, approved, rejected, cancelled, in_process
+    # Status possíveis: pending, approved, rejected, cancelled, in_process, expired
     
     data_criacao = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
-    data_atualizacao = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    data_atualizacao = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False, index=True)
     data_vencimento = db.Column(db.DateTime, nullable=True)
     data_pagamento = db.Column(db.DateTime, nullable=True)
     
     # URLs e links
     payment_url = db.Column(db.Text, nullable=True)
     
-    # Dados adicionais em JSON
-    dados_mercadopago = db.Column(db.Text, nullable=True)  # JSON string
+    # Campos usados do pagamento no Mercado Pago
+    mp_payment_id = db.Column(db.String(50), nullable=True, index=True)
+    mp_metodo_pagamento = db.Column(db.String(50), nullable=True)
+    mp_data_aprovacao = db.Column(db.DateTime, nullable=True)
+    mp_taxas = db.Column(db.Float, nullable=True)
+
+    # Incrementada por trigger a cada UPDATE da linha ou do seu payload,
+    # inclusive os que preservam data_atualizacao (ver migrations.TRIGGERS_VERSAO)
+    versao = db.Column(db.Integer, default=0, nullable=True)
+
+    # Resposta completa do Mercado Pago, comprimida em tabela à parte e
+    # carregada só quando acessada
+    payload = db.relationship('CobrancaPayload', uselist=False, lazy='select', cascade='all, delete-orphan')
     
     def __init__(self, **kwargs):
+        # Mesmo prazo do expiration_date_to da preferência criada no Mercado Pago
+        kwargs.setdefault('data_vencimento', datetime.utcnow() + timedelta(days=dias_expiracao_pagamento()))
         super(Cobranca, self).__init__(**kwargs)
     
-    def to_dict(self):
-        return {
+    def to_dict(self, incluir_payload=False):
+        """
+        Cobrança no formato da API
+        
+        dados_mercadopago (o payload completo) só entra com incluir_payload:
+        o detalhe e os backups o incluem; a listagem, a busca e os eventos não.
+        """
+        dados = {
             'id': self.id,
             'mercadopago_id': self.mercadopago_id,
             'external_reference': self.external_reference,
+            'cliente_id': self.cliente_id,
             'cliente_nome': self.cliente_nome,
             'cliente_email': self.cliente_email,
             'cliente_telefone': self.cliente_telefone,
@@ -58,13 +93,260 @@ class Cobranca(db.Model):
             'data_vencimento': self.data_vencimento.isoformat() if self.data_vencimento else None,
             'data_pagamento': self.data_pagamento.isoformat() if self.data_pagamento else None,
             'payment_url': self.payment_url,
-            'dados_mercadopago': json.loads(self.dados_mercadopago) if self.dados_mercadopago else None
+            'mp_payment_id': self.mp_payment_id,
+            'mp_metodo_pagamento': self.mp_metodo_pagamento,
+            'mp_data_aprovacao': self.mp_data_aprovacao.isoformat() if self.mp_data_aprovacao else None,
+            'mp_taxas': self.mp_taxas
         }
+        if incluir_payload:
+            dados['dados_mercadopago'] = self.get_dados_mercadopago()
+        return dados
     
     def set_dados_mercadopago(self, dados):
-        """Converte um dicionário para JSON string"""
-        self.dados_mercadopago = json.dumps(dados) if dados else None
+        """
+        Guarda a resposta do Mercado Pago (preferência ou pagamento)
+        
+        Os campos usados do pagamento vão para colunas próprias; a resposta
+        completa é comprimida na tabela cobrancas_payloads.
+        """
+        if not dados:
+            self.payload = None
+            return
+        
+        for campo, valor in extrair_campos_pagamento(dados).items():
+            setattr(self, campo, valor)
+        
+        conteudo = CobrancaPayload.comprimir(dados)
+        if self.payload is None:
+            self.payload = CobrancaPayload(dados=conteudo)
+        else:
+            self.payload.dados = conteudo
+            self.payload.data_atualizacao = datetime.utcnow()
     
     def get_dados_mercadopago(self):
-        """Retorna os dados do Mercado Pago como dicionário"""
-        return json.loads(self.dados_mercadopago) if self.dados_mercadopago else None
+        """Retorna os dados do Mercado Pago como dicionário (carrega o payload sob demanda)"""
+        return self.payload.descomprimir() if self.payload is not None else None
+
+def converter_data_mercadopago(valor):
+    """Converte uma data do Mercado Pago (ISO 8601 com fuso) para UTC sem fuso"""
+    if not valor:
+        return None
+    try:
+        data = datetime.fromisoformat(valor)
+    except ValueError:
+        return None
+    if data.tzinfo is not None:
+        data = data.astimezone(timezone.utc).replace(tzinfo=None)
+    return data
+
+def extrair_campos_pagamento(dados):
+    """
+    Campos do pagamento do Mercado Pago que ficam em colunas da cobrança
+    
+    Returns:
+        dict: Colunas mp_* presentes na resposta (vazio para preferências)
+    """
+    if not dados or not ('payment_method_id' in dados or 'date_approved' in dados):
+        return {}
+    
+    campos = {}
+    if dados.get('id') is not None:
+        campos['mp_payment_id'] = str(dados['id'])
+    if dados.get('payment_method_id'):
+        campos['mp_metodo_pagamento'] = dados['payment_method_id']
+    if dados.get('date_approved'):
+        campos['mp_data_aprovacao'] = converter_data_mercadopago(dados['date_approved'])
+    if dados.get('fee_details') is not None:
+        campos['mp_taxas'] = round(sum(taxa.get('amount') or 0 for taxa in dados['fee_details']), 2)
+    return campos
+
+class CobrancaPayload(db.Model):
+    __tablename__ = 'cobrancas_payloads'
+    
+    cobranca_id = db.Column(db.Integer, db.ForeignKey('cobrancas.id'), primary_key=True)
+    dados = db.Column(db.LargeBinary, nullable=False)  # JSON compacto comprimido com zlib
+    data_atualizacao = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    
+    @staticmethod
+    def comprimir(dados):
+        return zlib.compress(json.dumps(dados, ensure_ascii=False, separators=(',', ':')).encode('utf-8'), 6)
+    
+    def descomprimir(self):
+        return json.loads(zlib.decompress(self.dados).decode('utf-8'))
+
+def normalizar_documento(documento):
+    """CPF/CNPJ só com dígitos (None se vazio)"""
+    digitos = ''.join(c for c in (documento or '') if c.isdigit())
+    return digitos or None
+
+def normalizar_email(email):
+    return (email or '').strip().lower()
+
+class Cliente(db.Model):
+    __tablename__ = 'clientes'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    # doc:<dígitos do CPF/CNPJ> ou, sem documento, email:<email normalizado>
+    chave = db.Column(db.String(220), unique=True, nullable=False)
+    
+    nome = db.Column(db.String(200), nullable=False)
+    email = db.Column(db.String(200), nullable=False)
+    telefone = db.Column(db.String(50), nullable=True)
+    
+    # Identificação pré-calculada (usada no payer do Mercado Pago)
+    email_normalizado = db.Column(db.String(200), nullable=False, index=True)
+    documento = db.Column(db.String(20), nullable=True, index=True)
+    tipo_documento = db.Column(db.String(4), nullable=True)  # CPF ou CNPJ
+    primeiro_nome = db.Column(db.String(100), nullable=False, default='')
+    sobrenome = db.Column(db.String(200), nullable=False, default='')
+    
+    data_criacao = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    data_atualizacao = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    
+    @staticmethod
+    def gerar_chave(documento, email):
+        documento = normalizar_documento(documento)
+        return f'doc:{documento}' if documento else f'email:{normalizar_email(email)}'
+    
+    @staticmethod
+    def identificar(nome, email, telefone=None, documento=None):
+        """
+        Colunas do cliente a partir dos dados informados em uma cobrança
+        
+        Returns:
+            dict: Dados e identificação normalizada, inclusive a chave
+        """
+        partes = (nome or '').split()
+        documento = normalizar_documento(documento)
+        return {
+            'chave': Cliente.gerar_chave(documento, email),
+            'nome': nome,
+            'email': email.strip() if email else email,
+            'telefone': telefone,
+            'email_normalizado': normalizar_email(email),
+            'documento': documento,
+            'tipo_documento': ('CPF' if len(documento) == 11 else 'CNPJ') if documento else None,
+            'primeiro_nome': partes[0] if partes else '',
+            'sobrenome': ' '.join(partes[1:])
+        }
+    
+    def dados_pagador(self):
+        """Payer no formato da API do Mercado Pago"""
+        pagador = {
+            'email': self.email,
+            'first_name': self.primeiro_nome,
+            'last_name': self.sobrenome
+        }
+        if self.documento:
+            pagador['identification'] = {'type': self.tipo_documento, 'number': self.documento}
+        return pagador
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'nome': self.nome,
+            'email': self.email,
+            'telefone': self.telefone,
+            'documento': self.documento,
+            'tipo_documento': self.tipo_documento,
+            'data_criacao': self.data_criacao.isoformat() if self.data_criacao else None,
+            'data_atualizacao': self.data_atualizacao.isoformat() if self.data_atualizacao else None
+        }
+
+class EmailOutbox(db.Model):
+    __tablename__ = 'email_outbox'
+    __table_args__ = (
+        # Próximos envios prontos: range scan por status e horário da tentativa
+        db.Index('ix_email_outbox_status_proxima', 'status', 'proxima_tentativa'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    cobranca_id = db.Column(db.Integer, db.ForeignKey('cobrancas.id'), nullable=True, index=True)
+    tipo = db.Column(db.String(50), nullable=False)  # cobranca, confirmacao_pagamento, ...
+    
+    destinatario = db.Column(db.String(200), nullable=False)
+    assunto = db.Column(db.String(300), nullable=False)
+    corpo_html = db.Column(db.Text, nullable=False)
+    corpo_texto = db.Column(db.Text, nullable=True)
+    
+    status = db.Column(db.String(20), default='pending', nullable=False)
+    # Status possíveis: pending, sending, sent, dead
+    
+    tentativas = db.Column(db.Integer, default=0, nullable=False)
+    proxima_tentativa = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    ultimo_erro = db.Column(db.Text, nullable=True)
+    
+    data_criacao = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    data_envio = db.Column(db.DateTime, nullable=True)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'cobranca_id': self.cobranca_id,
+            'tipo': self.tipo,
+            'destinatario': self.destinatario,
+            'assunto': self.assunto,
+            'status': self.status,
+            'tentativas': self.tentativas,
+            'proxima_tentativa': self.proxima_tentativa.isoformat() if self.proxima_tentativa else None,
+            'ultimo_erro': self.ultimo_erro,
+            'data_criacao': self.data_criacao.isoformat() if self.data_criacao else None,
+            'data_envio': self.data_envio.isoformat() if self.data_envio else None
+        }
+
+class LembreteCobranca(db.Model):
+    __tablename__ = 'lembretes_cobranca'
+    __table_args__ = (
+        # Um lembrete por faixa de vencimento para cada cobrança
+        db.UniqueConstraint('cobranca_id', 'faixa', name='uq_lembretes_cobranca_faixa'),
+        # Throttling por cliente: último lembrete enviado a um email
+        db.Index('ix_lembretes_destinatario_envio', 'destinatario', 'data_envio'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    cobranca_id = db.Column(db.Integer, db.ForeignKey('cobrancas.id'), nullable=False)
+    faixa = db.Column(db.String(20), nullable=False)  # ex.: d-3 (três dias antes do vencimento)
+    destinatario = db.Column(db.String(200), nullable=False)
+    outbox_id = db.Column(db.Integer, db.ForeignKey('email_outbox.id'), nullable=True)
+    data_envio = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'cobranca_id': self.cobranca_id,
+            'faixa': self.faixa,
+            'destinatario': self.destinatario,
+            'outbox_id': self.outbox_id,
+            'data_envio': self.data_envio.isoformat() if self.data_envio else None
+        }
+
+class RequisicaoIdempotente(db.Model):
+    __tablename__ = 'requisicoes_idempotentes'
+    
+    # Idempotency-Key enviada pelo cliente
+    chave = db.Column(db.String(255), primary_key=True)
+    # sha256 do método, rota e corpo: a mesma chave com outro corpo é recusada
+    hash_requisicao = db.Column(db.String(64), nullable=False)
+    status = db.Column(db.String(20), default='processando', nullable=False)  # processando ou concluida
+    # Token da requisição que detém a reserva: só ela grava a resposta ou libera a chave
+    dono = db.Column(db.String(32), nullable=True)
+    
+    # Resposta guardada para as repetições
+    status_http = db.Column(db.Integer, nullable=True)
+    content_type = db.Column(db.String(100), nullable=True)
+    resposta = db.Column(db.Text, nullable=True)
+    
+    data_criacao = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    # Fim da reserva (processando) ou do TTL da resposta (concluida)
+    expira_em = db.Column(db.DateTime, nullable=False, index=True)
+
+class EventoCobranca(db.Model):
+    __tablename__ = 'eventos_cobranca'
+    # AUTOINCREMENT: ids nunca reaproveitados depois da limpeza, pois viram o Last-Event-ID dos clientes
+    __table_args__ = {'sqlite_autoincrement': True}
+    
+    # Sequência compartilhada por todos os processos (id do evento no stream /api/eventos)
+    id = db.Column(db.Integer, primary_key=True)
+    tipo = db.Column(db.String(50), nullable=False)  # cobranca_criada, cobranca_status, ...
+    dados = db.Column(db.Text, nullable=False)  # JSON
+    data_criacao = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
@@ -0,0 +1,319 @@
+import os
+import queue
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from functools import lru_cache
+from src.models.cobranca import EmailOutbox, db
+from src.rate_limit import TokenBucket
+
+class OutboxService:
+    """
+    Outbox persistente de emails
+
+    A criação de cobranças apenas grava a mensagem na tabela email_outbox;
+    o worker chama processar() periodicamente, que reserva um lote de
+    mensagens prontas, envia com até N threads (cada uma reutilizando sua
+    conexão SMTP) respeitando o limite de taxa de cada provedor do
+    destinatário, e reagenda as falhas com backoff exponencial. Depois de
+    OUTBOX_MAX_TENTATIVAS a mensagem vai para o estado "dead".
+    """
+
+    def __init__(self):
+        self.tamanho_lote = int(os.getenv('OUTBOX_LOTE', 200))
+        self.concorrencia = max(1, int(os.getenv('OUTBOX_CONCORRENCIA', 4)))
+        self.max_tentativas = int(os.getenv('OUTBOX_MAX_TENTATIVAS', 8))
+        self.backoff_base = float(os.getenv('OUTBOX_BACKOFF_BASE', 30))
+        self.backoff_max = float(os.getenv('OUTBOX_BACKOFF_MAX', 3600))
+        # Reserva de uma mensagem em envio; vencida, outro worker pode retomá-la
+        self.lease_segundos = float(os.getenv('OUTBOX_LEASE_SEGUNDOS', 300))
+        # Espera máxima por uma ficha do provedor antes de adiar a mensagem
+        self.espera_taxa = float(os.getenv('OUTBOX_ESPERA_TAXA', 5))
+
+        # Limites por domínio do destinatário, em emails por minuto:
+        # OUTBOX_LIMITES="gmail.com=60,outlook.com=30"
+        self.limite_padrao = float(os.getenv('OUTBOX_LIMITE_PADRAO', 120))
+        self.limites = {}
+        for item in os.getenv('OUTBOX_LIMITES', '').split(','):
+            if '=' in item:
+                dominio, limite = item.split('=', 1)
+                self.limites[dominio.strip().lower()] = float(limite)
+
+        self._buckets = {}
+        self._buckets_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self.ultima_execucao = None
+
+    def enfileirar(self, destinatario, assunto, corpo_html, corpo_texto=None, tipo='generico', cobranca_id=None):
+        """
+        Adiciona um email à outbox na sessão atual (sem commit)
+
+        Returns:
+            EmailOutbox: Registro criado
+        """
+        item = EmailOutbox(
+            destinatario=destinatario,
+            assunto=assunto,
+            corpo_html=corpo_html,
+            corpo_texto=corpo_texto,
+            tipo=tipo,
+            cobranca_id=cobranca_id,
+            proxima_tentativa=datetime.utcnow()
+        )
+        db.session.add(item)
+        return item
+
+    def provedor(self, destinatario):
+        """Provedor do destinatário (domínio do email), usado nos limites de taxa"""
+        return destinatario.rsplit('@', 1)[-1].strip().lower()
+
+    def _bucket(self, provedor):
+        with self._buckets_lock:
+            bucket = self._buckets.get(provedor)
+            if bucket is None:
+                por_minuto = self.limites.get(provedor, self.limite_padrao)
+                bucket = TokenBucket(por_minuto / 60, capacidade=max(1, por_minuto / 6))
+                self._buckets[provedor] = bucket
+            return bucket
+
+    def calcular_backoff(self, tentativas):
+        """Atraso até a próxima tentativa: exponencial com jitter, limitado a backoff_max"""
+        atraso = min(self.backoff_max, self.backoff_base * (2 ** max(0, tentativas - 1)))
+        return atraso * random.uniform(0.5, 1.0)
+
+    def _reservar(self, agora):
+        """
+        Reserva um lote de mensagens prontas para este worker
+
+        Pega as pendentes vencidas e as "sending" cuja reserva expirou (worker
+        que morreu no meio do envio). O UPDATE ... RETURNING torna a reserva
+        atômica entre workers.
+        """
+        prontas = (
+            db.select(EmailOutbox.id)
+            .where(
+                EmailOutbox.status.in_(('pending', 'sending')),
+                EmailOutbox.proxima_tentativa <= agora
+            )
+            .order_by(EmailOutbox.proxima_tentativa)
+            .limit(self.tamanho_lote)
+        )
+        linhas = db.session.execute(
+            db.update(EmailOutbox)
+            .where(
+                EmailOutbox.id.in_(prontas.scalar_subquery()),
+                EmailOutbox.status.in_(('pending', 'sending')),
+                EmailOutbox.proxima_tentativa <= agora
+            )
+            .values(status='sending', proxima_tentativa=agora + timedelta(seconds=self.lease_segundos))
+            .returning(
+                EmailOutbox.id, EmailOutbox.destinatario, EmailOutbox.assunto,
+                EmailOutbox.corpo_html, EmailOutbox.corpo_texto, EmailOutbox.tentativas
+            )
+            .execution_options(synchronize_session=False)
+        ).all()
+        db.session.commit()
+        return linhas
+
+    def _enviar_lote(self, mensagens):
+        """
+        Envia as mensagens com até `concorrencia` threads
+
+        Cada thread abre uma conexão SMTP e a reutiliza nas mensagens que
+        pegar; se um envio falhar, reconecta no próximo. Não toca no banco.
+
+        Returns:
+            dict: id -> (resultado, erro), com resultado em enviado/falhou/adiado
+        """
+        from src.services.email_service import get_email_service
+
+        email_service = get_email_service()
+        fila = queue.Queue()
+        for mensagem in mensagens:
+            fila.put(mensagem)
+
+        resultados = {}
+
+        def trabalhar():
+            conexao = None
+            try:
+                while True:
+                    try:
+                        mensagem = fila.get_nowait()
+                    except queue.Empty:
+                        return
+
+                    if not self._bucket(self.provedor(mensagem.destinatario)).consumir(timeout=self.espera_taxa):
+                        resultados[mensagem.id] = ('adiado', None)
+                        continue
+
+                    try:
+                        if conexao is None:
+                            conexao = email_service.conectar()
+                    except Exception as e:
+                        resultados[mensagem.id] = ('falhou', f'Falha ao conectar: {e}')
+                        continue
+
+                    result = email_service.enviar_email(
+                        mensagem.destinatario, mensagem.assunto,
+                        mensagem.corpo_html, mensagem.corpo_texto,
+                        conexao=conexao
+                    )
+                    if result['success']:
+                        resultados[mensagem.id] = ('enviado', None)
+                    else:
+                        resultados[mensagem.id] = ('falhou', result['error'])
+                        # A conexão pode ter ficado inutilizável; abre outra no próximo envio
+                        self._fechar(conexao)
+                        conexao = None
+            finally:
+                self._fechar(conexao)
+
+        threads = [
+            threading.Thread(target=trabalhar, name=f'outbox-{i}', daemon=True)
+            for i in range(min(self.concorrencia, len(mensagens)))
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        return resultados
+
+    def _fechar(self, conexao):
+        if conexao is None:
+            return
+        try:
+            conexao.quit()
+        except Exception:
+            conexao.close()
+
+    def processar(self):
+        """
+        Processa um lote da outbox
+
+        Returns:
+            dict: Métricas da execução
+        """
+        if not self._lock.acquire(blocking=False):
+            return {'success': False, 'error': 'Processamento já em andamento'}
+
+        try:
+            inicio = time.perf_counter()
+            agora = datetime.utcnow()
+
+            mensagens = self._reservar(agora)
+            resultados = self._enviar_lote(mensagens) if mensagens else {}
+
+            metricas = {'success': True, 'reservadas': len(mensagens), 'enviadas': 0, 'falhas': 0, 'adiadas': 0, 'mortas': 0}
+            agora = datetime.utcnow()
+            enviadas = [id_ for id_, (resultado, _) in resultados.items() if resultado == 'enviado']
+            adiadas = [id_ for id_, (resultado, _) in resultados.items() if resultado == 'adiado']
+
+            if enviadas:
+                db.session.execute(
+                    db.update(EmailOutbox)
+                    .where(EmailOutbox.id.in_(enviadas))
+                    .values(status='sent', data_envio=agora, ultimo_erro=None)
+                    .execution_options(synchronize_session=False)
+                )
+            if adiadas:
+                # Limite do provedor atingido: volta para a fila sem contar tentativa
+                db.session.execute(
+                    db.update(EmailOutbox)
+                    .where(EmailOutbox.id.in_(adiadas))
+                    .values(status='pending', proxima_tentativa=agora + timedelta(seconds=self.espera_taxa))
+                    .execution_options(synchronize_session=False)
+                )
+
+            falhas = []
+            for mensagem in mensagens:
+                resultado, erro = resultados.get(mensagem.id, ('falhou', 'Sem resultado'))
+                if resultado != 'falhou':
+                    continue
+
+                tentativas = mensagem.tentativas + 1
+                if tentativas >= self.max_tentativas:
+                    metricas['mortas'] += 1
+                    falhas.append({'id': mensagem.id, 'tentativas': tentativas, 'ultimo_erro': erro, 'status': 'dead'})
+                else:
+                    proxima = agora + timedelta(seconds=self.calcular_backoff(tentativas))
+                    falhas.append({'id': mensagem.id, 'tentativas': tentativas, 'ultimo_erro': erro, 'status': 'pending', 'proxima_tentativa': proxima})
+
+            for falha in falhas:
+                db.session.execute(
+                    db.update(EmailOutbox)
+                    .where(EmailOutbox.id == falha.pop('id'))
+                    .values(**falha)
+                    .execution_options(synchronize_session=False)
+                )
+            db.session.commit()
+
+            metricas['enviadas'] = len(enviadas)
+            metricas['adiadas'] = len(adiadas)
+            metricas['falhas'] = len(falhas)
+            metricas['duracao_ms'] = round((time.perf_counter() - inicio) * 1000, 2)
+            self.ultima_execucao = metricas
+            return metricas
+
+        except Exception as e:
+            db.session.rollback()
+            return {'success': False, 'error': str(e)}
+
+        finally:
+            self._lock.release()
+
+    def listar(self, status=None, limite=50, offset=0):
+        """
+        Lista mensagens da outbox, mais recentes primeiro
+
+        Returns:
+            tuple: (lista de EmailOutbox, total)
+        """
+        consulta = EmailOutbox.query
+        if status:
+            consulta = consulta.filter(EmailOutbox.status == status)
+
+        total = consulta.count()
+        itens = consulta.order_by(EmailOutbox.id.desc()).offset(offset).limit(limite).all()
+        return itens, total
+
+    def reenfileirar(self, item_id):
+        """
+        Devolve uma mensagem (normalmente "dead") para a fila, zerando as tentativas
+
+        Returns:
+            EmailOutbox: Registro atualizado ou None se não existir
+        """
+        item = db.session.get(EmailOutbox, item_id)
+        if item is None:
+            return None
+
+        item.status = 'pending'
+        item.tentativas = 0
+        item.proxima_tentativa = datetime.utcnow()
+        db.session.commit()
+        return item
+
+    def metricas(self):
+        """
+        Retorna a contagem por status, a idade da mais antiga pendente e a última execução
+        """
+        contagem = dict(db.session.execute(
+            db.select(EmailOutbox.status, db.func.count(EmailOutbox.id)).group_by(EmailOutbox.status)
+        ).all())
+        mais_antiga = db.session.execute(
+            db.select(db.func.min(EmailOutbox.proxima_tentativa)).where(EmailOutbox.status == 'pending')
+        ).scalar()
+
+        return {
+            'por_status': {status: contagem.get(status, 0) for status in ('pending', 'sending', 'sent', 'dead')},
+            'pendente_mais_antiga': mais_antiga.isoformat() if mais_antiga else None,
+            'ultima_execucao': self.ultima_execucao
+        }
+
+@lru_cache(maxsize=None)
+def get_outbox_service():
+    """Retorna a instância compartilhada do serviço, criada no primeiro uso"""
+    return OutboxService()
@@ -0,0 +1,149 @@
+import cProfile
+import io
+import marshal
+import os
+import pstats
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime
+from flask import g, request
+
+class ProfilerService:
+    """
+    Profiler opcional de requisições lentas
+
+    Perfila uma fração amostrada das requisições (PROFILER_SAMPLE_RATE) e/ou
+    toda requisição que ultrapassar um limite de latência (PROFILER_SLOW_MS;
+    sem a variável, nenhum limite; 0 perfila todas), mantendo os últimos N
+    perfis em um buffer circular em memória.
+    """
+
+    def __init__(self):
+        self.habilitado = os.getenv('PROFILER_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+        self.taxa_amostragem = float(os.getenv('PROFILER_SAMPLE_RATE', 0))
+        limite = os.getenv('PROFILER_SLOW_MS', '').strip()
+        self.limite_lento_ms = float(limite) if limite else None
+        self.max_perfis = int(os.getenv('PROFILER_MAX_PROFILES', 50))
+        self.blueprints = {
+            nome.strip() for nome in os.getenv('PROFILER_BLUEPRINTS', 'cobranca,backup').split(',') if nome.strip()
+        }
+        self._perfis = deque(maxlen=self.max_perfis)
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """Registra o serviço na aplicação e, se habilitado, os hooks de profiling"""
+        app.extensions['profiler'] = self
+
+        if not self.habilitado or (self.taxa_amostragem <= 0 and self.limite_lento_ms is None):
+            return
+
+        app.before_request(self._iniciar)
+        app.after_request(self._finalizar)
+        app.teardown_request(self._descartar)
+
+    def _iniciar(self):
+        if request.blueprint not in self.blueprints:
+            return
+
+        amostrada = self.taxa_amostragem > 0 and random.random() < self.taxa_amostragem
+
+        # Com limite de latência é preciso perfilar tudo e decidir no final
+        if not amostrada and self.limite_lento_ms is None:
+            return
+
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Outro profiler já está ativo neste interpretador
+            return
+
+        g._profiler = profiler
+        g._profiler_amostrada = amostrada
+        g._profiler_inicio = time.perf_counter()
+
+    def _finalizar(self, response):
+        profiler = g.pop('_profiler', None)
+        if profiler is None:
+            return response
+
+        profiler.disable()
+        duracao_ms = (time.perf_counter() - g.pop('_profiler_inicio')) * 1000
+        amostrada = g.pop('_profiler_amostrada', False)
+        lenta = self.limite_lento_ms is not None and duracao_ms >= self.limite_lento_ms
+
+        if amostrada or lenta:
+            self._registrar(profiler, duracao_ms, 'lento' if lenta else 'amostragem', response.status_code)
+
+        return response
+
+    def _descartar(self, exc=None):
+        # Garante que o profiler seja desligado mesmo se a view levantar exceção
+        profiler = g.pop('_profiler', None)
+        if profiler is not None:
+            profiler.disable()
+
+    def _registrar(self, profiler, duracao_ms, motivo, status_code):
+        profiler.create_stats()
+        # Mesmo formato gravado por pstats.dump_stats (abre no snakeviz/pstats).
+        # Precisa ser serializado antes do pstats.Stats, que esvazia profiler.stats
+        dados = marshal.dumps(profiler.stats)
+
+        resumo = io.StringIO()
+        pstats.Stats(profiler, stream=resumo).sort_stats('cumulative').print_stats(30)
+
+        perfil = {
+            'id': uuid.uuid4().hex[:12],
+            'data': datetime.utcnow().isoformat(),
+            'metodo': request.method,
+            'path': request.path,
+            'query_string': request.query_string.decode('utf-8', 'replace'),
+            'endpoint': request.endpoint,
+            'status_code': status_code,
+            'duracao_ms': round(duracao_ms, 2),
+            'motivo': motivo,
+            'dados': dados,
+            'resumo': resumo.getvalue()
+        }
+
+        with self._lock:
+            self._perfis.append(perfil)
+
+    def listar_perfis(self):
+        """
+        Lista os perfis capturados (mais recente primeiro)
+
+        Returns:
+            list: Metadados dos perfis, sem os dados brutos
+        """
+        with self._lock:
+            perfis = list(self._perfis)
+
+        return [
+            {chave: valor for chave, valor in perfil.items() if chave not in ('dados', 'resumo')}
+            for perfil in reversed(perfis)
+        ]
+
+    def obter_perfil(self, perfil_id):
+        """
+        Obtém um perfil capturado pelo ID
+
+        Args:
+            perfil_id (str): ID do perfil
+
+        Returns:
+            dict: Perfil completo ou None se não estiver mais no buffer
+        """
+        with self._lock:
+            for perfil in self._perfis:
+                if perfil['id'] == perfil_id:
+                    return perfil
+        return None
+
+    def limpar(self):
+        """Remove todos os perfis do buffer"""
+        with self._lock:
+            self._perfis.clear()
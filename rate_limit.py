@@ -0,0 +1,224 @@
+import heapq
+import threading
+import time
+
+class TokenBucket:
+    """
+    Limitador de taxa token bucket, seguro entre threads
+
+    Acumula até `capacidade` fichas, repostas à razão de `taxa` por segundo.
+    Cada operação consome uma ficha; sem fichas, quem chamar espera ou
+    desiste, conforme o timeout.
+    """
+
+    def __init__(self, taxa, capacidade=None):
+        self.taxa = float(taxa)
+        self.capacidade = float(capacidade if capacidade is not None else max(1.0, taxa))
+        self._fichas = self.capacidade
+        self._atualizado = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _repor(self, agora):
+        self._fichas = min(self.capacidade, self._fichas + (agora - self._atualizado) * self.taxa)
+        self._atualizado = agora
+
+    def tentar_consumir(self, fichas=1):
+        """
+        Consome fichas sem esperar
+
+        Returns:
+            float: 0 se consumiu; senão, segundos até haver fichas suficientes
+        """
+        with self._lock:
+            self._repor(time.monotonic())
+            if self._fichas >= fichas:
+                self._fichas -= fichas
+                return 0.0
+            return (fichas - self._fichas) / self.taxa if self.taxa > 0 else float('inf')
+
+    def consumir(self, fichas=1, timeout=None):
+        """
+        Consome fichas, esperando por elas se preciso
+
+        Args:
+            fichas (float): Quantidade a consumir
+            timeout (float): Espera máxima em segundos (None espera sem limite)
+
+        Returns:
+            bool: True se consumiu, False se o timeout acabou antes
+        """
+        prazo = None if timeout is None else time.monotonic() + timeout
+
+        while True:
+            espera = self.tentar_consumir(fichas)
+            if espera == 0:
+                return True
+            if prazo is not None:
+                restante = prazo - time.monotonic()
+                if restante <= 0 or espera > restante:
+                    return False
+            time.sleep(min(espera, 1.0))
+
+    def ajustar_taxa(self, taxa):
+        """Troca a taxa de reposição, preservando as fichas acumuladas"""
+        with self._lock:
+            self._repor(time.monotonic())
+            self.taxa = float(taxa)
+
+    @property
+    def fichas(self):
+        with self._lock:
+            self._repor(time.monotonic())
+            return self._fichas
+
+
+class LimitadorPrioritario:
+    """
+    Limitador de taxa com classes de prioridade, um token bucket por endpoint
+
+    Quem chama entra em uma fila por endpoint ordenada por (prioridade,
+    chegada) e só consome uma ficha quando é o primeiro da fila: com o
+    bucket vazio, um webhook que chega depois passa na frente do lote que
+    já estava esperando.
+
+    Respostas 429 reduzem a taxa do endpoint pela metade e pausam as
+    chamadas pelo Retry-After; cada sucesso devolve um pouco da taxa, até a
+    configurada (AIMD).
+
+    O estado fica na memória do processo. Com vários processos, cada um
+    deve receber sua parte da taxa total (ver MP_PROCESSOS em
+    MercadoPagoService).
+    """
+
+    PRIORIDADES = ('webhook', 'interativa', 'lote')
+
+    def __init__(self, taxa_padrao, taxas=None, taxa_minima=0.5, recuperacao=0.05):
+        self.taxa_padrao = float(taxa_padrao)
+        self.taxas = {endpoint: float(taxa) for endpoint, taxa in (taxas or {}).items()}
+        self.taxa_minima = float(taxa_minima)
+        # Fração da taxa configurada devolvida a cada sucesso depois de um 429
+        self.recuperacao = float(recuperacao)
+        self._condicao = threading.Condition()
+        self._endpoints = {}
+        self._sequencia = 0
+
+    def _estado(self, endpoint):
+        estado = self._endpoints.get(endpoint)
+        if estado is None:
+            taxa = self.taxas.get(endpoint, self.taxa_padrao)
+            estado = {
+                'bucket': TokenBucket(taxa),
+                'taxa_configurada': taxa,
+                'fila': [],
+                'pausado_ate': 0.0,
+                'adquiridas': {prioridade: 0 for prioridade in self.PRIORIDADES},
+                'espera_total': {prioridade: 0.0 for prioridade in self.PRIORIDADES},
+                'expiradas': {prioridade: 0 for prioridade in self.PRIORIDADES},
+                'respostas_429': 0
+            }
+            self._endpoints[endpoint] = estado
+        return estado
+
+    def adquirir(self, endpoint, prioridade='interativa', timeout=None):
+        """
+        Espera a vez e uma ficha do endpoint
+
+        Args:
+            endpoint (str): Nome do endpoint (ex.: payment.get)
+            prioridade (str): webhook, interativa ou lote
+            timeout (float): Espera máxima em segundos (None espera sem limite)
+
+        Returns:
+            bool: True se pode chamar, False se o timeout acabou antes
+        """
+        if prioridade not in self.PRIORIDADES:
+            raise ValueError(f"Prioridade inválida: {prioridade}")
+
+        inicio = time.monotonic()
+        prazo = None if timeout is None else inicio + timeout
+
+        with self._condicao:
+            estado = self._estado(endpoint)
+            self._sequencia += 1
+            ticket = (self.PRIORIDADES.index(prioridade), self._sequencia)
+            heapq.heappush(estado['fila'], ticket)
+
+            try:
+                while True:
+                    agora = time.monotonic()
+                    if estado['fila'][0] == ticket:
+                        espera = max(0.0, estado['pausado_ate'] - agora) or estado['bucket'].tentar_consumir()
+                        if espera == 0:
+                            heapq.heappop(estado['fila'])
+                            estado['adquiridas'][prioridade] += 1
+                            estado['espera_total'][prioridade] += agora - inicio
+                            return True
+                    else:
+                        # Não é a vez: acorda quando a fila andar
+                        espera = 1.0
+
+                    if prazo is not None:
+                        restante = prazo - agora
+                        if restante <= 0:
+                            estado['fila'].remove(ticket)
+                            heapq.heapify(estado['fila'])
+                            estado['expiradas'][prioridade] += 1
+                            return False
+                        espera = min(espera, restante)
+
+                    self._condicao.wait(min(espera, 1.0))
+            finally:
+                self._condicao.notify_all()
+
+    def registrar_resposta(self, endpoint, status, retry_after=None):
+        """
+        Ajusta a taxa do endpoint conforme o status HTTP da resposta
+
+        Args:
+            endpoint (str): Nome do endpoint
+            status (int): Status HTTP retornado
+            retry_after (float): Segundos do cabeçalho Retry-After, se houver
+        """
+        with self._condicao:
+            estado = self._estado(endpoint)
+            bucket = estado['bucket']
+
+            if status == 429:
+                estado['respostas_429'] += 1
+                bucket.ajustar_taxa(max(self.taxa_minima, bucket.taxa / 2))
+                pausa = retry_after if retry_after is not None else 1.0 / bucket.taxa
+                estado['pausado_ate'] = max(estado['pausado_ate'], time.monotonic() + pausa)
+            elif bucket.taxa < estado['taxa_configurada']:
+                bucket.ajustar_taxa(min(
+                    estado['taxa_configurada'],
+                    bucket.taxa + estado['taxa_configurada'] * self.recuperacao
+                ))
+
+            self._condicao.notify_all()
+
+    def metricas(self):
+        """
+        Retorna, por endpoint, a taxa atual, a fila por prioridade e as esperas médias
+        """
+        with self._condicao:
+            agora = time.monotonic()
+            resultado = {}
+            for endpoint, estado in self._endpoints.items():
+                fila = {prioridade: 0 for prioridade in self.PRIORIDADES}
+                for indice, _ in estado['fila']:
+                    fila[self.PRIORIDADES[indice]] += 1
+
+                resultado[endpoint] = {
+                    'taxa_configurada': estado['taxa_configurada'],
+                    'taxa_atual': round(estado['bucket'].taxa, 3),
+                    'pausado_por_ms': round(max(0.0, estado['pausado_ate'] - agora) * 1000),
+                    'fila': fila,
+                    'adquiridas': dict(estado['adquiridas']),
+                    'expiradas': dict(estado['expiradas']),
+                    'espera_media_ms': {
+                        prioridade: round(estado['espera_total'][prioridade] * 1000 / estado['adquiridas'][prioridade], 2)
+                        for prioridade in self.PRIORIDADES if estado['adquiridas'][prioridade]
+                    },
+                    'respostas_429': estado['respostas_429']
+                }
+            return resultado
@@ -0,0 +1,363 @@
+"""
+Runner de produção com papéis separados
+
+Uso:
+    python -m src.runner web --workers 4 --threads 8 --port 5000
+    python -m src.runner worker
+    python -m src.runner all --workers 4
+
+- web: o processo pai abre o socket e cria N processos filhos que servem a
+  aplicação WSGI, cada um com um pool de threads.
+- worker: um processo que executa as tarefas agendadas (backups, filas).
+- all: web e worker sob o mesmo processo supervisor.
+
+SIGTERM/SIGINT no processo pai encerram os filhos de forma graciosa: cada
+um para de aceitar conexões e termina as requisições em andamento.
+"""
+import argparse
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Mesmo ajuste de sys.path do main.py, para rodar também como script
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+from src.config import load_config
+
+
+class RequestHandler(WSGIRequestHandler):
+    # Limita o tempo que uma conexão keep-alive ociosa ocupa uma thread do pool
+    timeout = int(os.getenv('WEB_KEEPALIVE_TIMEOUT', 15))
+
+
+class ServidorWSGI(BaseWSGIServer):
+    """Servidor WSGI com pool de threads limitado, sobre um socket já aberto"""
+
+    multithread = True
+    multiprocess = True
+
+    def __init__(self, host, port, app, threads, fd):
+        self._executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='web')
+        super().__init__(host, port, app, handler=RequestHandler, fd=fd)
+
+    def process_request(self, request, client_address):
+        self._executor.submit(self._processar, request, client_address)
+
+    def _processar(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def aguardar_requisicoes(self):
+        """Espera as requisições em andamento terminarem"""
+        self._executor.shutdown(wait=True)
+
+
+def executar_web(sock, host, port, threads):
+    """Loop de um processo filho do papel web"""
+    from src.main import create_app
+
+    app = create_app()
+    servidor = ServidorWSGI(host, port, app, threads, fd=sock.fileno())
+
+    def encerrar(signum, frame):
+        # shutdown() bloqueia até o serve_forever sair, então roda em outra thread
+        threading.Thread(target=servidor.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, encerrar)
+    signal.signal(signal.SIGINT, encerrar)
+
+    print(f"[web {os.getpid()}] servindo em http://{host}:{servidor.port} com {threads} threads", flush=True)
+    servidor.serve_forever()
+    servidor.aguardar_requisicoes()
+    print(f"[web {os.getpid()}] encerrado", flush=True)
+
+
+def registrar_jobs(scheduler, app):
+    """
+    Registra as tarefas periódicas do papel worker
+
+    Cada tarefa roda dentro do contexto da aplicação e libera a sessão do
+    banco ao final.
+    """
+    def no_contexto(funcao):
+        def executar():
+            from src.models.cobranca import db
+            with app.app_context():
+                try:
+                    funcao()
+                finally:
+                    db.session.remove()
+        return executar
+
+    intervalo_backup = float(os.getenv('BACKUP_INTERVAL_MINUTES', 0))
+    if intervalo_backup > 0:
+        def backup_agendado():
+            from src.services.backup_service import get_backup_service
+            backup_service = get_backup_service()
+            backup_type = os.getenv('BACKUP_TYPE', 'full')
+
+            if os.getenv('BACKUP_GIT_COMMIT', 'false').lower() in ('1', 'true', 'yes'):
+                result = backup_service.backup_and_commit(backup_type)
+            else:
+                if backup_type == 'latest':
+                    backup_file = backup_service.export_latest_cobrancas()
+                elif backup_type == 'snapshot':
+                    backup_file = backup_service.criar_snapshot()['backup_file']
+                elif backup_type == 'dedup':
+                    from src.services.backup_store_service import get_backup_store
+                    backup_file = get_backup_store().criar_backup()['manifest_file']
+                    get_backup_store().coletar_lixo()
+                else:
+                    backup_file = backup_service.export_cobrancas_to_json()
+                result = {'success': True, 'backup_file': backup_file, 'archive_files': backup_service.backup_arquivos()}
+
+            print(f"[worker] backup agendado: {result}", flush=True)
+
+        scheduler.add_job('backup', intervalo_backup * 60, no_contexto(backup_agendado))
+
+    intervalo_expiracao = float(os.getenv('EXPIRACAO_INTERVAL_MINUTES', 15))
+    if intervalo_expiracao > 0:
+        def expirar_vencidas():
+            from src.services.expiracao_service import get_expiracao_service
+            metricas = get_expiracao_service().varrer()
+            if not metricas['success'] or metricas['expiradas']:
+                print(f"[worker] expiração: {metricas}", flush=True)
+
+        scheduler.add_job('expiracao', intervalo_expiracao * 60, no_contexto(expirar_vencidas), executar_ao_iniciar=True)
+
+    intervalo_outbox = float(os.getenv('OUTBOX_INTERVAL_SEGUNDOS', 10))
+    if intervalo_outbox > 0:
+        def processar_outbox():
+            from src.services.outbox_service import get_outbox_service
+            outbox_service = get_outbox_service()
+
+            # Lote cheio indica fila acumulada: continua sem esperar o próximo intervalo
+            while True:
+                metricas = outbox_service.processar()
+                if not metricas['success'] or metricas['falhas']:
+                    print(f"[worker] outbox: {metricas}", flush=True)
+                if not metricas['success'] or not metricas['enviadas'] or metricas['reservadas'] < outbox_service.tamanho_lote:
+                    break
+
+        scheduler.add_job('outbox', intervalo_outbox, no_contexto(processar_outbox), executar_ao_iniciar=True)
+
+    intervalo_lembretes = float(os.getenv('LEMBRETES_INTERVAL_MINUTES', 0))
+    if intervalo_lembretes > 0:
+        def campanha_lembretes():
+            from src.services.lembrete_service import get_lembrete_service
+            print(f"[worker] lembretes: {get_lembrete_service().executar()}", flush=True)
+
+        scheduler.add_job('lembretes', intervalo_lembretes * 60, no_contexto(campanha_lembretes))
+
+    intervalo_arquivo = float(os.getenv('ARQUIVO_INTERVAL_MINUTES', 0))
+    if intervalo_arquivo > 0:
+        def arquivar_finalizadas():
+            from src.services.arquivo_service import get_arquivo_service
+            metricas = get_arquivo_service().arquivar()
+            if not metricas['success'] or metricas['arquivadas']:
+                print(f"[worker] arquivamento: {metricas}", flush=True)
+
+        scheduler.add_job('arquivo', intervalo_arquivo * 60, no_contexto(arquivar_finalizadas))
+
+    intervalo_idempotencia = float(os.getenv('IDEMPOTENCIA_INTERVAL_MINUTES', 60))
+    if intervalo_idempotencia > 0:
+        def limpar_idempotencia():
+            from src.services.idempotencia_service import get_idempotencia_service
+            removidas = get_idempotencia_service().limpar()
+            if removidas:
+                print(f"[worker] idempotência: {removidas} chaves vencidas removidas", flush=True)
+
+        scheduler.add_job('idempotencia', intervalo_idempotencia * 60, no_contexto(limpar_idempotencia))
+
+    intervalo_eventos = float(os.getenv('EVENTOS_LIMPEZA_INTERVAL_MINUTES', 60))
+    if intervalo_eventos > 0:
+        def limpar_eventos():
+            from src.services.eventos_service import get_event_broker
+            removidos = get_event_broker().limpar()
+            if removidos:
+                print(f"[worker] eventos: {removidos} eventos antigos removidos", flush=True)
+
+        scheduler.add_job('eventos', intervalo_eventos * 60, no_contexto(limpar_eventos))
+
+
+def executar_worker():
+    """Loop do processo do papel worker"""
+    from src.main import create_app
+    from src.scheduler import Scheduler
+
+    app = create_app()
+    scheduler = Scheduler()
+    registrar_jobs(scheduler, app)
+
+    def encerrar(signum, frame):
+        scheduler.stop()
+
+    signal.signal(signal.SIGTERM, encerrar)
+    signal.signal(signal.SIGINT, encerrar)
+
+    print(f"[worker {os.getpid()}] tarefas: {', '.join(scheduler.jobs) or 'nenhuma'}", flush=True)
+    scheduler.run()
+    print(f"[worker {os.getpid()}] encerrado", flush=True)
+
+
+class Supervisor:
+    """
+    Cria, acompanha e reinicia os processos filhos
+
+    Um filho que sai é recriado depois de uma espera que dobra a cada saída
+    seguida com menos de SUPERVISOR_VIDA_MINIMA segundos de vida (um filho
+    que falha ao subir), de 1 s até SUPERVISOR_ESPERA_MAXIMA. Um filho que
+    viveu mais que isso volta à espera inicial. Os reinícios são agendados:
+    um SIGTERM durante a espera encerra o supervisor na hora.
+    """
+
+    def __init__(self, graceful_timeout, espera_inicial=1.0, espera_maxima=None, vida_minima=None):
+        self.graceful_timeout = graceful_timeout
+        self.espera_inicial = espera_inicial
+        self.espera_maxima = float(os.getenv('SUPERVISOR_ESPERA_MAXIMA', 60)) if espera_maxima is None else espera_maxima
+        self.vida_minima = float(os.getenv('SUPERVISOR_VIDA_MINIMA', 10)) if vida_minima is None else vida_minima
+        # pid -> (papel, alvo, início, saídas rápidas seguidas)
+        self.filhos = {}
+        # (quando, papel, alvo, saídas rápidas seguidas)
+        self.agendados = []
+        self.parando = False
+
+    def iniciar(self, papel, alvo, falhas=0):
+        pid = os.fork()
+        if pid == 0:
+            codigo = 0
+            try:
+                signal.signal(signal.SIGTERM, signal.SIG_DFL)
+                signal.signal(signal.SIGINT, signal.SIG_DFL)
+                alvo()
+            except Exception:
+                import traceback
+                traceback.print_exc()
+                codigo = 1
+            finally:
+                os._exit(codigo)
+
+        self.filhos[pid] = (papel, alvo, time.monotonic(), falhas)
+
+    def parar(self, signum=None, frame=None):
+        if self.parando:
+            return
+        self.parando = True
+        self.agendados.clear()
+        for pid in list(self.filhos):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def _agendar(self, papel, alvo, inicio, falhas):
+        if time.monotonic() - inicio < self.vida_minima:
+            falhas += 1
+        else:
+            falhas = 0
+        espera = min(self.espera_maxima, self.espera_inicial * 2 ** max(0, falhas - 1))
+        self.agendados.append((time.monotonic() + espera, papel, alvo, falhas))
+        return espera
+
+    def _reiniciar_agendados(self):
+        agora = time.monotonic()
+        for item in [item for item in self.agendados if item[0] <= agora]:
+            self.agendados.remove(item)
+            _, papel, alvo, falhas = item
+            self.iniciar(papel, alvo, falhas)
+
+    def executar(self):
+        signal.signal(signal.SIGTERM, self.parar)
+        signal.signal(signal.SIGINT, self.parar)
+
+        prazo = None
+        while self.filhos or self.agendados:
+            pid, status = os.waitpid(-1, os.WNOHANG) if self.filhos else (0, 0)
+
+            if pid == 0:
+                if self.parando:
+                    prazo = prazo or time.monotonic() + self.graceful_timeout
+                    if time.monotonic() > prazo:
+                        for restante in list(self.filhos):
+                            os.kill(restante, signal.SIGKILL)
+                else:
+                    self._reiniciar_agendados()
+                time.sleep(0.05 if self.agendados else 0.2)
+                continue
+
+            papel, alvo, inicio, falhas = self.filhos.pop(pid)
+            if not self.parando:
+                espera = self._agendar(papel, alvo, inicio, falhas)
+                print(f"[supervisor] processo {papel} {pid} saiu (status {status}); reiniciando em {espera:.1f}s", flush=True)
+
+
+def preparar_banco():
+    """
+    Cria as tabelas e aplica as migrações uma única vez, no supervisor
+
+    Os filhos sobem depois com AUTO_CREATE_TABLES=false e não tocam no esquema.
+    """
+    from src.main import create_app
+    from src.models.cobranca import db
+
+    app = create_app()
+    with app.app_context():
+        db.session.remove()
+        # Nenhuma conexão aberta pode ser herdada pelos filhos
+        db.engine.dispose()
+
+    os.environ['AUTO_CREATE_TABLES'] = 'false'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Runner de produção')
+    parser.add_argument('role', choices=['web', 'worker', 'all'])
+    parser.add_argument('--host', default=os.getenv('WEB_HOST', '0.0.0.0'))
+    parser.add_argument('--port', type=int, default=int(os.getenv('PORT', 5000)))
+    parser.add_argument('--workers', type=int, default=int(os.getenv('WEB_WORKERS', os.cpu_count() or 1)))
+    parser.add_argument('--threads', type=int, default=int(os.getenv('WEB_THREADS', 8)))
+    parser.add_argument('--graceful-timeout', type=float, default=float(os.getenv('GRACEFUL_TIMEOUT', 30)))
+    args = parser.parse_args()
+
+    load_config()
+    if os.getenv('AUTO_CREATE_TABLES', 'true').lower() in ('1', 'true', 'yes'):
+        preparar_banco()
+
+    # Streams SSE ocupam uma thread cada: no máximo metade do pool de cada processo
+    os.environ.setdefault('EVENTOS_MAX_CONEXOES', str(max(1, args.threads // 2)))
+
+    # Cada processo tem seu limitador do Mercado Pago: a taxa configurada é
+    # dividida entre eles. Com web e worker em supervisores separados, defina
+    # MP_PROCESSOS com o total nos dois.
+    processos = (args.workers if args.role in ('web', 'all') else 0) + (1 if args.role in ('worker', 'all') else 0)
+    os.environ.setdefault('MP_PROCESSOS', str(processos))
+
+    supervisor = Supervisor(args.graceful_timeout)
+
+    if args.role in ('web', 'all'):
+        # Socket aberto uma vez no pai e herdado por todos os filhos
+        sock = socket.create_server((args.host, args.port), backlog=2048)
+        sock.set_inheritable(True)
+
+        for _ in range(args.workers):
+            supervisor.iniciar('web', lambda: executar_web(sock, args.host, args.port, args.threads))
+
+    if args.role in ('worker', 'all'):
+        supervisor.iniciar('worker', executar_worker)
+
+    print(f"[supervisor {os.getpid()}] papel {args.role} iniciado", flush=True)
+    supervisor.executar()
+    print(f"[supervisor {os.getpid()}] encerrado", flush=True)
+
+
+if __name__ == '__main__':
+    main()
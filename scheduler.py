@@ -0,0 +1,68 @@
+import threading
+import time
+import traceback
+
+class Scheduler:
+    """
+    Agendador simples de tarefas periódicas
+
+    Executa as tarefas em sequência na thread que chamar run(), até que
+    stop() seja chamado (por exemplo a partir de um handler de SIGTERM).
+    """
+
+    def __init__(self):
+        self._jobs = []
+        self._parar = threading.Event()
+
+    def add_job(self, nome, intervalo_segundos, funcao, executar_ao_iniciar=False):
+        """
+        Registra uma tarefa periódica
+
+        Args:
+            nome (str): Nome da tarefa (usado nos logs)
+            intervalo_segundos (float): Intervalo entre execuções
+            funcao (callable): Função sem argumentos a ser executada
+            executar_ao_iniciar (bool): Executa logo na primeira volta do loop
+        """
+        inicio = time.monotonic()
+        self._jobs.append({
+            'nome': nome,
+            'intervalo': intervalo_segundos,
+            'funcao': funcao,
+            'proxima': inicio if executar_ao_iniciar else inicio + intervalo_segundos
+        })
+
+    @property
+    def jobs(self):
+        return [job['nome'] for job in self._jobs]
+
+    def run(self):
+        """Executa o loop do agendador até stop() ser chamado"""
+        while not self._parar.is_set():
+            agora = time.monotonic()
+
+            for job in self._jobs:
+                if self._parar.is_set():
+                    break
+                if job['proxima'] > agora:
+                    continue
+
+                try:
+                    job['funcao']()
+                except Exception:
+                    print(f"Erro na tarefa agendada '{job['nome']}':", flush=True)
+                    traceback.print_exc()
+
+                job['proxima'] = time.monotonic() + job['intervalo']
+
+            if not self._jobs:
+                self._parar.wait(1)
+                continue
+
+            espera = min(job['proxima'] for job in self._jobs) - time.monotonic()
+            if espera > 0:
+                self._parar.wait(espera)
+
+    def stop(self):
+        """Sinaliza o encerramento; a tarefa em andamento termina normalmente"""
+        self._parar.set()
@@ -4,6 +4,25 @@ const API_BASE_URL = '/api';
 // Estado da aplicação
 let currentPage = 1;
 let currentFilter = '';
+let listController = null;
+let modalCobrancaId = null;
+
+// Camada de dados do cliente
+const PER_PAGE = 10;
+const CACHE_FRESH_MS = 5000;
+const CACHE_MAX_ENTRIES = 50;
+const apiCache = new Map();          // url -> { data, etag, time }
+const inflightRequests = new Map();  // url -> Promise
+const cobrancaIndex = new Map();     // id -> cobrança vista na listagem/detalhe
+
+// Criação de cobranças: retentativas com a mesma Idempotency-Key
+const CREATE_MAX_ATTEMPTS = 4;
+const CREATE_RETRY_BASE_MS = 500;
+let pendingCreate = null;            // { body, key } da última criação sem resposta final
+
+// Eventos em tempo real: espera antes de reconectar quando o servidor recusa o stream
+const EVENTOS_RECONNECT_MS = 30000;
+let lastEventoId = null;             // id do último evento recebido, para retomar em uma conexão nova
 
 // Inicialização
 document.addEventListener('DOMContentLoaded', function() {
@@ -13,6 +32,7 @@ document.addEventListener('DOMContentLoaded', function() {
 function initializeApp() {
     setupEventListeners();
     loadCobrancas();
+    connectEventos();
 }
 
 function setupEventListeners() {
@@ -34,6 +54,7 @@ function setupEventListeners() {
     });
 
     document.getElementById('btn-refresh').addEventListener('click', function() {
+        invalidateListCache();
         loadCobrancas();
     });
 
@@ -112,22 +133,27 @@ async function handleCreateCobranca(e) {
     // Converter valor para número
     data.valor = parseFloat(data.valor);
 
+    // Reenviar o mesmo formulário depois de uma falha reaproveita a chave:
+    // se a primeira tentativa chegou ao servidor, a resposta dela é devolvida
+    const body = JSON.stringify(data);
+    if (!pendingCreate || pendingCreate.body !== body) {
+        pendingCreate = { body, key: newIdempotencyKey() };
+    }
+
     try {
         showLoading(true);
         
-        const response = await fetch(`${API_BASE_URL}/cobrancas`, {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json'
-            },
-            body: JSON.stringify(data)
-        });
+        const response = await postWithRetry(`${API_BASE_URL}/cobrancas`, body, pendingCreate.key);
 
         const result = await response.json();
+        if (response.status < 500 && response.status !== 409) {
+            pendingCreate = null;
+        }
 
         if (result.success) {
             showToast('Cobrança criada com sucesso!', 'success');
             e.target.reset();
+            invalidateListCache();
             
             // Mostrar detalhes da cobrança criada
             showCobrancaDetails(result);
@@ -141,29 +167,195 @@ async function handleCreateCobranca(e) {
     }
 }
 
+function newIdempotencyKey() {
+    if (window.crypto && typeof window.crypto.randomUUID === 'function') {
+        return window.crypto.randomUUID();
+    }
+    return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}-${Math.random().toString(36).slice(2)}`;
+}
+
+// POST com retentativas (falha de rede e 409 "em processamento"), sempre com a mesma chave.
+// 5xx não é repetido automaticamente: a criação pode ter chegado ao Mercado Pago
+// antes da falha, e o servidor libera a chave nesse caso; quem decide reenviar é o usuário
+async function postWithRetry(url, body, idempotencyKey) {
+    for (let attempt = 1; ; attempt++) {
+        let response;
+        try {
+            response = await fetch(url, {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                    'Idempotency-Key': idempotencyKey
+                },
+                body
+            });
+        } catch (error) {
+            if (attempt >= CREATE_MAX_ATTEMPTS) throw error;
+            await delay(CREATE_RETRY_BASE_MS * 2 ** (attempt - 1));
+            continue;
+        }
+
+        if (response.status !== 409 || attempt >= CREATE_MAX_ATTEMPTS) {
+            return response;
+        }
+
+        const retryAfter = parseFloat(response.headers.get('Retry-After'));
+        await delay(Number.isFinite(retryAfter) ? retryAfter * 1000 : CREATE_RETRY_BASE_MS * 2 ** (attempt - 1));
+    }
+}
+
+function delay(ms) {
+    return new Promise(resolve => setTimeout(resolve, ms));
+}
+
+// GET com cache em memória, revalidação por ETag e deduplicação de requisições iguais
+function fetchJSON(url, { signal } = {}) {
+    if (inflightRequests.has(url)) {
+        return inflightRequests.get(url);
+    }
+
+    const cached = apiCache.get(url);
+    const headers = {};
+    if (cached && cached.etag) {
+        headers['If-None-Match'] = cached.etag;
+    }
+
+    // no-store: o 304 chega até aqui e o cache é o nosso, não o do navegador
+    const promise = fetch(url, { headers, signal, cache: 'no-store' })
+        .then(async response => {
+            if (response.status === 304 && cached) {
+                cached.time = Date.now();
+                return cached.data;
+            }
+
+            const data = await response.json();
+            if (response.ok && data.success) {
+                setCache(url, { data, etag: response.headers.get('ETag'), time: Date.now() });
+            }
+            return data;
+        })
+        .finally(() => {
+            if (inflightRequests.get(url) === promise) {
+                inflightRequests.delete(url);
+            }
+        });
+
+    inflightRequests.set(url, promise);
+
+    // Uma requisição cancelada não pode ser reaproveitada pela próxima
+    if (signal) {
+        signal.addEventListener('abort', () => {
+            if (inflightRequests.get(url) === promise) {
+                inflightRequests.delete(url);
+            }
+        });
+    }
+
+    return promise;
+}
+
+function setCache(url, entry) {
+    apiCache.delete(url);
+    apiCache.set(url, entry);
+
+    // Remove as entradas mais antigas (o Map preserva a ordem de inserção)
+    while (apiCache.size > CACHE_MAX_ENTRIES) {
+        apiCache.delete(apiCache.keys().next().value);
+    }
+}
+
+function invalidateListCache() {
+    for (const url of apiCache.keys()) {
+        if (url.startsWith(`${API_BASE_URL}/cobrancas?`)) {
+            apiCache.delete(url);
+        }
+    }
+}
+
+function buildListUrl(page) {
+    let url = `${API_BASE_URL}/cobrancas?page=${page}&per_page=${PER_PAGE}`;
+    if (currentFilter) {
+        url += `&status=${currentFilter}`;
+    }
+    return url;
+}
+
 async function loadCobrancas(page = 1) {
+    currentPage = page;
+    const url = buildListUrl(page);
+
+    // Cancela o carregamento anterior (troca rápida de aba, filtro ou página)
+    if (listController) {
+        listController.abort();
+    }
+    const controller = new AbortController();
+    listController = controller;
+
+    // Mostra na hora o que já está em cache e revalida em segundo plano
+    const cached = apiCache.get(url);
+    if (cached) {
+        renderListResult(cached.data);
+        if (Date.now() - cached.time < CACHE_FRESH_MS) {
+            listController = null;
+            prefetchNextPage(cached.data);
+            return;
+        }
+    }
+
     try {
-        showLoading(true);
-        
-        let url = `${API_BASE_URL}/cobrancas?page=${page}&per_page=10`;
-        if (currentFilter) {
-            url += `&status=${currentFilter}`;
+        if (!cached) {
+            showLoading(true);
         }
 
-        const response = await fetch(url);
-        const result = await response.json();
+        const result = await fetchJSON(url, { signal: controller.signal });
+        if (controller !== listController) {
+            return;
+        }
 
         if (result.success) {
-            displayCobrancas(result.cobrancas);
-            displayPagination(result.current_page, result.pages, result.total);
+            if (!cached || cached.data !== result) {
+                renderListResult(result);
+            }
+            prefetchNextPage(result);
         } else {
             showToast(`Erro ao carregar cobranças: ${result.error}`, 'error');
         }
     } catch (error) {
-        showToast(`Erro de conexão: ${error.message}`, 'error');
+        if (error.name !== 'AbortError') {
+            showToast(`Erro de conexão: ${error.message}`, 'error');
+        }
     } finally {
-        showLoading(false);
+        if (controller === listController) {
+            listController = null;
+            showLoading(false);
+        }
+    }
+}
+
+function renderListResult(result) {
+    result.cobrancas.forEach(cobranca => cobrancaIndex.set(cobranca.id, cobranca));
+    displayCobrancas(result.cobrancas);
+    displayPagination(result.current_page, result.pages, result.total);
+}
+
+function prefetchNextPage(result) {
+    if (result.current_page >= result.pages) {
+        return;
     }
+
+    const url = buildListUrl(result.current_page + 1);
+    const cached = apiCache.get(url);
+    if ((cached && Date.now() - cached.time < CACHE_FRESH_MS) || inflightRequests.has(url)) {
+        return;
+    }
+
+    fetchJSON(url)
+        .then(next => {
+            if (next.success) {
+                next.cobrancas.forEach(cobranca => cobrancaIndex.set(cobranca.id, cobranca));
+            }
+        })
+        .catch(() => {});
 }
 
 function displayCobrancas(cobrancas) {
@@ -179,8 +371,12 @@ function displayCobrancas(cobrancas) {
         return;
     }
 
-    container.innerHTML = cobrancas.map(cobranca => `
-        <div class="cobranca-item" onclick="showCobrancaModal(${cobranca.id})">
+    container.innerHTML = cobrancas.map(renderCobrancaItem).join('');
+}
+
+function renderCobrancaItem(cobranca) {
+    return `
+        <div class="cobranca-item" data-id="${cobranca.id}" onclick="showCobrancaModal(${cobranca.id})">
             <div class="cobranca-header">
                 <div>
                     <div class="cobranca-title">${cobranca.titulo}</div>
@@ -188,7 +384,7 @@ function displayCobrancas(cobrancas) {
                 </div>
                 <div class="cobranca-valor">R$ ${cobranca.valor.toFixed(2)}</div>
             </div>
-            
+        
             <div class="cobranca-info">
                 <div class="cobranca-info-item">
                     <div class="cobranca-info-label">Cliente</div>
@@ -209,7 +405,7 @@ function displayCobrancas(cobrancas) {
                     <div class="cobranca-info-value">${formatDate(cobranca.data_criacao)}</div>
                 </div>
             </div>
-            
+        
             <div class="cobranca-actions">
                 ${cobranca.payment_url ? `<a href="${cobranca.payment_url}" target="_blank" class="btn btn-success btn-sm">
                     <i class="fas fa-external-link-alt"></i> Pagar
@@ -222,7 +418,7 @@ function displayCobrancas(cobrancas) {
                 </button>
             </div>
         </div>
-    `).join('');
+    `;
 }
 
 function displayPagination(currentPage, totalPages, totalItems) {
@@ -267,124 +463,144 @@ function displayPagination(currentPage, totalPages, totalItems) {
 }
 
 async function showCobrancaModal(cobrancaId) {
+    // Abre na hora com os dados da listagem e revalida o detalhe (304 se nada mudou)
+    const cached = cobrancaIndex.get(cobrancaId);
+    if (cached) {
+        renderCobrancaModal(cached);
+    }
+
     try {
-        const response = await fetch(`${API_BASE_URL}/cobrancas/${cobrancaId}`);
-        const result = await response.json();
+        const result = await fetchJSON(`${API_BASE_URL}/cobrancas/${cobrancaId}`);
 
         if (result.success) {
             const cobranca = result.cobranca;
-            
-            document.getElementById('modal-body').innerHTML = `
-                <div class="cobranca-details">
-                    <div class="detail-section">
-                        <h4><i class="fas fa-info-circle"></i> Informações Gerais</h4>
-                        <div class="detail-grid">
-                            <div class="detail-item">
-                                <strong>ID:</strong> ${cobranca.id}
-                            </div>
-                            <div class="detail-item">
-                                <strong>Referência:</strong> ${cobranca.external_reference}
-                            </div>
-                            <div class="detail-item">
-                                <strong>Mercado Pago ID:</strong> ${cobranca.mercadopago_id || 'N/A'}
-                            </div>
-                            <div class="detail-item">
-                                <strong>Status:</strong> 
-                                <span class="status-badge status-${cobranca.status}">${getStatusText(cobranca.status)}</span>
-                            </div>
-                        </div>
+            cobrancaIndex.set(cobranca.id, cobranca);
+
+            const changed = !cached
+                || cached.status !== cobranca.status
+                || cached.data_atualizacao !== cobranca.data_atualizacao;
+
+            if (changed && (!cached || modalCobrancaId === cobrancaId)) {
+                renderCobrancaModal(cobranca);
+            }
+        } else if (!cached) {
+            showToast(`Erro ao carregar detalhes: ${result.error}`, 'error');
+        }
+    } catch (error) {
+        if (!cached) {
+            showToast(`Erro de conexão: ${error.message}`, 'error');
+        }
+    }
+}
+
+function renderCobrancaModal(cobranca) {
+    modalCobrancaId = cobranca.id;
+
+    document.getElementById('modal-body').innerHTML = `
+        <div class="cobranca-details">
+            <div class="detail-section">
+                <h4><i class="fas fa-info-circle"></i> Informações Gerais</h4>
+                <div class="detail-grid">
+                    <div class="detail-item">
+                        <strong>ID:</strong> ${cobranca.id}
                     </div>
+                    <div class="detail-item">
+                        <strong>Referência:</strong> ${cobranca.external_reference}
+                    </div>
+                    <div class="detail-item">
+                        <strong>Mercado Pago ID:</strong> ${cobranca.mercadopago_id || 'N/A'}
+                    </div>
+                    <div class="detail-item">
+                        <strong>Status:</strong> 
+                        <span class="status-badge status-${cobranca.status}">${getStatusText(cobranca.status)}</span>
+                    </div>
+                </div>
+            </div>
 
-                    <div class="detail-section">
-                        <h4><i class="fas fa-user"></i> Cliente</h4>
-                        <div class="detail-grid">
-                            <div class="detail-item">
-                                <strong>Nome:</strong> ${cobranca.cliente_nome}
-                            </div>
-                            <div class="detail-item">
-                                <strong>Email:</strong> ${cobranca.cliente_email}
-                            </div>
-                            <div class="detail-item">
-                                <strong>Telefone:</strong> ${cobranca.cliente_telefone || 'N/A'}
-                            </div>
-                            <div class="detail-item">
-                                <strong>Documento:</strong> ${cobranca.cliente_documento || 'N/A'}
-                            </div>
-                        </div>
+            <div class="detail-section">
+                <h4><i class="fas fa-user"></i> Cliente</h4>
+                <div class="detail-grid">
+                    <div class="detail-item">
+                        <strong>Nome:</strong> ${cobranca.cliente_nome}
+                    </div>
+                    <div class="detail-item">
+                        <strong>Email:</strong> ${cobranca.cliente_email}
+                    </div>
+                    <div class="detail-item">
+                        <strong>Telefone:</strong> ${cobranca.cliente_telefone || 'N/A'}
                     </div>
+                    <div class="detail-item">
+                        <strong>Documento:</strong> ${cobranca.cliente_documento || 'N/A'}
+                    </div>
+                </div>
+            </div>
 
-                    <div class="detail-section">
-                        <h4><i class="fas fa-shopping-cart"></i> Cobrança</h4>
-                        <div class="detail-grid">
-                            <div class="detail-item">
-                                <strong>Título:</strong> ${cobranca.titulo}
-                            </div>
-                            <div class="detail-item">
-                                <strong>Descrição:</strong> ${cobranca.descricao || 'N/A'}
-                            </div>
-                            <div class="detail-item">
-                                <strong>Valor:</strong> <span style="color: #28a745; font-weight: bold;">R$ ${cobranca.valor.toFixed(2)}</span>
-                            </div>
-                        </div>
+            <div class="detail-section">
+                <h4><i class="fas fa-shopping-cart"></i> Cobrança</h4>
+                <div class="detail-grid">
+                    <div class="detail-item">
+                        <strong>Título:</strong> ${cobranca.titulo}
                     </div>
+                    <div class="detail-item">
+                        <strong>Descrição:</strong> ${cobranca.descricao || 'N/A'}
+                    </div>
+                    <div class="detail-item">
+                        <strong>Valor:</strong> <span style="color: #28a745; font-weight: bold;">R$ ${cobranca.valor.toFixed(2)}</span>
+                    </div>
+                </div>
+            </div>
 
-                    <div class="detail-section">
-                        <h4><i class="fas fa-calendar"></i> Datas</h4>
-                        <div class="detail-grid">
-                            <div class="detail-item">
-                                <strong>Criação:</strong> ${formatDateTime(cobranca.data_criacao)}
-                            </div>
-                            <div class="detail-item">
-                                <strong>Atualização:</strong> ${formatDateTime(cobranca.data_atualizacao)}
-                            </div>
-                            <div class="detail-item">
-                                <strong>Pagamento:</strong> ${cobranca.data_pagamento ? formatDateTime(cobranca.data_pagamento) : 'N/A'}
-                            </div>
-                        </div>
+            <div class="detail-section">
+                <h4><i class="fas fa-calendar"></i> Datas</h4>
+                <div class="detail-grid">
+                    <div class="detail-item">
+                        <strong>Criação:</strong> ${formatDateTime(cobranca.data_criacao)}
+                    </div>
+                    <div class="detail-item">
+                        <strong>Atualização:</strong> ${formatDateTime(cobranca.data_atualizacao)}
                     </div>
+                    <div class="detail-item">
+                        <strong>Pagamento:</strong> ${cobranca.data_pagamento ? formatDateTime(cobranca.data_pagamento) : 'N/A'}
+                    </div>
+                </div>
+            </div>
 
-                    ${cobranca.payment_url ? `
-                        <div class="detail-section">
-                            <h4><i class="fas fa-link"></i> Link de Pagamento</h4>
-                            <div style="margin-top: 1rem;">
-                                <a href="${cobranca.payment_url}" target="_blank" class="btn btn-success">
-                                    <i class="fas fa-external-link-alt"></i> Abrir Link de Pagamento
-                                </a>
-                            </div>
-                        </div>
-                    ` : ''}
+            ${cobranca.payment_url ? `
+                <div class="detail-section">
+                    <h4><i class="fas fa-link"></i> Link de Pagamento</h4>
+                    <div style="margin-top: 1rem;">
+                        <a href="${cobranca.payment_url}" target="_blank" class="btn btn-success">
+                            <i class="fas fa-external-link-alt"></i> Abrir Link de Pagamento
+                        </a>
+                    </div>
                 </div>
+            ` : ''}
+        </div>
 
-                <style>
-                    .cobranca-details { }
-                    .detail-section { margin-bottom: 2rem; }
-                    .detail-section h4 { 
-                        color: #667eea; 
-                        margin-bottom: 1rem; 
-                        display: flex; 
-                        align-items: center; 
-                        gap: 0.5rem; 
-                    }
-                    .detail-grid { 
-                        display: grid; 
-                        grid-template-columns: repeat(auto-fit, minmax(250px, 1fr)); 
-                        gap: 1rem; 
-                    }
-                    .detail-item { 
-                        padding: 0.75rem; 
-                        background: #f8f9fa; 
-                        border-radius: 5px; 
-                    }
-                </style>
-            `;
-
-            document.getElementById('modal-detalhes').style.display = 'block';
-        } else {
-            showToast(`Erro ao carregar detalhes: ${result.error}`, 'error');
-        }
-    } catch (error) {
-        showToast(`Erro de conexão: ${error.message}`, 'error');
-    }
+        <style>
+            .cobranca-details { }
+            .detail-section { margin-bottom: 2rem; }
+            .detail-section h4 { 
+                color: #667eea; 
+                margin-bottom: 1rem; 
+                display: flex; 
+                align-items: center; 
+                gap: 0.5rem; 
+            }
+            .detail-grid { 
+                display: grid; 
+                grid-template-columns: repeat(auto-fit, minmax(250px, 1fr)); 
+                gap: 1rem; 
+            }
+            .detail-item { 
+                padding: 0.75rem; 
+                background: #f8f9fa; 
+                border-radius: 5px; 
+            }
+        </style>
+    `;
+
+    document.getElementById('modal-detalhes').style.display = 'block';
 }
 
 function showCobrancaDetails(cobrancaData) {
@@ -406,6 +622,7 @@ function showCobrancaDetails(cobrancaData) {
         </div>
     `;
     
+    modalCobrancaId = null;
     document.getElementById('modal-body').innerHTML = details;
     document.getElementById('modal-detalhes').style.display = 'block';
 }
@@ -428,7 +645,107 @@ async function reenviarEmail(cobrancaId) {
     }
 }
 
+// Atualizações em tempo real (Server-Sent Events)
+function connectEventos() {
+    if (!window.EventSource) {
+        return;
+    }
+
+    // O navegador reconecta sozinho, enviando Last-Event-ID para retomar;
+    // uma conexão nova (depois de recusada) retoma pelo parâmetro last_event_id
+    const url = lastEventoId
+        ? `${API_BASE_URL}/eventos?last_event_id=${encodeURIComponent(lastEventoId)}`
+        : `${API_BASE_URL}/eventos`;
+    const source = new EventSource(url);
+
+    function on(tipo, handler) {
+        source.addEventListener(tipo, function(e) {
+            if (e.lastEventId) {
+                lastEventoId = e.lastEventId;
+            }
+            handler(e);
+        });
+    }
+
+    on('cobranca_criada', function(e) {
+        handleCobrancaCriada(JSON.parse(e.data));
+    });
+
+    on('cobranca_status', function(e) {
+        handleCobrancaStatus(JSON.parse(e.data));
+    });
+
+    on('cobranca_status_lote', function(e) {
+        const lote = JSON.parse(e.data);
+        lote.ids.forEach(id => handleCobrancaStatus({ ...lote, id, ids: undefined }));
+    });
+
+    on('reset', function() {
+        apiCache.clear();
+        loadCobrancas(currentPage);
+    });
+
+    // Servidor recusou a conexão (limite de streams por processo): o navegador
+    // não tenta de novo depois de uma resposta de erro, então reconecta aqui
+    source.onerror = function() {
+        if (source.readyState === EventSource.CLOSED) {
+            setTimeout(connectEventos, EVENTOS_RECONNECT_MS);
+        }
+    };
+}
+
+function handleCobrancaCriada(cobranca) {
+    invalidateListCache();
+    cobrancaIndex.set(cobranca.id, cobranca);
+
+    // Só a primeira página (mais recentes) recebe cobranças novas
+    if (currentPage !== 1 || (currentFilter && currentFilter !== cobranca.status)) {
+        return;
+    }
+
+    const container = document.getElementById('cobrancas-container');
+    if (container.querySelector(`.cobranca-item[data-id="${cobranca.id}"]`)) {
+        return;
+    }
+
+    if (!container.querySelector('.cobranca-item')) {
+        container.innerHTML = '';
+    }
+
+    container.insertAdjacentHTML('afterbegin', renderCobrancaItem(cobranca));
+
+    // Mantém o tamanho da página
+    const items = container.querySelectorAll('.cobranca-item');
+    if (items.length > PER_PAGE) {
+        items[items.length - 1].remove();
+    }
+}
+
+function handleCobrancaStatus(evento) {
+    invalidateListCache();
+
+    const cached = cobrancaIndex.get(evento.id);
+    if (cached) {
+        cobrancaIndex.set(evento.id, { ...cached, ...evento });
+    }
+
+    const item = document.querySelector(`.cobranca-item[data-id="${evento.id}"]`);
+    if (!item) {
+        return;
+    }
+
+    if (currentFilter && currentFilter !== evento.status) {
+        item.remove();
+        return;
+    }
+
+    const badge = item.querySelector('.status-badge');
+    badge.className = `status-badge status-${evento.status}`;
+    badge.textContent = getStatusText(evento.status);
+}
+
 function closeModal() {
+    modalCobrancaId = null;
     document.getElementById('modal-detalhes').style.display = 'none';
 }
 
@@ -471,7 +788,8 @@ function getStatusText(status) {
         approved: 'Aprovado',
         rejected: 'Rejeitado',
         cancelled: 'Cancelado',
-        in_process: 'Processando'
+        in_process: 'Processando',
+        expired: 'Expirado'
     };
     return statusMap[status] || status;
 }
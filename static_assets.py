@@ -0,0 +1,147 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import threading
+from collections import namedtuple
+from flask import Response, request
+
+Asset = namedtuple('Asset', ['conteudo', 'conteudo_gzip', 'etag', 'content_type', 'imutavel'])
+
+class StaticAssets:
+    """
+    Cache em memória dos arquivos estáticos do frontend
+
+    Na primeira requisição todos os arquivos da pasta estática são lidos uma
+    única vez: JS e CSS recebem um nome com o hash do conteúdo
+    (script.<hash>.js), o index.html é reescrito para apontar para esses nomes
+    e tudo que for compressível é pré-comprimido em gzip. As requisições
+    seguintes apenas entregam bytes já prontos, com ETag e 304.
+    """
+
+    EXTENSOES_FINGERPRINT = {'.js', '.css'}
+    EXTENSOES_COMPRESSIVEIS = {'.html', '.js', '.css', '.json', '.svg', '.txt', '.map'}
+    TAMANHO_MINIMO_GZIP = 256
+
+    CACHE_IMUTAVEL = 'public, max-age=31536000, immutable'
+    CACHE_REVALIDAR = 'no-cache'
+
+    def __init__(self, static_folder, index='index.html'):
+        self.static_folder = static_folder
+        self.index = index
+        self._assets = None
+        self._lock = threading.Lock()
+
+    def build(self):
+        """
+        Lê, gera fingerprint e comprime todos os arquivos da pasta estática
+
+        Returns:
+            dict: Mapa caminho -> Asset
+        """
+        arquivos = {}
+        for raiz, _, nomes in os.walk(self.static_folder):
+            for nome in nomes:
+                caminho = os.path.join(raiz, nome)
+                relativo = os.path.relpath(caminho, self.static_folder).replace(os.sep, '/')
+                with open(caminho, 'rb') as f:
+                    arquivos[relativo] = f.read()
+
+        assets = {}
+        fingerprints = {}
+
+        for relativo, conteudo in arquivos.items():
+            if relativo == self.index:
+                continue
+
+            base, ext = os.path.splitext(relativo)
+            assets[relativo] = self._criar_asset(relativo, conteudo, imutavel=False)
+
+            if ext in self.EXTENSOES_FINGERPRINT:
+                digest = hashlib.sha256(conteudo).hexdigest()[:12]
+                nome_fingerprint = f'{base}.{digest}{ext}'
+                fingerprints[relativo] = nome_fingerprint
+                assets[nome_fingerprint] = self._criar_asset(relativo, conteudo, imutavel=True)
+
+        if self.index in arquivos:
+            index_html = self._reescrever_referencias(arquivos[self.index], fingerprints)
+            assets[self.index] = self._criar_asset(self.index, index_html, imutavel=False)
+
+        return assets
+
+    def _criar_asset(self, relativo, conteudo, imutavel):
+        _, ext = os.path.splitext(relativo)
+        mimetype = mimetypes.guess_type(relativo)[0] or 'application/octet-stream'
+        if mimetype.startswith('text/') or mimetype in ('application/javascript', 'text/javascript'):
+            mimetype = f'{mimetype}; charset=utf-8'
+
+        conteudo_gzip = None
+        if ext in self.EXTENSOES_COMPRESSIVEIS and len(conteudo) >= self.TAMANHO_MINIMO_GZIP:
+            comprimido = gzip.compress(conteudo, compresslevel=9, mtime=0)
+            if len(comprimido) < len(conteudo):
+                conteudo_gzip = comprimido
+
+        return Asset(
+            conteudo=conteudo,
+            conteudo_gzip=conteudo_gzip,
+            etag=hashlib.sha256(conteudo).hexdigest()[:20],
+            content_type=mimetype,
+            imutavel=imutavel
+        )
+
+    def _reescrever_referencias(self, html, fingerprints):
+        """Troca src/href locais do HTML pelos nomes com fingerprint"""
+        def substituir(match):
+            alvo = match.group(2).decode('utf-8')
+            novo = fingerprints.get(alvo.removeprefix('./').removeprefix('/'), alvo)
+            return match.group(1) + b'="' + novo.encode('utf-8') + b'"'
+
+        return re.sub(rb'(src|href)="([^"]+)"', substituir, html)
+
+    def get(self, path, recarregar=False):
+        """
+        Obtém um asset pelo caminho
+
+        Args:
+            path (str): Caminho relativo à pasta estática
+            recarregar (bool): Relê a pasta (útil em modo debug)
+
+        Returns:
+            Asset: Asset encontrado ou None
+        """
+        if self._assets is None or recarregar:
+            with self._lock:
+                if self._assets is None or recarregar:
+                    self._assets = self.build()
+        return self._assets.get(path)
+
+    def response(self, asset):
+        """
+        Monta a resposta HTTP do asset, respeitando If-None-Match e Accept-Encoding
+
+        Args:
+            asset (Asset): Asset a ser entregue
+
+        Returns:
+            Response: Resposta 200 ou 304
+        """
+        usar_gzip = asset.conteudo_gzip is not None and request.accept_encodings['gzip'] > 0
+        etag = f'{asset.etag}-gz' if usar_gzip else asset.etag
+
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            response = Response(
+                asset.conteudo_gzip if usar_gzip else asset.conteudo,
+                content_type=asset.content_type
+            )
+            if usar_gzip:
+                response.headers['Content-Encoding'] = 'gzip'
+
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = self.CACHE_IMUTAVEL if asset.imutavel else self.CACHE_REVALIDAR
+        if asset.conteudo_gzip is not None:
+            response.headers['Vary'] = 'Accept-Encoding'
+
+        return response
@@ -0,0 +1,17 @@
+def test_sem_admin_token_rotas_fechadas(client, monkeypatch):
+    monkeypatch.delenv('ADMIN_TOKEN')
+    monkeypatch.delenv('ADMIN_INSECURE', raising=False)
+
+    response = client.get('/api/admin/outbox')
+    assert response.status_code == 401
+    assert response.json['success'] is False
+
+def test_admin_insecure_libera_sem_token(client, monkeypatch):
+    monkeypatch.delenv('ADMIN_TOKEN')
+    monkeypatch.setenv('ADMIN_INSECURE', '1')
+
+    assert client.get('/api/admin/outbox').status_code == 200
+
+def test_token_errado_e_certo(client):
+    assert client.get('/api/admin/outbox', headers={'X-Admin-Token': 'outro'}).status_code == 401
+    assert client.get('/api/admin/outbox', headers={'X-Admin-Token': 'token-de-teste'}).status_code == 200
@@ -0,0 +1,116 @@
+import sqlite3
+from datetime import datetime
+
+import pytest
+
+ANTIGA = datetime(2020, 1, 15)
+
+@pytest.fixture
+def servico(app):
+    from src.services.arquivo_service import get_arquivo_service
+    return get_arquivo_service()
+
+def _email(app, cobranca_id, status):
+    from src.models.cobranca import EmailOutbox, LembreteCobranca, db
+    with app.app_context():
+        email = EmailOutbox(
+            cobranca_id=cobranca_id, tipo='lembrete', destinatario='maria@exemplo.com.br',
+            assunto='Lembrete', corpo_html='<p>oi</p>', status=status
+        )
+        db.session.add(email)
+        db.session.flush()
+        db.session.add(LembreteCobranca(
+            cobranca_id=cobranca_id, faixa='d-3', destinatario='maria@exemplo.com.br', outbox_id=email.id
+        ))
+        db.session.commit()
+
+def _contar(app, tabela, cobranca_id):
+    with app.app_context():
+        from src.models.cobranca import db
+        return db.session.execute(
+            db.text(f'SELECT count(*) FROM {tabela} WHERE cobranca_id = :id'), {'id': cobranca_id}
+        ).scalar()
+
+def test_arquivamento_leva_emails_e_lembretes(app, servico, nova_cobranca):
+    arquivada = nova_cobranca(status='approved', data_criacao=ANTIGA, data_atualizacao=ANTIGA)
+    recente = nova_cobranca(status='approved')
+    _email(app, arquivada, 'sent')
+
+    from src.models.cobranca import CobrancaPayload, db
+    with app.app_context():
+        db.session.add(CobrancaPayload(cobranca_id=arquivada, dados=CobrancaPayload.comprimir({'id': 5})))
+        db.session.commit()
+
+    with app.app_context():
+        resultado = servico.arquivar()
+        assert resultado['arquivadas'] == 1
+        assert servico.obter(arquivada)['arquivada'] is True
+        assert servico.obter(arquivada)['dados_mercadopago'] == {'id': 5}
+        assert servico.obter_cobranca(recente)['arquivada'] is False
+
+    for tabela in ('email_outbox', 'lembretes_cobranca'):
+        assert _contar(app, tabela, arquivada) == 0
+
+    arquivo = sqlite3.connect(servico.caminho_periodo('2020-01'))
+    assert arquivo.execute('SELECT count(*) FROM email_outbox WHERE cobranca_id = ?', (arquivada,)).fetchone() == (1,)
+    assert arquivo.execute('SELECT count(*) FROM lembretes_cobranca WHERE cobranca_id = ?', (arquivada,)).fetchone() == (1,)
+
+def test_cobranca_com_email_pendente_espera(app, servico, nova_cobranca):
+    cobranca_id = nova_cobranca(status='approved', data_criacao=ANTIGA, data_atualizacao=ANTIGA)
+    _email(app, cobranca_id, 'pending')
+
+    with app.app_context():
+        assert servico.arquivar()['arquivadas'] == 0
+        assert servico.obter_cobranca(cobranca_id)['arquivada'] is False
+    assert _contar(app, 'email_outbox', cobranca_id) == 1
+
+def test_backup_recopia_mes_que_recebeu_cobrancas_atrasadas(app, servico, nova_cobranca, tmp_path):
+    import os
+    from src.models.cobranca import EmailOutbox, db
+    from src.services.backup_service import get_backup_service
+    backup = get_backup_service()
+    backup.backup_dir = str(tmp_path / 'backups')
+    copia = os.path.join(backup.backup_dir, 'arquivo', 'cobrancas_2020_01.db')
+
+    nova_cobranca(status='approved', data_criacao=ANTIGA, data_atualizacao=ANTIGA)
+    atrasada = nova_cobranca(status='approved', data_criacao=ANTIGA, data_atualizacao=ANTIGA)
+    _email(app, atrasada, 'pending')
+
+    with app.app_context():
+        assert servico.arquivar()['arquivadas'] == 1
+        assert copia in backup.backup_arquivos()
+        assert backup.backup_arquivos() == []
+
+        # Só o mtime mudou: nada a copiar
+        os.utime(servico.caminho_periodo('2020-01'))
+        assert copia not in backup.backup_arquivos()
+
+        # O email saiu da outbox: a cobrança entra no mesmo mês já arquivado
+        EmailOutbox.query.filter_by(cobranca_id=atrasada).update({'status': 'sent'})
+        db.session.commit()
+        assert servico.arquivar()['arquivadas'] == 1
+        assert copia in backup.backup_arquivos()
+
+    assert sqlite3.connect(copia).execute('SELECT count(*) FROM cobrancas').fetchone() == (2,)
+
+def test_historico_do_cliente_com_arquivadas(app, servico, nova_cobranca):
+    from src.models.cobranca import Cobranca, db
+    from src.services.cliente_service import get_cliente_service
+    arquivada = nova_cobranca(status='approved', valor=30.0, data_criacao=ANTIGA, data_atualizacao=ANTIGA)
+    recente = nova_cobranca(status='pending', valor=5.0)
+
+    with app.app_context():
+        cliente_id = db.session.get(Cobranca, recente).cliente_id
+        servico.arquivar()
+
+        so_banco = get_cliente_service().historico(cliente_id)
+        assert so_banco['totais']['quantidade'] == 1
+        assert [item['id'] for item in so_banco['cobrancas']] == [recente]
+
+        completo = get_cliente_service().historico(cliente_id, incluir_arquivo=True)
+        assert completo['totais']['valor_pago'] == 30.0
+        assert completo['total'] == 2
+        assert [(item['id'], item['arquivada']) for item in completo['cobrancas']] == [(recente, False), (arquivada, True)]
+
+        pagina = get_cliente_service().historico(cliente_id, limite=1, offset=1, incluir_arquivo=True)
+        assert [item['id'] for item in pagina['cobrancas']] == [arquivada]
@@ -0,0 +1,136 @@
+import os
+
+import pytest
+
+@pytest.fixture
+def servico(app, tmp_path):
+    from src.services.backup_service import get_backup_service
+    servico = get_backup_service()
+    servico.backup_dir = str(tmp_path / 'backups')
+    return servico
+
+@pytest.mark.parametrize('comprimir', [True, False])
+def test_snapshot_e_restauracao(app, servico, nova_cobranca, comprimir):
+    from src.models.cobranca import Cobranca
+    nova_cobranca()
+    nova_cobranca()
+
+    with app.app_context():
+        snapshot = servico.criar_snapshot(comprimir=comprimir)
+        assert sorted(os.listdir(servico.backup_dir)) == sorted([
+            os.path.basename(snapshot['backup_file']), os.path.basename(snapshot['backup_file']) + '.sha256'
+        ])
+        assert [item['filepath'] for item in servico.list_backup_files()] == [snapshot['backup_file']]
+
+    nova_cobranca()
+    with app.app_context():
+        resultado = servico.restaurar_snapshot(snapshot['backup_file'])
+        assert resultado['success'], resultado
+        assert resultado['total_cobrancas'] == Cobranca.query.count() == 2
+
+    # Nenhum temporário da restauração fica ao lado do banco
+    pasta_banco = os.path.dirname(app.config['SQLALCHEMY_DATABASE_URI'][len('sqlite:///'):])
+    assert not [nome for nome in os.listdir(pasta_banco) if nome.endswith('.tmp')]
+
+def test_restauracao_sem_sha256_e_recusada(app, servico, nova_cobranca):
+    nova_cobranca()
+    with app.app_context():
+        snapshot = servico.criar_snapshot()
+        os.remove(snapshot['backup_file'] + '.sha256')
+
+        resultado = servico.restaurar_snapshot(snapshot['backup_file'])
+
+    assert resultado['success'] is False
+    assert '.sha256' in resultado['error']
+
+def test_restauracao_com_checksum_divergente_e_recusada(app, servico, nova_cobranca):
+    nova_cobranca()
+    with app.app_context():
+        snapshot = servico.criar_snapshot(comprimir=False)
+        with open(snapshot['backup_file'], 'ab') as f:
+            f.write(b'x')
+
+        resultado = servico.restaurar_snapshot(snapshot['backup_file'])
+
+    assert resultado == {'success': False, 'error': 'Checksum do snapshot não confere'}
+
+@pytest.fixture
+def store(servico):
+    from src.services.backup_store_service import BackupStore
+    return BackupStore(servico.backup_dir)
+
+def test_store_incremental_e_restauracao(app, store, nova_cobranca):
+    from src.models.cobranca import Cobranca, CobrancaPayload, db
+    primeira = nova_cobranca(cliente_documento='111.222.333-44')
+    nova_cobranca()
+
+    with app.app_context():
+        db.session.add(CobrancaPayload(cobranca_id=primeira, dados=CobrancaPayload.comprimir({'id': 9})))
+        db.session.commit()
+        completo = store.criar_backup()
+        repetido = store.criar_backup()
+        assert (completo['linhas_alteradas'], repetido['linhas_alteradas']) == (2, 0)
+        assert repetido['objetos_novos'] == 0
+
+        original = db.session.get(Cobranca, primeira).to_dict()
+        Cobranca.query.delete()
+        CobrancaPayload.query.delete()
+        db.session.commit()
+
+        resultado = store.restaurar(completo['manifest'])
+        assert (resultado['restored_count'], resultado['skipped_count']) == (2, 0)
+
+        restaurada = db.session.get(Cobranca, primeira)
+        assert restaurada.to_dict() == original
+        assert db.session.get(CobrancaPayload, primeira).descomprimir() == {'id': 9}
+
+def test_store_detecta_escritas_que_preservam_data_atualizacao(app, store, nova_cobranca):
+    from src.models.cobranca import Cobranca, CobrancaPayload, db
+    primeira = nova_cobranca()
+    segunda = nova_cobranca()
+
+    with app.app_context():
+        store.criar_backup()
+
+        # Como nas migrações e no vínculo de clientes: data_atualizacao mantida
+        db.session.execute(
+            db.update(Cobranca).where(Cobranca.id == primeira)
+            .values(mp_taxas=1.5, data_atualizacao=Cobranca.data_atualizacao)
+        )
+        db.session.execute(CobrancaPayload.__table__.insert(), [
+            {'cobranca_id': segunda, 'dados': CobrancaPayload.comprimir({'id': 7})}
+        ])
+        db.session.commit()
+
+        resultado = store.criar_backup()
+        assert resultado['linhas_alteradas'] == 2
+
+        linhas = {linha['id']: linha for linha in store.materializar(resultado['manifest'])}
+        assert linhas[primeira]['mp_taxas'] == 1.5
+        assert linhas[segunda]['dados_mercadopago'] == {'id': 7}
+
+def test_coleta_de_lixo_espera_backup_em_andamento(app, store):
+    import threading
+
+    with app.app_context():
+        store.criar_backup()
+
+    with store._bloqueio():
+        coleta = threading.Thread(target=store.coletar_lixo, args=(1,))
+        coleta.start()
+        coleta.join(0.3)
+        assert coleta.is_alive()
+
+    coleta.join(5)
+    assert not coleta.is_alive()
+
+@pytest.mark.parametrize('manter', [0, -1, '3', True])
+def test_coleta_de_lixo_exige_manter_positivo(app, client, store, manter):
+    with app.app_context():
+        store.criar_backup()
+        with pytest.raises(ValueError):
+            store.coletar_lixo(manter)
+        assert len(store.listar_manifestos()) == 1
+
+    resposta = client.post('/api/backup/store/gc', json={'manter': manter}, headers={'X-Admin-Token': 'token-de-teste'})
+    assert resposta.status_code == 400
@@ -0,0 +1,55 @@
+import threading
+
+def _criar(client, nome):
+    return client.post('/api/cobrancas', json={
+        'cliente_nome': nome, 'cliente_email': 'joao@exemplo.com.br', 'cliente_documento': '123.456.789-09',
+        'titulo': 'Plano', 'valor': 30
+    })
+
+def test_cobrancas_do_mesmo_documento_compartilham_o_cliente(app, client):
+    from src.models.cobranca import Cliente, Cobranca
+    assert _criar(client, 'João').status_code == 201
+    assert _criar(client, 'João Souza').status_code == 201
+
+    with app.app_context():
+        assert Cliente.query.count() == 1
+        assert {cobranca.cliente_id for cobranca in Cobranca.query} == {Cliente.query.one().id}
+
+def test_cobranca_nova_atualiza_nome_e_telefone_do_cliente(app, nova_cobranca):
+    from src.models.cobranca import Cliente
+    nova_cobranca(cliente_nome='Maria')
+    nova_cobranca(cliente_nome='Maria Silva', cliente_telefone='11 99999-0000')
+    nova_cobranca(cliente_nome='Maria Silva Souza')
+
+    with app.app_context():
+        cliente = Cliente.query.one()
+        # Telefone vazio na cobrança não apaga o já conhecido
+        assert (cliente.nome, cliente.sobrenome, cliente.telefone) == ('Maria Silva Souza', 'Silva Souza', '11 99999-0000')
+
+def test_criacoes_simultaneas_nao_duplicam_o_cliente(app, monkeypatch):
+    from src.models.cobranca import Cliente, Cobranca
+    identificar = Cliente.identificar
+    barreira = threading.Barrier(2, timeout=10)
+
+    # As duas requisições consultam a chave antes de qualquer uma inserir
+    def identificar_junto(*args, **kwargs):
+        dados = identificar(*args, **kwargs)
+        barreira.wait()
+        return dados
+
+    monkeypatch.setattr(Cliente, 'identificar', staticmethod(identificar_junto))
+
+    respostas = []
+    def criar(nome):
+        respostas.append(_criar(app.test_client(), nome).status_code)
+
+    threads = [threading.Thread(target=criar, args=(nome,)) for nome in ('A', 'B')]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert respostas == [201, 201]
+    with app.app_context():
+        assert Cliente.query.count() == 1
+        assert Cobranca.query.filter(Cobranca.cliente_id.is_(None)).count() == 0
@@ -0,0 +1,43 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+@pytest.fixture
+def sem_smtp(monkeypatch):
+    """Falha o teste se alguém tentar falar com o servidor SMTP fora do worker"""
+    from src.services.email_service import EmailService
+
+    def proibido(*args, **kwargs):
+        raise AssertionError('SMTP chamado fora da outbox')
+
+    monkeypatch.setattr(EmailService, 'conectar', proibido)
+    monkeypatch.setattr(EmailService, 'enviar_email', proibido)
+
+def test_lembretes_vao_para_a_outbox(app, nova_cobranca, sem_smtp):
+    from src.models.cobranca import EmailOutbox
+    from src.services.lembrete_service import get_lembrete_service
+    agora = datetime.utcnow()
+    cobranca_id = nova_cobranca(payment_url='https://mp/pagar', data_vencimento=agora + timedelta(days=2))
+
+    with app.app_context():
+        assert get_lembrete_service().executar(agora=agora)['enfileirados'] == 1
+        item = EmailOutbox.query.one()
+        assert (item.cobranca_id, item.tipo, item.status) == (cobranca_id, 'lembrete', 'pending')
+
+def test_email_de_cobranca_e_confirmacao_enfileirados(app, nova_cobranca, sem_smtp):
+    from src.models.cobranca import Cobranca, EmailOutbox, db
+    from src.services.email_service import get_email_service
+    cobranca_id = nova_cobranca(payment_url='https://mp/pagar')
+
+    with app.app_context():
+        cobranca = db.session.get(Cobranca, cobranca_id)
+        get_email_service().enfileirar_email_cobranca(cobranca)
+        get_email_service().enfileirar_email_confirmacao(cobranca, {'id': 1, 'date_approved': '2026-01-01'})
+        db.session.commit()
+
+        itens = EmailOutbox.query.order_by(EmailOutbox.id).all()
+        assert [(item.tipo, item.destinatario, item.cobranca_id) for item in itens] == [
+            ('cobranca', 'maria@exemplo.com.br', cobranca_id),
+            ('confirmacao_pagamento', 'maria@exemplo.com.br', cobranca_id)
+        ]
+        assert 'https://mp/pagar' in itens[0].corpo_html
@@ -0,0 +1,111 @@
+import queue
+
+import pytest
+
+@pytest.fixture
+def broker(app):
+    from src.services.eventos_service import get_event_broker
+    broker = get_event_broker()
+    broker.intervalo = 0.05
+    return broker
+
+def _outro_processo(app):
+    """Broker independente sobre o mesmo banco, como o de outro processo"""
+    from src.services.eventos_service import EventBroker
+    outro = EventBroker(intervalo=0.05)
+    outro.init_app(app)
+    return outro
+
+def _proximo(assinatura):
+    return assinatura.get(timeout=5)
+
+def test_evento_gravado_em_um_processo_chega_ao_outro(app, broker, nova_cobranca):
+    outro = _outro_processo(app)
+    assinatura = outro.assinar()
+
+    cobranca_id = nova_cobranca()
+
+    evento_id, tipo, dados = _proximo(assinatura)
+    assert (tipo, dados['id']) == ('cobranca_criada', cobranca_id)
+
+    with app.app_context():
+        broker.publicar('cobranca_status_lote', {'ids': [cobranca_id], 'status': 'expired'})
+    assert _proximo(assinatura)[1:] == ('cobranca_status_lote', {'ids': [cobranca_id], 'status': 'expired'})
+    outro.cancelar(assinatura)
+
+def test_rollback_nao_publica(app, broker):
+    from src.models.cobranca import Cobranca, EventoCobranca, db
+    with app.app_context():
+        db.session.add(Cobranca(
+            external_reference='R', cliente_nome='Ana', cliente_email='ana@x.com', titulo='T', valor=1
+        ))
+        db.session.flush()
+        db.session.rollback()
+        assert EventoCobranca.query.count() == 0
+
+def test_retomada_pelo_last_event_id(app, broker, nova_cobranca):
+    from src.models.cobranca import EventoCobranca
+    nova_cobranca()
+    with app.app_context():
+        ultimo_recebido = EventoCobranca.query.one().id
+
+    segunda = nova_cobranca()
+    terceira = nova_cobranca()
+
+    # Cliente reconecta em outro processo com o último id que recebeu
+    outro = _outro_processo(app)
+    retomada = outro.assinar(str(ultimo_recebido))
+
+    assert [_proximo(retomada)[2]['id'] for _ in range(2)] == [segunda, terceira]
+    assert retomada.empty()
+    outro.cancelar(retomada)
+
+@pytest.mark.parametrize('ultimo', ['abc-12', '999999'])
+def test_last_event_id_desconhecido_gera_reset(app, broker, nova_cobranca, ultimo):
+    nova_cobranca()
+    assinatura = broker.assinar(ultimo)
+    assert _proximo(assinatura)[1] == 'reset'
+    broker.cancelar(assinatura)
+
+def test_eventos_removidos_pela_limpeza_geram_reset(app, broker, nova_cobranca, monkeypatch):
+    from datetime import timedelta
+    nova_cobranca()
+    nova_cobranca()
+    monkeypatch.setattr(broker, 'retencao', timedelta(seconds=-1))
+    with app.app_context():
+        assert broker.limpar() == 2
+
+    assinatura = broker.assinar('1')
+    assert _proximo(assinatura)[1] == 'reset'
+    broker.cancelar(assinatura)
+
+def test_limite_de_conexoes_por_processo(app, client, broker, monkeypatch):
+    monkeypatch.setattr(broker, 'max_conexoes', 1)
+    assinatura = broker.assinar()
+
+    resposta = client.get('/api/eventos')
+
+    assert resposta.status_code == 503
+    assert resposta.headers['Retry-After'] == '30'
+    broker.cancelar(assinatura)
+    with pytest.raises(queue.Empty):
+        assinatura.get_nowait()
+
+def test_restauracao_publica_um_unico_reset(app, tmp_path):
+    import json
+    from src.models.cobranca import EventoCobranca, db
+    from src.services.backup_service import get_backup_service
+
+    arquivo = tmp_path / 'backup.json'
+    arquivo.write_text(json.dumps({'cobrancas': [
+        {
+            'external_reference': f'REST-{i}', 'cliente_nome': 'Ana', 'cliente_email': 'ana@x.com',
+            'titulo': 'Mensalidade', 'valor': 10.0, 'status': 'pending'
+        }
+        for i in range(3)
+    ]}))
+
+    with app.app_context():
+        resultado = get_backup_service().restore_from_json(str(arquivo))
+        assert resultado['restored_count'] == 3
+        assert db.session.execute(db.select(EventoCobranca.tipo)).scalars().all() == ['reset']
@@ -0,0 +1,29 @@
+import csv
+import io
+
+def _linhas(client):
+    resposta = client.get('/api/cobrancas/export.csv')
+    assert resposta.status_code == 200
+    return list(csv.reader(io.StringIO(resposta.get_data(as_text=True).lstrip('﻿')), delimiter=';'))
+
+def test_celulas_com_formula_sao_escapadas(client, nova_cobranca):
+    nova_cobranca(cliente_nome='=HYPERLINK("http://x","clique")', titulo='+1+1', cliente_documento='-2', valor=10.5)
+    nova_cobranca(cliente_nome='@SUM(A1)', titulo='\tTab', external_reference='\rREF')
+
+    cabecalho, *linhas = _linhas(client)
+    colunas = {nome: indice for indice, nome in enumerate(cabecalho)}
+
+    assert [linha[colunas['cliente_nome']] for linha in linhas] == ["'=HYPERLINK(\"http://x\",\"clique\")", "'@SUM(A1)"]
+    assert [linha[colunas['titulo']] for linha in linhas] == ["'+1+1", "'\tTab"]
+    assert linhas[0][colunas['cliente_documento']] == "'-2"
+    assert linhas[1][colunas['external_reference']] == "'\rREF"
+
+def test_texto_comum_e_numeros_nao_mudam(client, nova_cobranca):
+    nova_cobranca(cliente_nome='Maria Silva', valor=-3.5)
+
+    cabecalho, linha = _linhas(client)
+    colunas = {nome: indice for indice, nome in enumerate(cabecalho)}
+
+    assert linha[colunas['cliente_nome']] == 'Maria Silva'
+    assert linha[colunas['valor']] == '-3,50'
+    assert linha[colunas['mercadopago_id']] == ''
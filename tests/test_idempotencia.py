@@ -0,0 +1,102 @@
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+CORPO = {'cliente_nome': 'Ana', 'cliente_email': 'ana@exemplo.com.br', 'titulo': 'Plano', 'valor': 50}
+
+@pytest.fixture
+def chamadas():
+    from src.routes.cobranca import chamadas_criacao
+    chamadas_criacao.clear()
+    return chamadas_criacao
+
+def _criar(client, chave, corpo=CORPO):
+    return client.post('/api/cobrancas', json=corpo, headers={'Idempotency-Key': chave})
+
+def _registro(app, chave):
+    from src.models.cobranca import RequisicaoIdempotente, db
+    with app.app_context():
+        return db.session.get(RequisicaoIdempotente, chave)
+
+def test_repeticao_recebe_a_resposta_guardada(client, chamadas):
+    primeira = _criar(client, 'k1')
+    segunda = _criar(client, 'k1')
+
+    assert primeira.status_code == segunda.status_code == 201
+    assert segunda.get_json() == primeira.get_json()
+    assert segunda.headers['Idempotent-Replayed'] == 'true'
+    assert chamadas == ['k1']
+
+def test_mesma_chave_com_outro_corpo_e_recusada(client, chamadas):
+    _criar(client, 'k2')
+    resposta = _criar(client, 'k2', dict(CORPO, valor=99))
+
+    assert resposta.status_code == 422
+    assert chamadas == ['k2']
+
+def test_chave_em_processamento_responde_409(app, client, chamadas, monkeypatch):
+    from src.services.idempotencia_service import get_idempotencia_service
+    monkeypatch.setattr(get_idempotencia_service(), 'espera', 0.3)
+
+    from src.models.cobranca import RequisicaoIdempotente, db
+    primeira = _criar(client, 'k3')
+    with app.app_context():
+        # Outra requisição ainda com a reserva
+        registro = db.session.get(RequisicaoIdempotente, 'k3')
+        registro.status, registro.dono = 'processando', 'outro'
+        registro.expira_em = datetime.utcnow() + timedelta(minutes=1)
+        db.session.commit()
+
+    resposta = _criar(client, 'k3')
+    assert primeira.status_code == 201
+    assert resposta.status_code == 409
+    assert resposta.headers['Retry-After'] == '1'
+
+def test_resposta_vencida_libera_a_chave(app, client, chamadas):
+    from src.models.cobranca import RequisicaoIdempotente, db
+    _criar(client, 'k4')
+    with app.app_context():
+        db.session.get(RequisicaoIdempotente, 'k4').expira_em = datetime.utcnow() - timedelta(seconds=1)
+        db.session.commit()
+
+    resposta = _criar(client, 'k4')
+
+    assert 'Idempotent-Replayed' not in resposta.headers
+    assert chamadas == ['k4', 'k4']
+
+def test_reserva_assumida_por_outra_requisicao_nao_e_sobrescrita(app):
+    from src.services.idempotencia_service import get_idempotencia_service
+    from src.models.cobranca import RequisicaoIdempotente, db
+    servico = get_idempotencia_service()
+
+    with app.test_request_context('/api/cobrancas', method='POST', json=CORPO, headers={'Idempotency-Key': 'k5'}):
+        app.preprocess_request()
+        assert _registro(app, 'k5').status == 'processando'
+
+        # A reserva venceu e outra requisição assumiu a chave
+        with app.app_context():
+            db.session.get(RequisicaoIdempotente, 'k5').dono = 'outra'
+            db.session.commit()
+
+        response = app.make_response(({'success': True}, 201))
+        servico._gravar(response)
+        servico._liberar(None)
+
+    registro = _registro(app, 'k5')
+    assert (registro.status, registro.dono) == ('processando', 'outra')
+
+def test_reserva_renovada_enquanto_a_view_roda(app, monkeypatch):
+    from src.services.idempotencia_service import get_idempotencia_service
+    servico = get_idempotencia_service()
+    monkeypatch.setattr(servico, 'reserva', timedelta(seconds=0.3))
+
+    with app.test_request_context('/api/cobrancas', method='POST', json=CORPO, headers={'Idempotency-Key': 'k6'}):
+        app.preprocess_request()
+        inicial = _registro(app, 'k6').expira_em
+        time.sleep(0.5)
+        renovada = _registro(app, 'k6').expira_em
+        servico._liberar(None)
+
+    assert renovada > inicial + timedelta(seconds=0.1)
+    assert _registro(app, 'k6') is None
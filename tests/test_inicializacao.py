@@ -0,0 +1,28 @@
+import multiprocessing
+import sqlite3
+
+def _subir(caminho, fila):
+    try:
+        from src.main import create_app
+        create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{caminho}'})
+        fila.put('ok')
+    except Exception as e:
+        fila.put(repr(e))
+
+def test_processos_simultaneos_preparam_o_esquema_uma_vez(banco_legado):
+    caminho = banco_legado({})
+
+    contexto = multiprocessing.get_context('fork')
+    fila = contexto.Queue()
+    processos = [contexto.Process(target=_subir, args=(str(caminho), fila)) for _ in range(4)]
+    for processo in processos:
+        processo.start()
+    resultados = [fila.get(timeout=60) for _ in processos]
+    for processo in processos:
+        processo.join()
+
+    assert resultados == ['ok'] * 4
+
+    conexao = sqlite3.connect(caminho)
+    nomes = [linha[0] for linha in conexao.execute('SELECT nome FROM schema_migrations')]
+    assert len(nomes) == len(set(nomes))
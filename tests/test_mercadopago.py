@@ -0,0 +1,60 @@
+import io
+
+import pytest
+from urllib3 import HTTPResponse
+from urllib3.connectionpool import HTTPConnectionPool
+
+@pytest.fixture
+def servico(monkeypatch):
+    monkeypatch.setenv('MP_TENTATIVAS_429', '2')
+    monkeypatch.setenv('MP_LIMITE_PADRAO', '1000')
+    from src.services.mercadopago_service import MercadoPagoService
+    return MercadoPagoService()
+
+@pytest.fixture
+def respostas_http(monkeypatch):
+    """Substitui a rede: cada requisição do SDK consome o próximo status da lista"""
+    fila = []
+    feitas = []
+
+    def responder(self, conn, method, url, **kwargs):
+        feitas.append(url)
+        status = fila.pop(0) if len(fila) > 1 else fila[0]
+        return HTTPResponse(
+            body=io.BytesIO(b'{"message": "x", "id": 1}'), status=status,
+            headers={'Content-Type': 'application/json'}, preload_content=False
+        )
+
+    monkeypatch.setattr(HTTPConnectionPool, '_make_request', responder)
+    return fila, feitas
+
+def test_429_chega_ao_limitador(servico, respostas_http):
+    fila, feitas = respostas_http
+    fila.extend([429, 429, 200])
+
+    resultado = servico.obter_pagamento('1')
+
+    assert resultado['success'] is True
+    assert len(feitas) == 3
+    metricas = servico.metricas_limitador()['payment.get']
+    assert metricas['respostas_429'] == 2
+    assert metricas['taxa_atual'] < 1000
+
+def test_429_persistente_esgota_as_tentativas(servico, respostas_http):
+    fila, feitas = respostas_http
+    fila.append(429)
+
+    resultado = servico.obter_pagamento('1')
+
+    assert resultado['success'] is False
+    assert len(feitas) == servico.tentativas_429 + 1
+
+def test_taxa_dividida_entre_os_processos(monkeypatch):
+    monkeypatch.setenv('MP_LIMITE_PADRAO', '12')
+    monkeypatch.setenv('MP_LIMITES', 'preference.create=6')
+    monkeypatch.setenv('MP_PROCESSOS', '3')
+    from src.services.mercadopago_service import MercadoPagoService
+    limitador = MercadoPagoService().limitador
+
+    assert limitador.taxa_padrao == 4
+    assert limitador.taxas == {'preference.create': 2}
@@ -0,0 +1,72 @@
+import sqlite3
+
+def _migrar(caminho):
+    from src.main import create_app
+    from src.models.cobranca import db
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{caminho}'})
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+def _linhas(caminho, consulta):
+    conexao = sqlite3.connect(caminho)
+    try:
+        return conexao.execute(consulta).fetchall()
+    finally:
+        conexao.close()
+
+def test_data_vencimento_preenchida_sem_alterar_data_atualizacao(banco_legado):
+    caminho = banco_legado({}, {'data_criacao': '2021-05-10 12:00:00.000000'})
+
+    _migrar(caminho)
+
+    linhas = _linhas(caminho, 'SELECT data_vencimento, data_atualizacao FROM cobrancas ORDER BY id')
+    assert all(vencimento is not None for vencimento, _ in linhas)
+    assert [atualizacao for _, atualizacao in linhas] == ['2020-01-02 00:00:00.000000'] * 2
+
+def test_migracoes_registradas_e_nao_repetidas(banco_legado):
+    caminho = banco_legado({})
+
+    _migrar(caminho)
+    _migrar(caminho)
+
+    nomes = [nome for nome, in _linhas(caminho, 'SELECT nome FROM schema_migrations ORDER BY nome')]
+    assert nomes == ['0001_preencher_data_vencimento', '0002_mover_payloads_mercadopago', '0003_vincular_clientes']
+
+def test_payloads_movidos_e_texto_invalido_mantido(banco_legado):
+    import json
+    caminho = banco_legado(
+        {'dados_mercadopago': json.dumps({'id': 123, 'payment_method_id': 'pix', 'status': 'approved'})},
+        {'dados_mercadopago': '{quebrado'}
+    )
+
+    _migrar(caminho)
+
+    assert _linhas(caminho, 'SELECT id, dados_mercadopago FROM cobrancas ORDER BY id') == [(1, None), (2, '{quebrado')]
+    assert [cobranca_id for cobranca_id, in _linhas(caminho, 'SELECT cobranca_id FROM cobrancas_payloads')] == [1]
+    assert _linhas(caminho, 'SELECT data_atualizacao FROM cobrancas WHERE id = 1') == [('2020-01-02 00:00:00.000000',)]
+    assert _linhas(caminho, 'SELECT mp_payment_id, mp_metodo_pagamento FROM cobrancas WHERE id = 1') == [('123', 'pix')]
+
+def test_indices_e_clientes_no_banco_legado(banco_legado):
+    caminho = banco_legado(
+        {'cliente_documento': '123.456.789-09', 'cliente_nome': 'João'},
+        {'cliente_documento': '12345678909', 'cliente_nome': 'João Souza', 'data_criacao': '2020-02-01 00:00:00.000000'},
+        {'cliente_email': 'Outra@Exemplo.com.br '}
+    )
+
+    _migrar(caminho)
+
+    indices = {nome for nome, in _linhas(caminho, "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'cobrancas'")}
+    assert {
+        'ix_cobrancas_data_atualizacao', 'ix_cobrancas_status_atualizacao',
+        'ix_cobrancas_status_vencimento', 'ix_cobrancas_cliente_criacao'
+    } <= indices
+
+    # Mesmo documento (com e sem pontuação) vira um cliente só; data_atualizacao intacta
+    assert _linhas(caminho, 'SELECT chave, nome FROM clientes ORDER BY id') == [
+        ('doc:12345678909', 'João Souza'), ('email:outra@exemplo.com.br', 'Maria Silva')
+    ]
+    assert _linhas(caminho, 'SELECT cliente_id, data_atualizacao FROM cobrancas ORDER BY id') == [
+        (1, '2020-01-02 00:00:00.000000'), (1, '2020-01-02 00:00:00.000000'), (2, '2020-01-02 00:00:00.000000')
+    ]
@@ -0,0 +1,103 @@
+import importlib.util
+import json
+import os
+from datetime import datetime
+
+import pytest
+
+from conftest import RAIZ
+
+@pytest.fixture
+def api(app, monkeypatch):
+    """Módulo da função Netlify apontando para o banco da aplicação de teste"""
+    monkeypatch.setenv('DATABASE_URL', app.config['SQLALCHEMY_DATABASE_URI'])
+    spec = importlib.util.spec_from_file_location('api_netlify', os.path.join(RAIZ, 'netlify', 'functions', 'api.py'))
+    modulo = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(modulo)
+    yield modulo
+    if modulo._conexao is not None:
+        modulo._conexao.close()
+
+@pytest.fixture
+def cobrancas(nova_cobranca):
+    return [
+        nova_cobranca(
+            data_criacao=datetime(2026, 3, 1, 10, 0, 0), data_atualizacao=datetime(2026, 3, 1, 10, 0, 0),
+            data_vencimento=datetime(2026, 3, 4, 10, 0, 0), status='approved', mp_payment_id='42',
+            mp_metodo_pagamento='pix', mp_data_aprovacao=datetime(2026, 3, 2, 8, 30, 15, 123456), mp_taxas=1.99
+        ),
+        nova_cobranca(descricao='Segunda', cliente_telefone='(11) 90000-0000', valor=99.9)
+    ]
+
+def _gravar_payload(app, cobranca_id, dados):
+    from src.models.cobranca import Cobranca, db
+    with app.app_context():
+        db.session.get(Cobranca, cobranca_id).set_dados_mercadopago(dados)
+        db.session.commit()
+
+def _evento(caminho, query='', headers=None):
+    return {'httpMethod': 'GET', 'path': caminho, 'rawQuery': query, 'headers': headers or {}, 'body': None}
+
+def _so_caminho_leve(api, monkeypatch):
+    def proibido():
+        raise AssertionError('caminho leve caiu na aplicação completa')
+    monkeypatch.setattr(api, '_aplicacao', proibido)
+
+@pytest.mark.parametrize('query', ['', 'page=1&per_page=1', 'status=approved'])
+def test_listagem_igual_a_da_aplicacao(api, client, cobrancas, monkeypatch, query):
+    esperado = client.get(f'/api/cobrancas?{query}')
+    _so_caminho_leve(api, monkeypatch)
+
+    resposta = api.handler(_evento('/api/cobrancas', query), None)
+    corpo = json.loads(resposta['body'])
+
+    assert resposta['statusCode'] == 200
+    assert corpo == esperado.get_json()
+    assert resposta['headers']['ETag'] == esperado.headers['ETag']
+
+def test_etags_vem_do_mesmo_modulo(api):
+    from src import etag
+    from src.services.conditional_get_service import ConditionalGetService
+
+    assert ConditionalGetService.VERSAO == etag.VERSAO
+    assert (api.etag_listagem, api.etag_detalhe) == (etag.etag_listagem, etag.etag_detalhe)
+
+def test_detalhe_igual_ao_da_aplicacao(api, app, client, cobrancas, monkeypatch):
+    _gravar_payload(app, cobrancas[0], {'id': 42, 'status': 'approved', 'payment_method_id': 'pix'})
+    assert client.get(f'/api/cobrancas/{cobrancas[0]}').get_json()['cobranca']['dados_mercadopago']['id'] == 42
+
+    for cobranca_id in cobrancas:
+        esperado = client.get(f'/api/cobrancas/{cobranca_id}')
+        _so_caminho_leve(api, monkeypatch)
+
+        resposta = api.handler(_evento(f'/.netlify/functions/api/cobrancas/{cobranca_id}'), None)
+
+        assert json.loads(resposta['body']) == esperado.get_json()
+        assert resposta['headers']['ETag'] == esperado.headers['ETag']
+
+def test_etag_da_aplicacao_vale_no_caminho_leve(api, client, cobrancas, monkeypatch):
+    etag = client.get(f'/api/cobrancas/{cobrancas[0]}').headers['ETag']
+    _so_caminho_leve(api, monkeypatch)
+
+    resposta = api.handler(_evento(f'/api/cobrancas/{cobrancas[0]}', headers={'If-None-Match': etag}), None)
+
+    assert (resposta['statusCode'], resposta['body']) == (304, '')
+
+def test_cobranca_inexistente_vai_para_a_aplicacao(api, cobrancas):
+    resposta = api.handler(_evento('/api/cobrancas/999'), None)
+    assert resposta['statusCode'] == 404
+
+def test_payload_regravado_muda_o_etag_do_detalhe(api, app, client, cobrancas, monkeypatch):
+    etag = client.get(f'/api/cobrancas/{cobrancas[1]}').headers['ETag']
+
+    # Preferência: nenhuma coluna da cobrança muda, só o payload
+    _gravar_payload(app, cobrancas[1], {'id': 'pref-1', 'init_point': 'https://exemplo'})
+
+    resposta = client.get(f'/api/cobrancas/{cobrancas[1]}', headers={'If-None-Match': etag})
+    assert resposta.status_code == 200
+    assert resposta.get_json()['cobranca']['dados_mercadopago']['id'] == 'pref-1'
+
+    _so_caminho_leve(api, monkeypatch)
+    leve = api.handler(_evento(f'/api/cobrancas/{cobrancas[1]}', headers={'If-None-Match': etag}), None)
+    assert leve['statusCode'] == 200
+    assert leve['headers']['ETag'] == resposta.headers['ETag']
@@ -0,0 +1,60 @@
+import marshal
+
+import pytest
+
+ADMIN = {'X-Admin-Token': 'token-de-teste'}
+
+@pytest.fixture
+def perfilado(request, monkeypatch):
+    """Cliente de uma aplicação com o profiler ligado pelo ambiente recebido"""
+    def criar(**ambiente):
+        monkeypatch.setenv('PROFILER_ENABLED', '1')
+        for nome, valor in ambiente.items():
+            monkeypatch.setenv(nome, valor)
+        return request.getfixturevalue('client')
+    return criar
+
+def _perfis(client):
+    resposta = client.get('/api/admin/profiles', headers=ADMIN)
+    assert resposta.status_code == 200
+    return resposta.get_json()['profiles']
+
+def test_limite_zero_captura_e_lista_o_perfil(perfilado):
+    client = perfilado(PROFILER_SLOW_MS='0')
+
+    assert client.get('/api/cobrancas?status=pending').status_code == 200
+
+    perfis = _perfis(client)
+    assert [(perfil['path'], perfil['query_string'], perfil['motivo'], perfil['status_code']) for perfil in perfis] == [
+        ('/api/cobrancas', 'status=pending', 'lento', 200)
+    ]
+
+    detalhe = client.get(f"/api/admin/profiles/{perfis[0]['id']}", headers=ADMIN).get_json()['profile']
+    assert 'cumulative' in detalhe['resumo']
+
+    download = client.get(f"/api/admin/profiles/{perfis[0]['id']}/download", headers=ADMIN)
+    assert marshal.loads(download.data)
+
+def test_requisicoes_abaixo_do_limite_nao_sao_capturadas(perfilado):
+    client = perfilado(PROFILER_SLOW_MS='60000')
+
+    client.get('/api/cobrancas')
+    assert _perfis(client) == []
+
+def test_amostragem_respeita_a_taxa(perfilado, monkeypatch):
+    client = perfilado(PROFILER_SAMPLE_RATE='0.25')
+    from src.services import profiler_service
+
+    sorteios = iter([0.3, 0.2, 0.9])
+    monkeypatch.setattr(profiler_service.random, 'random', lambda: next(sorteios))
+
+    for _ in range(3):
+        client.get('/api/cobrancas')
+
+    assert [perfil['motivo'] for perfil in _perfis(client)] == ['amostragem']
+
+def test_sem_limite_nem_amostragem_nada_e_perfilado(perfilado):
+    client = perfilado()
+
+    client.get('/api/cobrancas')
+    assert _perfis(client) == []
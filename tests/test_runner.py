@@ -0,0 +1,50 @@
+import multiprocessing
+import os
+import signal
+import time
+
+def _supervisionar(registro):
+    from src.runner import Supervisor
+
+    def falhar():
+        with open(registro, 'a') as f:
+            f.write(f'{time.monotonic()}\n')
+        raise RuntimeError('falha ao subir')
+
+    supervisor = Supervisor(graceful_timeout=5, espera_inicial=0.3, espera_maxima=1.2, vida_minima=5)
+    supervisor.iniciar('web', falhar)
+    supervisor.executar()
+    os._exit(0 if not supervisor.filhos and not supervisor.agendados else 1)
+
+def _inicios(registro):
+    if not os.path.exists(registro):
+        return []
+    with open(registro) as f:
+        return [float(linha) for linha in f.read().split()]
+
+def test_filho_que_falha_ao_subir_e_reiniciado_com_espera_crescente(tmp_path):
+    registro = str(tmp_path / 'inicios.txt')
+    processo = multiprocessing.get_context('fork').Process(target=_supervisionar, args=(registro,))
+    processo.start()
+
+    prazo = time.monotonic() + 30
+    while len(_inicios(registro)) < 5 and time.monotonic() < prazo:
+        time.sleep(0.05)
+
+    os.kill(processo.pid, signal.SIGTERM)
+    processo.join(10)
+
+    assert processo.exitcode == 0
+    inicios = _inicios(registro)
+    assert len(inicios) >= 5
+
+    # 0.3, 0.6, 1.2 e depois o teto de 1.2 s
+    intervalos = [depois - antes for antes, depois in zip(inicios, inicios[1:])]
+    assert intervalos[0] < intervalos[1] < intervalos[2]
+    assert intervalos[0] >= 0.3
+    assert all(intervalo < 2.5 for intervalo in intervalos)
+
+    # Nenhum reinício depois do SIGTERM
+    total = len(inicios)
+    time.sleep(1.5)
+    assert len(_inicios(registro)) == total